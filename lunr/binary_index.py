@@ -0,0 +1,444 @@
+"""A compact binary on-disk format for lunr.Index.
+
+The file starts with a fixed header, the magic bytes, the format version and
+the length of a JSON header describing the index and the location of each
+section. Sections are flat arrays of fixed size items, aligned to 8 bytes,
+that are memory mapped when opening the file and read lazily, so processes
+opening the same file share a single copy in the page cache:
+
+- `doc_ref_offsets`, `doc_refs`: document references, UTF-8 encoded.
+- `term_offsets`, `terms`: the sorted terms of the index, UTF-8 encoded.
+- `term_indexes`: the `_index` of each term.
+- `posting_offsets`, `postings`: the sorted document ids of each term and
+  field, in term then field order.
+- `metadata_offsets`, `metadata`: JSON encoded metadata of each posting,
+  empty for postings without metadata.
+- `vector_flags`, `vector_offsets`, `vector_indexes`, `vector_values`: field
+  vectors in field then document order, the flag marks present vectors.
+- `max_term_scores`: maximum score of each term in each field.
+- `field_magnitudes`: magnitude of the field vectors in field then document
+  order, zero for missing vectors. Added in version 2 of the format, indexes
+  saved in version 1 calculate the magnitudes when opened.
+- `token_set_finals`, `token_set_edge_offsets`, `token_set_edge_labels`,
+  `token_set_edge_targets`: the minimized token set as returned by
+  `lunr.TokenSet.flatten`, labels as code points.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from functools import cached_property
+import json
+import logging
+import mmap
+import struct
+import sys
+
+from lunr.exceptions import BaseLunrException
+from lunr.field_ref import FieldRef
+from lunr.index import Index
+from lunr.inverted_index import EMPTY_FIELD_POSTING, InvertedIndex
+from lunr.matrix import FieldMatrix
+from lunr.pipeline import Pipeline
+from lunr.token_set import TokenSet
+from lunr.vector import Vector
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LUNRPYB\x00"
+FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def save_binary(index, path):
+    """Saves an index to `path` in the binary format."""
+    from lunr import __TARGET_JS_VERSION__
+
+    inverted_index = index.inverted_index
+    fields = index.fields
+    doc_refs = inverted_index.doc_refs
+    terms = sorted(inverted_index)
+    sections = {}
+
+    sections["doc_ref_offsets"], sections["doc_refs"] = _encode_strings(doc_refs)
+    sections["term_offsets"], sections["terms"] = _encode_strings(terms)
+
+    term_indexes = array("I")
+    posting_offsets = array("Q", [0])
+    postings = array("I")
+    metadata_offsets = array("Q", [0])
+    metadata = bytearray()
+    for term in terms:
+        term_index, field_postings = inverted_index.lookup(term)
+        term_indexes.append(term_index)
+        for field in fields:
+            doc_ids, field_metadata = field_postings.get(field, EMPTY_FIELD_POSTING)
+            postings.extend(doc_ids)
+            posting_offsets.append(len(postings))
+            if field_metadata is not None:
+                metadata += json.dumps(list(field_metadata)).encode("utf-8")
+            metadata_offsets.append(len(metadata))
+
+    sections["term_indexes"] = term_indexes
+    sections["posting_offsets"] = posting_offsets
+    sections["postings"] = postings
+    sections["metadata_offsets"] = metadata_offsets
+    sections["metadata"] = array("B", metadata)
+
+    vector_flags = array("B")
+    vector_offsets = array("Q", [0])
+    vector_indexes = array("I")
+    vector_values = array("d")
+    max_term_scores = array("d")
+    field_magnitudes = array("d")
+    for field in fields:
+        vectors = index._field_vectors_by_doc_id[field]
+        for doc_id in range(len(doc_refs)):
+            vector = vectors[doc_id]
+            vector_flags.append(vector is not None)
+            if vector is not None:
+                vector_indexes.extend(vector.indexes)
+                vector_values.extend(vector.values)
+            vector_offsets.append(len(vector_indexes))
+
+        max_term_scores.extend(index.max_term_scores[field])
+        field_magnitudes.extend(index.field_magnitudes[field])
+
+    sections["vector_flags"] = vector_flags
+    sections["vector_offsets"] = vector_offsets
+    sections["vector_indexes"] = vector_indexes
+    sections["vector_values"] = vector_values
+    sections["max_term_scores"] = max_term_scores
+    sections["field_magnitudes"] = field_magnitudes
+
+    finals, edge_offsets, edge_labels, edge_targets = index.token_set.flatten()
+    sections["token_set_finals"] = array("B", finals)
+    sections["token_set_edge_offsets"] = array("Q", edge_offsets)
+    sections["token_set_edge_labels"] = array("I", map(ord, edge_labels))
+    sections["token_set_edge_targets"] = array("I", edge_targets)
+
+    header = {
+        "version": __TARGET_JS_VERSION__,
+        "fields": fields,
+        "pipeline": index.pipeline.serialize(),
+        "byteorder": sys.byteorder,
+        "sections": {},
+    }
+    offset = 0
+    for name, section in sections.items():
+        length = len(section) * section.itemsize
+        header["sections"][name] = [offset, length, section.typecode]
+        offset = _align(offset + length)
+
+    encoded_header = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as fp:
+        fp.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded_header)))
+        fp.write(encoded_header)
+        _pad(fp)
+        for section in sections.values():
+            section.tofile(fp)
+            _pad(fp)
+
+
+def open_binary(path):
+    """Opens an index saved in the binary format by memory mapping the file."""
+    from lunr import __TARGET_JS_VERSION__
+
+    with open(path, "rb") as fp:
+        buffer = memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, format_version, header_length = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise BaseLunrException("{} is not a binary lunr index".format(path))
+    if format_version not in SUPPORTED_FORMAT_VERSIONS:
+        raise BaseLunrException(
+            "Unsupported binary index format version {}".format(format_version)
+        )
+
+    header = json.loads(str(buffer[HEADER.size : HEADER.size + header_length], "utf-8"))
+    if header["byteorder"] != sys.byteorder:
+        raise BaseLunrException(
+            "Binary index was saved with {} byte order".format(header["byteorder"])
+        )
+
+    if header["version"] != __TARGET_JS_VERSION__:
+        logger.warning(
+            "Version mismatch when opening binary index. "
+            "Current version of lunr {} does not match that of the binary "
+            "index {}".format(__TARGET_JS_VERSION__, header["version"])
+        )
+
+    data_start = _align(HEADER.size + header_length)
+    sections = {
+        name: buffer[data_start + offset : data_start + offset + length].cast(typecode)
+        for name, (offset, length, typecode) in header["sections"].items()
+    }
+
+    fields = header["fields"]
+    inverted_index = MappedInvertedIndex(fields, sections)
+    field_vectors = MappedFieldVectors(fields, inverted_index, sections)
+    term_count = len(inverted_index)
+    max_term_scores = {
+        field: sections["max_term_scores"][i * term_count : (i + 1) * term_count]
+        for i, field in enumerate(fields)
+    }
+    document_count = len(inverted_index.doc_refs)
+    field_magnitudes = None
+    if format_version > 1:
+        field_magnitudes = {
+            field: sections["field_magnitudes"][
+                i * document_count : (i + 1) * document_count
+            ]
+            for i, field in enumerate(fields)
+        }
+    token_set = MappedTokenSetTable(sections).node(0)
+
+    return Index(
+        inverted_index=inverted_index,
+        field_vectors=field_vectors,
+        token_set=token_set,
+        fields=fields,
+        pipeline=Pipeline.load(header["pipeline"]),
+        max_term_scores=max_term_scores,
+        field_magnitudes=field_magnitudes,
+    )
+
+
+class StringTable(Sequence):
+    """A sequence of strings decoded on access from a blob of UTF-8 bytes and
+    an array of offsets."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._blob[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+
+class MappedInvertedIndex(InvertedIndex):
+    """A read-only InvertedIndex backed by the sections of a binary index.
+
+    Terms are found by binary search on the sorted term table and postings
+    are memory views on the mapped file.
+    """
+
+    def __init__(self, fields, sections):
+        self.fields = fields
+        self.doc_refs = StringTable(sections["doc_ref_offsets"], sections["doc_refs"])
+        self._terms = StringTable(sections["term_offsets"], sections["terms"])
+        self._term_indexes = sections["term_indexes"]
+        self._posting_offsets = sections["posting_offsets"]
+        self._postings = sections["postings"]
+        self._metadata_offsets = sections["metadata_offsets"]
+        self._metadata = sections["metadata"]
+
+    def __repr__(self):
+        return "<MappedInvertedIndex terms={} documents={}>".format(
+            len(self._terms), len(self.doc_refs)
+        )
+
+    def __iter__(self):
+        return iter(self._terms)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term):
+        return self._position(term) is not None
+
+    def sorted_terms(self):
+        return self._terms
+
+    @cached_property
+    def doc_ids(self):
+        return {doc_ref: doc_id for doc_id, doc_ref in enumerate(self.doc_refs)}
+
+    def intern(self, doc_ref):
+        return self.doc_ids[doc_ref]
+
+    def add(self, term, posting):
+        raise BaseLunrException("Binary indexes are read-only")
+
+    def lookup(self, term):
+        position = self._position(term)
+        if position is None:
+            raise KeyError(term)
+
+        field_postings = {}
+        for i, field in enumerate(self.fields):
+            k = position * len(self.fields) + i
+            start, end = self._posting_offsets[k], self._posting_offsets[k + 1]
+            if start == end:
+                continue
+
+            metadata = None
+            metadata_start = self._metadata_offsets[k]
+            metadata_end = self._metadata_offsets[k + 1]
+            if metadata_end > metadata_start:
+                metadata = json.loads(
+                    str(self._metadata[metadata_start:metadata_end], "utf-8")
+                )
+
+            field_postings[field] = (self._postings[start:end], metadata)
+
+        return self._term_indexes[position], field_postings
+
+    def _position(self, term):
+        position = bisect_left(self._terms, term)
+        if position < len(self._terms) and self._terms[position] == term:
+            return position
+        return None
+
+
+class MappedFieldVectors(Mapping):
+    """A read-only mapping of field refs to the field vectors of a binary
+    index, vectors are created from the mapped file on access."""
+
+    def __init__(self, fields, inverted_index, sections):
+        self._fields = fields
+        self._inverted_index = inverted_index
+        self._flags = sections["vector_flags"]
+        self._offsets = sections["vector_offsets"]
+        self._indexes = sections["vector_indexes"]
+        self._values = sections["vector_values"]
+
+    def __getitem__(self, ref):
+        field_ref = FieldRef.from_string(ref)
+        try:
+            field = self._fields.index(field_ref.field_name)
+            doc_id = self._inverted_index.doc_ids[field_ref.doc_ref]
+        except (ValueError, KeyError):
+            raise KeyError(ref)
+
+        vector = self.vector(field, doc_id)
+        if vector is None:
+            raise KeyError(ref)
+        return vector
+
+    def __iter__(self):
+        doc_refs = self._inverted_index.doc_refs
+        document_count = len(doc_refs)
+        for doc_id, doc_ref in enumerate(doc_refs):
+            for field, field_name in enumerate(self._fields):
+                if self._flags[field * document_count + doc_id]:
+                    yield str(FieldRef(doc_ref, field_name))
+
+    def __len__(self):
+        return sum(self._flags)
+
+    def vector(self, field, doc_id):
+        """Returns the vector for a field index and document id or None."""
+        k = field * len(self._inverted_index.doc_refs) + doc_id
+        if not self._flags[k]:
+            return None
+
+        start, end = self._offsets[k], self._offsets[k + 1]
+        indexes = array("I")
+        indexes.frombytes(self._indexes[start:end].cast("B"))
+        values = array("d")
+        values.frombytes(self._values[start:end].cast("B"))
+        return Vector.from_sorted_pairs(indexes, values)
+
+    def by_doc_id(self):
+        """Returns the field vectors per field as sequences indexed by doc
+        id, as expected by lunr.Index."""
+        return {
+            field_name: MappedVectorList(self, field)
+            for field, field_name in enumerate(self._fields)
+        }
+
+
+class MappedVectorList(Sequence):
+    """The field vectors of a single field indexed by doc id."""
+
+    def __init__(self, field_vectors, field):
+        self._field_vectors = field_vectors
+        self._field = field
+
+    def __len__(self):
+        return len(self._field_vectors._inverted_index.doc_refs)
+
+    def __getitem__(self, doc_id):
+        if not 0 <= doc_id < len(self):
+            raise IndexError("Document id out of range")
+
+        return self._field_vectors.vector(self._field, doc_id)
+
+    def field_matrix(self):
+        """Returns a `lunr.matrix.FieldMatrix` of the vectors of the field
+        reading the mapped file, without creating the vectors."""
+        field_vectors = self._field_vectors
+        document_count = len(self)
+        start = self._field * document_count
+        return FieldMatrix.from_buffers(
+            field_vectors._offsets[start : start + document_count + 1],
+            field_vectors._indexes,
+            field_vectors._values,
+        )
+
+
+class MappedTokenSetTable:
+    """The flat node and edge table of a token set in a binary index."""
+
+    def __init__(self, sections):
+        self.finals = sections["token_set_finals"]
+        self.edge_offsets = sections["token_set_edge_offsets"]
+        self.edge_labels = sections["token_set_edge_labels"]
+        self.edge_targets = sections["token_set_edge_targets"]
+        self._nodes = {}
+
+    def node(self, node_id):
+        """Returns the node for an id, creating it on first access."""
+        try:
+            return self._nodes[node_id]
+        except KeyError:
+            node = self._nodes[node_id] = MappedTokenSet(self, node_id)
+            return node
+
+
+class MappedTokenSet(TokenSet):
+    """A TokenSet node whose edges are read from the table on first access,
+    so only the parts of the automaton visited by queries are created."""
+
+    def __init__(self, table, node_id):
+        self.final = bool(table.finals[node_id])
+        self.id = node_id
+        self._table = table
+        self._edges = None
+
+    @property
+    def edges(self):
+        if self._edges is None:
+            table = self._table
+            self._edges = {
+                chr(table.edge_labels[i]): table.node(table.edge_targets[i])
+                for i in range(
+                    table.edge_offsets[self.id], table.edge_offsets[self.id + 1]
+                )
+            }
+        return self._edges
+
+
+def _encode_strings(strings):
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, array("B", blob)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _pad(fp):
+    fp.write(b"\x00" * (_align(fp.tell()) - fp.tell()))
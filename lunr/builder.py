@@ -1,4 +1,6 @@
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 
 from lunr.pipeline import Pipeline
@@ -136,62 +138,265 @@ class Builder:
             to the document, currently a single `boost` -> int will be
             taken into account.
         """
-        doc_ref = str(doc[self._ref])
-        self._documents[doc_ref] = attributes or {}
-        self.document_count += 1
-
-        for field_name, field in self._fields.items():
-            extractor = field.extractor
-            field_value = doc[field_name] if extractor is None else extractor(doc)
-            tokens = Tokenizer(field_value)
-            terms = self.pipeline.run(tokens, field_name)
-            field_ref = FieldRef(doc_ref, field_name)
-            field_terms = defaultdict(int)
-
-            # TODO: field_refs are casted to strings in JS, should we allow
-            # FieldRef as keys?
-            self.field_term_frequencies[str(field_ref)] = field_terms
-            self.field_lengths[str(field_ref)] = len(terms)
-
-            for term in terms:
-                # TODO: term is a Token, should we allow Tokens as keys?
-                term_key = str(term)
-
-                field_terms[term_key] += 1
-                if term_key not in self.inverted_index:
-                    posting = {_field_name: {} for _field_name in self._fields}
-                    posting["_index"] = self.term_index
-                    self.term_index += 1
-                    self.inverted_index[term_key] = posting
-
-                if doc_ref not in self.inverted_index[term_key][field_name]:
-                    self.inverted_index[term_key][field_name][doc_ref] = defaultdict(
-                        list
-                    )
+        self._add_documents([(doc, attributes)])
+
+    def remove(self, ref):
+        """Removes a document previously added to the builder.
+
+        Terms no longer present in any document are removed from the
+        inverted index, leaving gaps in the term indexes which are closed by
+        `build`.
 
-                for metadata_key in self.metadata_whitelist:
-                    metadata = term.metadata[metadata_key]
-                    self.inverted_index[term_key][field_name][doc_ref][
-                        metadata_key
-                    ].append(metadata)
+        Args:
+            - ref (str): The reference of the document to remove.
+
+        Returns:
+            bool: Whether the document was present and has been removed.
+        """
+        doc_ref = str(ref)
+        if doc_ref not in self._documents:
+            return False
+
+        del self._documents[doc_ref]
+        self.document_count -= 1
+
+        for field_name in self._fields:
+            field_ref = field_name + FieldRef.JOINER + doc_ref
+            self.field_lengths.pop(field_ref, None)
+            field_terms = self.field_term_frequencies.pop(field_ref, None)
+            if field_terms is None:
+                continue
+
+            for term in field_terms:
+                posting = self.inverted_index[term]
+                posting[field_name].pop(doc_ref, None)
+                if not any(posting[_field_name] for _field_name in self._fields):
+                    del self.inverted_index[term]
+
+        return True
+
+    def add_many(self, documents, batch_size=1000, workers=None):
+        """Adds multiple documents to the index.
+
+        The documents are consumed lazily, so any iterable, e.g. a generator
+        reading from a file or database, can be passed without holding the
+        whole corpus in memory. They are processed in batches of
+        `batch_size` documents, amortising the setup work of `add`.
+
+        If `workers` is passed the batches are processed in parallel by a
+        pool of processes, each returning the term statistics of its batch,
+        which are then merged in order into this builder as described in
+        `merge`. The resulting index is identical to a serial build. The
+        builder is sent to the worker processes. Pipelines of registered
+        functions are sent by label, when using the "spawn" or "forkserver"
+        start methods the functions must be registered when importing their
+        module in the workers, as lunr's own are, and field extractors must
+        be picklable.
+
+        Args:
+            - documents (iterable): The documents to be added, either dicts
+            or 2-tuples of a document and its attributes as accepted by `add`.
+            - batch_size (int, optional): The number of documents to read
+            from `documents` before processing them.
+            - workers (int, optional): The number of worker processes to use,
+            by default documents are processed in the current process.
+        """
+        if workers:
+            self._add_documents_in_parallel(documents, batch_size, workers)
+            return
+
+        batch = []
+        for document in documents:
+            batch.append(_as_document_and_attributes(document))
+            if len(batch) >= batch_size:
+                self._add_documents(batch)
+                batch.clear()
+
+        if batch:
+            self._add_documents(batch)
+
+    def merge(self, other):
+        """Merges the documents added to another builder into this one, as if
+        they had been added to this builder after its own documents.
+
+        Both builders must have the same configuration, i.e. ref, fields,
+        pipeline and metadata whitelist. This allows partitioning a corpus
+        and building partial builders independently, e.g. in multiple
+        processes, merging them into a single builder before calling `build`,
+        which calculates the IDF and field vectors over the whole corpus.
+
+        The merged builder shares its postings with `other`, which should not
+        be modified afterwards.
+        """
+        self._merge_partial(
+            other._documents,
+            other.document_count,
+            other.field_term_frequencies,
+            other.field_lengths,
+            other.inverted_index,
+        )
 
-    def build(self):
+    def _merge_partial(
+        self,
+        documents,
+        document_count,
+        field_term_frequencies,
+        field_lengths,
+        inverted_index,
+    ):
+        """Merges the term statistics of a partial builder."""
+        self._documents.update(documents)
+        self.document_count += document_count
+        self.field_term_frequencies.update(field_term_frequencies)
+        self.field_lengths.update(field_lengths)
+
+        # New terms are assigned indexes in the order the partial builder
+        # first saw them, which is the order a serial build would use.
+        for term, partial_posting in inverted_index.items():
+            posting = self.inverted_index.get(term)
+            if posting is None:
+                posting = {field_name: {} for field_name in self._fields}
+                posting["_index"] = self.term_index
+                self.term_index += 1
+                self.inverted_index[term] = posting
+
+            for field_name in self._fields:
+                field_posting = posting[field_name]
+                for doc_ref, metadata in partial_posting[field_name].items():
+                    if doc_ref not in field_posting:
+                        field_posting[doc_ref] = metadata
+                        continue
+
+                    for metadata_key, values in metadata.items():
+                        field_posting[doc_ref][metadata_key].extend(values)
+
+    def _add_documents_in_parallel(self, documents, batch_size, workers):
+        """Adds documents processing batches of them in worker processes and
+        merging the results in order."""
+        pending = deque()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(self._partial_copy(),),
+        ) as executor:
+            batch = []
+            for document in documents:
+                batch.append(_as_document_and_attributes(document))
+                if len(batch) >= batch_size:
+                    pending.append(executor.submit(_add_documents_in_worker, batch))
+                    batch = []
+
+                # Limit the batches in flight to bound memory usage
+                if len(pending) > 2 * workers:
+                    self._merge_partial(*pending.popleft().result())
+
+            if batch:
+                pending.append(executor.submit(_add_documents_in_worker, batch))
+
+            while pending:
+                self._merge_partial(*pending.popleft().result())
+
+    def _partial_copy(self):
+        """Returns a builder with the same configuration and no documents."""
+        builder = Builder()
+        builder._ref = self._ref
+        builder._fields = self._fields
+        builder.pipeline = self.pipeline
+        builder.search_pipeline = self.search_pipeline
+        builder.metadata_whitelist = self.metadata_whitelist
+        builder._b = self._b
+        builder._k1 = self._k1
+        return builder
+
+    def _add_documents(self, batch):
+        """Adds a batch of (document, attributes) tuples to the index."""
+        ref = self._ref
+        fields = [(field.name, field.extractor) for field in self._fields.values()]
+        pipeline = self.pipeline
+        inverted_index = self.inverted_index
+        metadata_whitelist = self.metadata_whitelist
+
+        for doc, attributes in batch:
+            doc_ref = str(doc[ref])
+            self._documents[doc_ref] = attributes or {}
+            self.document_count += 1
+
+            for field_name, extractor in fields:
+                field_value = doc[field_name] if extractor is None else extractor(doc)
+                tokens = Tokenizer(field_value)
+                terms = pipeline.run(tokens, field_name, cache=True)
+                # TODO: field_refs are casted to strings in JS, should we allow
+                # FieldRef as keys?
+                field_ref = field_name + FieldRef.JOINER + doc_ref
+                field_terms = defaultdict(int)
+
+                self.field_term_frequencies[field_ref] = field_terms
+                self.field_lengths[field_ref] = len(terms)
+
+                for term in terms:
+                    # TODO: term is a Token, should we allow Tokens as keys?
+                    term_key = str(term)
+
+                    field_terms[term_key] += 1
+                    posting = inverted_index.get(term_key)
+                    if posting is None:
+                        posting = {_field_name: {} for _field_name in self._fields}
+                        posting["_index"] = self.term_index
+                        self.term_index += 1
+                        inverted_index[term_key] = posting
+
+                    field_posting = posting[field_name]
+                    if doc_ref not in field_posting:
+                        field_posting[doc_ref] = defaultdict(list)
+
+                    for metadata_key in metadata_whitelist:
+                        metadata = term.metadata[metadata_key]
+                        field_posting[doc_ref][metadata_key].append(metadata)
+
+    def build(self, ngram_index=False, lazy_token_set=False):
         """Builds the index, creating an instance of `lunr.Index`.
 
         This completes the indexing process and should only be called once all
         documents have been added to the index.
+
+        Args:
+            ngram_index (bool, optional): Create an n-gram index of the terms
+                to speed up queries with leading or infix wildcards, see
+                `lunr.Index.create_ngram_index`.
+            lazy_token_set (bool, optional): Defer building the token set
+                until the first wildcard or fuzzy query.
         """
+        self._compact_term_indexes()
         self._calculate_average_field_lengths()
         self._create_field_vectors()
-        self._create_token_set()
+        if lazy_token_set:
+            self.token_set = None
+        else:
+            self._create_token_set()
 
-        return Index(
+        index = Index(
             inverted_index=self.inverted_index,
             field_vectors=self.field_vectors,
             token_set=self.token_set,
             fields=list(self._fields.keys()),
             pipeline=self.search_pipeline,
+            max_term_scores=self.max_term_scores,
+            field_magnitudes=self.field_magnitudes,
         )
+        if ngram_index:
+            index.create_ngram_index()
+
+        return index
+
+    def _compact_term_indexes(self):
+        """Reassigns contiguous term indexes if terms have been removed."""
+        if self.term_index == len(self.inverted_index):
+            return
+
+        for term_index, posting in enumerate(self.inverted_index.values()):
+            posting["_index"] = term_index
+
+        self.term_index = len(self.inverted_index)
 
     def _create_token_set(self):
         """Creates a token set of all tokens in the index using `lunr.TokenSet`"""
@@ -210,7 +415,8 @@ class Builder:
             accumulator[field] += length
 
         for field_name in self._fields:
-            accumulator[field_name] /= documents_with_field[field_name]
+            if documents_with_field[field_name]:
+                accumulator[field_name] /= documents_with_field[field_name]
 
         self.average_field_length = accumulator
 
@@ -218,47 +424,89 @@ class Builder:
         """Builds a vector space model of every document using lunr.Vector."""
         field_vectors = {}
         term_idf_cache = {}
+        max_term_scores = {
+            field_name: array("d", [0]) * self.term_index for field_name in self._fields
+        }
+        # Documents are assigned ids by lunr.Index in the order of their
+        # first field vector, the magnitudes are arranged by those ids.
+        doc_ids = {}
+        field_magnitudes = {field_name: array("d") for field_name in self._fields}
+
+        for field_ref in self.field_term_frequencies:
+            _field_ref, field_vector = self._create_field_vector(
+                field_ref, term_idf_cache
+            )
+            field_vectors[field_ref] = field_vector
 
-        for field_ref, term_frequencies in self.field_term_frequencies.items():
-            _field_ref = FieldRef.from_string(field_ref)
-            field_name = _field_ref.field_name
-            field_length = self.field_lengths[field_ref]
-            field_vector = Vector()
-            field_boost = self._fields[field_name].boost
-            doc_boost = self._documents[_field_ref.doc_ref].get("boost", 1)
-
-            for term, tf in term_frequencies.items():
-                term_index = self.inverted_index[term]["_index"]
-
-                if term not in term_idf_cache:
-                    idf = Idf(self.inverted_index[term], self.document_count)
-                    term_idf_cache[term] = idf
-                else:
-                    idf = term_idf_cache[term]
-
-                score = (
-                    idf
-                    * ((self._k1 + 1) * tf)
-                    / (
-                        self._k1
-                        * (
-                            1
-                            - self._b
-                            + self._b
-                            * (field_length / self.average_field_length[field_name])
-                        )
-                        + tf
-                    )
-                )
-                score *= field_boost
-                score *= doc_boost
-                score_with_precision = round(score, 3)
+            field_max_term_scores = max_term_scores[_field_ref.field_name]
+            for term_index, score in zip(field_vector.indexes, field_vector.values):
+                if score > field_max_term_scores[term_index]:
+                    field_max_term_scores[term_index] = score
 
-                field_vector.insert(term_index, score_with_precision)
+            doc_id = doc_ids.setdefault(_field_ref.doc_ref, len(doc_ids))
+            magnitudes = field_magnitudes[_field_ref.field_name]
+            if len(magnitudes) <= doc_id:
+                magnitudes.extend([0] * (doc_id + 1 - len(magnitudes)))
+            magnitudes[doc_id] = field_vector.magnitude
 
-            field_vectors[field_ref] = field_vector
+        for magnitudes in field_magnitudes.values():
+            magnitudes.extend([0] * (len(doc_ids) - len(magnitudes)))
 
         self.field_vectors = field_vectors
+        self.max_term_scores = max_term_scores
+        self.field_magnitudes = field_magnitudes
+
+    def _create_field_vector(self, field_ref, term_idf_cache):
+        """Scores the terms of a field of a document using BM25.
+
+        Args:
+            field_ref (str): The field ref of the document's field.
+            term_idf_cache (dict): The IDF of the terms scored so far, terms
+                not in it are added.
+
+        Returns:
+            tuple: The `lunr.FieldRef` and the `lunr.Vector` of the field.
+        """
+        _field_ref = FieldRef.from_string(field_ref)
+        field_name = _field_ref.field_name
+        field_length = self.field_lengths[field_ref]
+        term_scores = []
+        field_boost = self._fields[field_name].boost
+        doc_boost = self._documents[_field_ref.doc_ref].get("boost", 1)
+
+        for term, tf in self.field_term_frequencies[field_ref].items():
+            term_index = self.inverted_index[term]["_index"]
+
+            if term not in term_idf_cache:
+                idf = Idf(self.inverted_index[term], self.document_count)
+                term_idf_cache[term] = idf
+            else:
+                idf = term_idf_cache[term]
+
+            score = (
+                idf
+                * ((self._k1 + 1) * tf)
+                / (
+                    self._k1
+                    * (
+                        1
+                        - self._b
+                        + self._b
+                        * (field_length / self.average_field_length[field_name])
+                    )
+                    + tf
+                )
+            )
+            score *= field_boost
+            score *= doc_boost
+            term_scores.append((term_index, round(score, 3)))
+
+        term_scores.sort()
+        field_vector = Vector.from_sorted_pairs(
+            (term_index for term_index, _ in term_scores),
+            (score for _, score in term_scores),
+        )
+        return _field_ref, field_vector
 
     def use(self, fn, *args, **kwargs):
         """Applies a plugin to the index builder.
@@ -273,3 +521,35 @@ class Builder:
         arguments can also be passed when calling use.
         """
         fn(self, *args, **kwargs)
+
+
+def _as_document_and_attributes(document):
+    """Returns a (document, attributes) tuple for the documents accepted by
+    `Builder.add_many`."""
+    if isinstance(document, (tuple, list)):
+        return document[0], document[1]
+
+    return document, None
+
+
+# The builder used to process documents in a worker process
+_worker_builder = None
+
+
+def _initialize_worker(builder):
+    global _worker_builder
+    _worker_builder = builder
+
+
+def _add_documents_in_worker(batch):
+    """Processes a batch of documents in a worker process, returning the term
+    statistics to be merged by `Builder._merge_partial`."""
+    builder = _worker_builder._partial_copy()
+    builder._add_documents(batch)
+    return (
+        builder._documents,
+        builder.document_count,
+        builder.field_term_frequencies,
+        builder.field_lengths,
+        builder.inverted_index,
+    )
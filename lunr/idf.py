@@ -11,5 +11,12 @@ def idf(posting, document_count):
             continue
         documents_with_term += len(posting[field_name].keys())
 
+    return idf_from_document_frequency(documents_with_term, document_count)
+
+
+def idf_from_document_frequency(documents_with_term, document_count):
+    """Calculates the inverse document frequency of a term from the number
+    of postings of the term, as counted by `idf`, and the document count.
+    """
     x = (document_count - documents_with_term + 0.5) / (documents_with_term + 0.5)
     return math.log(1 + abs(x))
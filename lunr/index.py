@@ -1,10 +1,20 @@
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import heapq
 import json
 import logging
+import threading
 
 from lunr.exceptions import BaseLunrException
 from lunr.field_ref import FieldRef
+from lunr.inverted_index import EMPTY_FIELD_POSTING, InvertedIndex
+from lunr.levenshtein import LevenshteinAutomaton
 from lunr.match_data import MatchData
+from lunr.matrix import NUMPY_SUPPORT, FieldMatrix
+from lunr.ngram_index import NgramIndex
 from lunr.token_set import TokenSet
 from lunr.token_set_builder import TokenSetBuilder
 from lunr.pipeline import Pipeline
@@ -24,14 +34,135 @@ class Index:
     constructor, instead lunr.Builder should be used to construct new
     indexes, or lunr.Index.load should be used to load previously built and
     serialized indexes.
+
+    Internally documents are identified by dense integer ids, assigned in the
+    order of the field vectors, which are used by the `lunr.InvertedIndex`
+    postings and to look up the field vectors of each document.
+
+    If `token_set` is None it will be built from the terms in the inverted
+    index the first time it is needed.
+
+    Wildcard terms with leading or infix wildcards are expanded using
+    `ngram_index` if present, see `lunr.Index.create_ngram_index`.
+
+    Documents can be deleted with `delete`, which records a tombstone for
+    the document so it is excluded from queries before scoring.
+
+    If NumPy is installed documents are scored in bulk using a sparse matrix
+    of the field vectors of each field, created on first use. Set
+    `vectorized_scoring` to False to score each document using
+    `lunr.Vector.similarity` instead, both give identical scores.
     """
 
-    def __init__(self, inverted_index, field_vectors, token_set, fields, pipeline):
+    def __init__(
+        self,
+        inverted_index,
+        field_vectors,
+        token_set,
+        fields,
+        pipeline,
+        max_term_scores=None,
+        ngram_index=None,
+        field_magnitudes=None,
+    ):
+        if isinstance(inverted_index, InvertedIndex):
+            field_vectors_by_doc_id = self._index_field_vectors(
+                field_vectors, inverted_index
+            )
+        else:
+            postings = inverted_index
+            inverted_index = InvertedIndex(fields)
+            # Documents are assigned ids in the order of their first field
+            # vector, which the postings of a serialized index follow.
+            field_vectors_by_doc_id = self._index_field_vectors(
+                field_vectors, inverted_index
+            )
+            for term, posting in postings.items():
+                inverted_index.add(term, posting)
+
         self.inverted_index = inverted_index
         self.field_vectors = field_vectors
-        self.token_set = token_set
+        self._token_set = token_set
+        self._token_set_factory = lambda: TokenSet.from_list(sorted(inverted_index))
+        self._token_set_lock = threading.Lock()
+        self._sorted_terms = inverted_index.sorted_terms()
         self.fields = fields
         self.pipeline = pipeline
+        self._field_vectors_by_doc_id = field_vectors_by_doc_id
+        self._max_term_scores = max_term_scores
+        if field_magnitudes is None:
+            field_magnitudes = self._calculate_field_magnitudes(
+                field_vectors_by_doc_id, fields, len(inverted_index.doc_refs)
+            )
+        self.field_magnitudes = field_magnitudes
+        self.ngram_index = ngram_index
+        self.vectorized_scoring = NUMPY_SUPPORT
+        self._field_matrices = {}
+        self._tombstones = set()
+
+    @property
+    def token_set(self):
+        """The TokenSet of all the terms in the index, used to expand wildcard
+        and fuzzy terms. It is built on first access if the index was created
+        without one, which is safe to do from multiple threads."""
+        if self._token_set is None:
+            with self._token_set_lock:
+                if self._token_set is None:
+                    self._token_set = self._token_set_factory()
+
+        return self._token_set
+
+    @token_set.setter
+    def token_set(self, token_set):
+        self._token_set = token_set
+
+    @property
+    def max_term_scores(self):
+        """The maximum score of each term in each field, as arrays indexed by
+        term index per field, used as upper bounds when pruning. Calculated
+        on first access if the index was created without them, which is
+        idempotent so concurrent first accesses are harmless."""
+        if self._max_term_scores is None:
+            self._max_term_scores = self._calculate_max_term_scores(
+                self._field_vectors_by_doc_id, self.fields, len(self.inverted_index)
+            )
+
+        return self._max_term_scores
+
+    @max_term_scores.setter
+    def max_term_scores(self, max_term_scores):
+        self._max_term_scores = max_term_scores
+
+    def delete(self, ref):
+        """Deletes a document from the index.
+
+        A tombstone is recorded for the document, which is then excluded from
+        the results of queries before they are scored, so limited results are
+        unaffected. The document is dropped when the index is serialized or
+        saved, the scores of the remaining documents are not recalculated.
+
+        Args:
+            ref (str): The reference of the document to delete.
+
+        Returns:
+            bool: Whether the document was in the index and not yet deleted.
+        """
+        doc_id = self.inverted_index.doc_ids.get(str(ref))
+        if doc_id is None or doc_id in self._tombstones:
+            return False
+
+        self._tombstones.add(doc_id)
+        return True
+
+    def stats(self):
+        """Returns a dict with the number of documents in the index, the
+        number of deleted documents included in them, and the number of
+        terms."""
+        return {
+            "documents": len(self.inverted_index.doc_refs),
+            "deleted_documents": len(self._tombstones),
+            "terms": len(self.inverted_index),
+        }
 
     def __eq__(self, other):
         # TODO: extend equality to other attributes
@@ -39,7 +170,7 @@ class Index:
             self.inverted_index == other.inverted_index and self.fields == other.fields
         )
 
-    def search(self, query_string):
+    def search(self, query_string, limit=None, prune=False, max_expansions=None):
         """Performs a search against the index using lunr query syntax.
 
         Results will be returned sorted by their score, the most relevant
@@ -49,6 +180,13 @@ class Index:
 
         Args:
             query_string (str): A string to parse into a Query.
+            limit (int, optional): The maximum number of results to return,
+                defaults to returning all matching documents. Must not be
+                negative, a limit of 0 returns no results.
+            prune (bool, optional): Skip scoring documents that cannot be
+                part of the results, see `lunr.Index.query`.
+            max_expansions (int, optional): The maximum number of index terms
+                a trailing wildcard term expands to, see `lunr.Index.query`.
 
         Returns:
             dict: Results of executing the query.
@@ -57,7 +195,56 @@ class Index:
         # TODO: should QueryParser be a method of query? should it return one?
         parser = QueryParser(query_string, query)
         parser.parse()
-        return self.query(query)
+        return self.query(
+            query, limit=limit, prune=prune, max_expansions=max_expansions
+        )
+
+    def search_many(
+        self, query_strings, limit=None, prune=False, max_expansions=None, workers=None
+    ):
+        """Performs a batch of searches against the index.
+
+        The queries share the work common to them: duplicate query strings
+        are only searched once, and each term is run through the search
+        pipeline, expanded and has its postings looked up once for the whole
+        batch. The results are identical to calling `search` for each query.
+
+        Args:
+            query_strings (iterable): The query strings to search for.
+            limit (int, optional): The maximum number of results to return
+                for each query, see `lunr.Index.search`.
+            prune (bool, optional): Skip scoring documents that cannot be
+                part of the results, see `lunr.Index.query`.
+            max_expansions (int, optional): The maximum number of index terms
+                a trailing wildcard term expands to, see `lunr.Index.query`.
+            workers (int, optional): Run the searches in a pool of this many
+                threads, which run in parallel on free-threaded builds of
+                Python.
+
+        Returns:
+            list: The results of each query, in the order of `query_strings`.
+        """
+        query_strings = list(query_strings)
+        unique_query_strings = list(dict.fromkeys(query_strings))
+        cache = _QueryCache(self, max_expansions)
+
+        def search(query_string):
+            query = self.create_query()
+            QueryParser(query_string, query).parse()
+            results, _ = self._query(query, limit, prune, max_expansions, cache)
+            return results
+
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(search, unique_query_strings))
+        else:
+            results = [search(query_string) for query_string in unique_query_strings]
+
+        results_by_query_string = dict(zip(unique_query_strings, results))
+        return [
+            list(results_by_query_string[query_string])
+            for query_string in query_strings
+        ]
 
     def create_query(self, fields=None):
         """Convenience method to create a Query with the Index's fields.
@@ -80,7 +267,9 @@ class Index:
 
         return Query(fields)
 
-    def query(self, query=None, callback=None):
+    def query(
+        self, query=None, callback=None, limit=None, prune=False, max_expansions=None
+    ):
         """Performs a query against the index using the passed lunr.Query
         object.
 
@@ -94,6 +283,21 @@ class Index:
                 or use `callback` for convenience.
             callback (callable): An optional function taking a single Query
                 object result of `create_query` for further configuration.
+            limit (int, optional): The maximum number of results to return.
+                When set only the `limit` highest scoring documents are
+                selected, using a bounded heap instead of sorting every
+                matching document, and results are identical to the first
+                `limit` results of an unbounded query. Must not be negative,
+                a limit of 0 returns no results without evaluating the query.
+            prune (bool, optional): When used with `limit`, documents are
+                scored in decreasing order of their maximum possible score,
+                computed from the per term maximum scores of the index, and
+                scoring stops as soon as no remaining document can be part
+                of the results. Results are identical to an unpruned query.
+            max_expansions (int, optional): The maximum number of index terms
+                a term with a single trailing wildcard, e.g. `foo*`, expands
+                to, the first terms in lexicographical order are used. Must
+                be at least 1.
         """
         if query is None:
             query = self.create_query()
@@ -101,6 +305,24 @@ class Index:
         if callback is not None:
             callback(query)
 
+        results, _ = self._query(query, limit, prune, max_expansions)
+        return results
+
+    def _query(self, query, limit, prune, max_expansions, cache=None):
+        """Performs a query, returning the results and the postings used for
+        scoring as a list of (field, term index, document ids) tuples.
+
+        The search terms, expansions and postings of the terms are looked up
+        through `cache`, which can be shared by several queries.
+
+        Documents with equal scores are ranked in the order they were first
+        matched, i.e. by the first of these postings containing them and
+        then by document id, which `lunr.sharded_index.ShardedIndex` relies on to rank
+        results of several shards.
+        """
+        if limit is not None and limit < 0:
+            raise BaseLunrException("limit must not be negative, got {}".format(limit))
+
         if len(query.clauses) == 0:
             logger.warning(
                 "Attempting a query with no clauses. Please add clauses by "
@@ -108,7 +330,13 @@ class Index:
                 "to create a preconfigured Query, manually adding clauses and "
                 "passing it as the `query` argument."
             )
-            return []
+            return [], []
+
+        if limit == 0:
+            return [], []
+
+        if cache is None:
+            cache = _QueryCache(self, max_expansions)
 
         # for each query clause
         # * process terms
@@ -120,6 +348,7 @@ class Index:
         matching_fields = {}
         query_vectors = {field: Vector() for field in self.fields}
         term_field_cache = {}
+        scoring_postings = []
         required_matches = {}
         prohibited_matches = defaultdict(set)
 
@@ -131,7 +360,7 @@ class Index:
             # term, which means we may end up performing multiple index lookups
             # for a single query term.
             if clause.use_pipeline:
-                terms = self.pipeline.run_string(clause.term, {"fields": clause.fields})
+                terms = cache.search_terms(clause)
             else:
                 terms = [clause.term]
 
@@ -144,11 +373,7 @@ class Index:
                 # but mutate its term property.
                 clause.term = term
 
-                # From the term in the clause we create a token set which will
-                # then be used to intersect the indexes token set to get a list
-                # of terms to lookup in the inverted index
-                term_token_set = TokenSet.from_clause(clause)
-                expanded_terms = self.token_set.intersect(term_token_set).to_list()
+                expanded_terms = cache.expand_term(clause)
 
                 # If a term marked as required does not exist in the TokenSet
                 # it is impossible for the search to return any matches.
@@ -163,29 +388,26 @@ class Index:
                     break
 
                 for expanded_term in expanded_terms:
-                    posting = self.inverted_index[expanded_term]
-                    term_index = posting["_index"]
+                    term_index, field_postings = cache.lookup(expanded_term)
 
                     for field in clause.fields:
                         # For each field that this query term is scoped by
                         # (by default all fields are in scope) we need to get
-                        # all the document refs that have this term in that
-                        # field.
+                        # all the document ids that have this term in that
+                        # field, along with their metadata.
                         #
                         # The posting is the entry in the invertedIndex for the
                         # matching term from above.
-                        field_posting = posting[field]
-                        matching_document_refs = field_posting.keys()
+                        doc_ids, metadata = field_postings.get(
+                            field, EMPTY_FIELD_POSTING
+                        )
                         term_field = expanded_term + "/" + field
-                        matching_documents_set = set(matching_document_refs)
 
                         # If the presence of this term is required, ensure that
                         # the matching documents are added to the set of
                         # required matches for this clause.
                         if clause.presence == QueryPresence.REQUIRED:
-                            clause_matches = clause_matches.union(
-                                matching_documents_set
-                            )
+                            clause_matches.update(doc_ids)
 
                             if field not in required_matches:
                                 required_matches[field] = CompleteSet()
@@ -195,9 +417,7 @@ class Index:
                         # set of prohibited matches for this field, creating
                         # that set if it does not exist yet.
                         elif clause.presence == QueryPresence.PROHIBITED:
-                            prohibited_matches[field] = prohibited_matches[field].union(
-                                matching_documents_set
-                            )
+                            prohibited_matches[field].update(doc_ids)
 
                             # prohibited matches should not be part of the
                             # query vector used for similarity scoring and no
@@ -221,21 +441,23 @@ class Index:
                         if term_field in term_field_cache:
                             continue
 
-                        for matching_document_ref in matching_document_refs:
+                        scoring_postings.append((field, term_index, doc_ids))
+
+                        for i, doc_id in enumerate(doc_ids):
                             # All metadata for this term/field/document triple
                             # are then extracted and collected into an instance
                             # of lunr.MatchData ready to be returned in the
                             # query results
-                            matching_field_ref = FieldRef(matching_document_ref, field)
-                            metadata = field_posting[str(matching_document_ref)]
+                            matching_field = (field, doc_id)
+                            doc_metadata = {} if metadata is None else metadata[i]
 
-                            if str(matching_field_ref) not in matching_fields:
-                                matching_fields[str(matching_field_ref)] = MatchData(
-                                    expanded_term, field, metadata
+                            if matching_field not in matching_fields:
+                                matching_fields[matching_field] = MatchData(
+                                    expanded_term, field, doc_metadata
                                 )
                             else:
-                                matching_fields[str(matching_field_ref)].add(
-                                    expanded_term, field, metadata
+                                matching_fields[matching_field].add(
+                                    expanded_term, field, doc_metadata
                                 )
 
                         term_field_cache[term_field] = True
@@ -266,8 +488,6 @@ class Index:
                 )
 
         matching_field_refs = matching_fields.keys()
-        results = []
-        matches = {}
 
         # If the query is negated (only contains prohibited terms)
         # we need to get _all_ field_refs currently existing in the index.
@@ -275,56 +495,352 @@ class Index:
         # Additionally, blank match data must be created to correctly populate
         # the results
         if query.is_negated():
-            matching_field_refs = list(self.field_vectors.keys())
-
-            for matching_field_ref in matching_field_refs:
-                field_ref = FieldRef.from_string(matching_field_ref)
-                matching_fields[matching_field_ref] = MatchData()
-
-        for matching_field_ref in matching_field_refs:
-            # Currently we have document fields that match the query, but we
-            # need to return documents. The matchData and scores are combined
-            # from multiple fields belonging to the same document.
-            #
-            # Scores are calculated by field, using the query vectors created
-            # above, and combined into a final document score using addition.
-            field_ref = FieldRef.from_string(matching_field_ref)
-            doc_ref = field_ref.doc_ref
-
-            if doc_ref not in all_required_matches or doc_ref in all_prohibited_matches:
+            doc_ids = self.inverted_index.doc_ids
+            matching_field_refs = []
+            for ref in self.field_vectors:
+                field_ref = FieldRef.from_string(ref)
+                matching_field = (field_ref.field_name, doc_ids[field_ref.doc_ref])
+                matching_field_refs.append(matching_field)
+                matching_fields[matching_field] = MatchData()
+
+        # Currently we have document fields that match the query, but we
+        # need to return documents. The matchData and scores are combined
+        # from multiple fields belonging to the same document.
+        document_fields = {}
+        tombstones = self._tombstones
+        for field, doc_id in matching_field_refs:
+            if (
+                doc_id not in all_required_matches
+                or doc_id in all_prohibited_matches
+                or doc_id in tombstones
+            ):
                 continue
 
-            field_vector = self.field_vectors[matching_field_ref]
-            score = query_vectors[field_ref.field_name].similarity(field_vector)
-
-            try:
-                doc_match = matches[doc_ref]
-                doc_match["score"] += score
-                doc_match["match_data"].combine(matching_fields[matching_field_ref])
-            except KeyError:
-                match = {
-                    "ref": doc_ref,
-                    "score": score,
-                    "match_data": matching_fields[matching_field_ref],
+            if doc_id in document_fields:
+                document_fields[doc_id].append(field)
+            else:
+                document_fields[doc_id] = [field]
+
+        if prune and limit is not None:
+            scores = self._score_pruned(
+                document_fields, query_vectors, scoring_postings, limit
+            )
+        elif self.vectorized_scoring:
+            scores = self._score_vectorized(document_fields, query_vectors)
+        else:
+            scores = {
+                doc_id: self._score(doc_id, fields, query_vectors)
+                for doc_id, fields in document_fields.items()
+            }
+
+        # Both sorting and heap selection are stable, documents with equal
+        # scores are returned in the order they were first matched.
+        if limit is None:
+            ranked_doc_ids = sorted(scores, key=scores.__getitem__, reverse=True)
+        else:
+            ranked_doc_ids = heapq.nlargest(limit, scores, key=scores.__getitem__)
+
+        # Match data is only combined for the documents that are returned
+        results = []
+        for doc_id in ranked_doc_ids:
+            fields = document_fields[doc_id]
+            match_data = matching_fields[(fields[0], doc_id)]
+            for field in fields[1:]:
+                match_data.combine(matching_fields[(field, doc_id)])
+
+            results.append(
+                {
+                    "ref": self.inverted_index.doc_refs[doc_id],
+                    "score": scores[doc_id],
+                    "match_data": match_data,
                 }
-                matches[doc_ref] = match
-                results.append(match)
+            )
+
+        return results, scoring_postings
+
+    def _expand_term(self, clause, max_expansions=None):
+        """Returns the terms in the index matching the term of a clause.
+
+        Terms without wildcards or edit distance can only match themselves,
+        so they are looked up directly in the inverted index and terms with a
+        single trailing wildcard are found by binary search on the sorted
+        terms of the index. Terms with edit distance are matched by walking
+        the token set of the index with a Levenshtein automaton, and other
+        wildcard terms use the n-gram index if the index has one. Otherwise
+        from the term in the clause we create a token set which will then be
+        used to intersect the indexes token set to get a list of terms to
+        lookup in the inverted index.
+        """
+        term = clause.term
+        if _is_exact_clause(clause):
+            # The empty string never matches when intersecting token sets
+            return [term] if term and term in self.inverted_index else []
 
-        return sorted(results, key=lambda a: a["score"], reverse=True)
+        if _is_prefix_clause(clause):
+            return self._expand_prefix(term[:-1], max_expansions)
 
-    def serialize(self):
-        """Returns a serialized index as a dict following lunr-schema."""
+        if _is_fuzzy_clause(clause):
+            automaton = LevenshteinAutomaton(term, clause.edit_distance)
+            return automaton.intersect(self.token_set)
+
+        if self.ngram_index is not None and not clause.edit_distance:
+            # Intersecting a token set of only the matching terms returns
+            # them in the same order as intersecting the full token set.
+            expanded_terms = sorted(self.ngram_index.expand(term))
+            term_token_set = TokenSet.from_clause(clause)
+            return (
+                TokenSet.from_list(expanded_terms).intersect(term_token_set).to_list()
+            )
+
+        term_token_set = TokenSet.from_clause(clause)
+        return self.token_set.intersect(term_token_set).to_list()
+
+    def create_ngram_index(self, n=3):
+        """Creates an n-gram index of the terms in the index to speed up
+        queries with leading or infix wildcards, e.g. `*ing` or `*serv*`.
+
+        Without it these terms are expanded by intersecting the token set of
+        the index, which for a leading wildcard visits every one of its
+        nodes. Use `lunr.ngram_index.NgramIndex.estimate_memory` on the
+        inverted index to estimate the memory it will take beforehand.
+
+        Args:
+            n (int, optional): The length of the grams, defaults to 3.
+
+        Returns:
+            NgramIndex: The created n-gram index.
+        """
+        self.ngram_index = NgramIndex(self._sorted_terms, n)
+        return self.ngram_index
+
+    def _expand_prefix(self, prefix, max_expansions=None):
+        """Returns the terms in the index starting with a prefix.
+
+        The terms are returned in the same order as intersecting token sets
+        would, a depth first traversal visiting edges in reverse order.
+        """
+        terms = self._sorted_terms
+        start = bisect_left(terms, prefix)
+        end = len(terms)
+        if prefix and prefix[-1] != _MAX_CHAR:
+            end = bisect_left(terms, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+
+        expanded_terms = []
+        for i in range(start, end):
+            term = terms[i]
+            if not term.startswith(prefix):
+                break
+            # The empty string never matches when intersecting token sets
+            if term:
+                expanded_terms.append(term)
+                if len(expanded_terms) == max_expansions:
+                    break
+
+        expanded_terms.sort(key=_traversal_order)
+        return expanded_terms
+
+    def _score(self, doc_id, fields, query_vectors):
+        """Scores a document from its matching fields.
+
+        Scores are calculated by field, using the query vectors, and combined
+        into a final document score using addition.
+        """
+        score = 0
+        for field in fields:
+            field_vector = self._field_vectors_by_doc_id[field][doc_id]
+            score += query_vectors[field].similarity(
+                field_vector, self.field_magnitudes[field][doc_id]
+            )
+
+        return score
+
+    def _score_vectorized(self, document_fields, query_vectors):
+        """Scores the documents from their matching fields, calculating the
+        similarities of all the documents matching each field at once.
+
+        The similarities are added in the same order as `_score` does, so the
+        scores are identical.
+        """
+        doc_ids_by_field = defaultdict(list)
+        for doc_id, fields in document_fields.items():
+            for field in fields:
+                doc_ids_by_field[field].append(doc_id)
+
+        field_similarities = {}
+        for field, doc_ids in doc_ids_by_field.items():
+            query_vector = query_vectors[field]
+            if query_vector.magnitude == 0:
+                similarities = [0] * len(doc_ids)
+            else:
+                matrix = self._field_matrix(field)
+                similarities = matrix.similarities(query_vector, doc_ids)
+
+            field_similarities[field] = dict(zip(doc_ids, similarities))
+
+        scores = {}
+        for doc_id, fields in document_fields.items():
+            score = 0
+            for field in fields:
+                score += field_similarities[field][doc_id]
+
+            scores[doc_id] = score
+
+        return scores
+
+    def _field_matrix(self, field):
+        """Returns the sparse matrix of the field vectors of a field, creating
+        it on first use."""
+        try:
+            return self._field_matrices[field]
+        except KeyError:
+            field_vectors = self._field_vectors_by_doc_id[field]
+            if hasattr(field_vectors, "field_matrix"):
+                # Binary indexes create the matrix over the mapped file
+                matrix = field_vectors.field_matrix()
+            else:
+                matrix = FieldMatrix(field_vectors)
+            self._field_matrices[field] = matrix
+            return matrix
+
+    def _score_pruned(self, document_fields, query_vectors, scoring_postings, limit):
+        """Scores only the documents that may be part of the top `limit`
+        results.
+
+        The contribution of a term to the similarity of a field is at most the
+        query weight of the term times the maximum score of the term in that
+        field, normalized by the magnitude of the query vector. Adding these
+        bounds for every term a document matches gives an upper bound for its
+        score. Documents are then scored in decreasing order of their upper
+        bound until it falls below the lowest of the best `limit` scores.
+        """
+        if limit <= 0:
+            return {}
+
+        upper_bounds = defaultdict(float)
+        for field, term_index, doc_ids in scoring_postings:
+            query_vector = query_vectors[field]
+            if query_vector.magnitude == 0:
+                continue
+
+            position = bisect_left(query_vector.indexes, term_index)
+            term_bound = (
+                query_vector.values[position]
+                * self.max_term_scores[field][term_index]
+                / query_vector.magnitude
+            )
+            for doc_id in doc_ids:
+                upper_bounds[doc_id] += term_bound
+
+        candidates = [
+            (-upper_bounds[doc_id], order, doc_id)
+            for order, doc_id in enumerate(document_fields)
+        ]
+        heapq.heapify(candidates)
+
+        top_scores = []
+        evaluated = {}
+        while candidates:
+            upper_bound, order, doc_id = heapq.heappop(candidates)
+            # Allow some leeway for floating point errors in the bounds
+            if len(top_scores) == limit and -upper_bound * (1 + 1e-9) < top_scores[0]:
+                break
+
+            score = self._score(doc_id, document_fields[doc_id], query_vectors)
+            evaluated[doc_id] = score
+            if len(top_scores) < limit:
+                heapq.heappush(top_scores, score)
+            elif score > top_scores[0]:
+                heapq.heapreplace(top_scores, score)
+
+        return {
+            doc_id: evaluated[doc_id]
+            for doc_id in document_fields
+            if doc_id in evaluated
+        }
+
+    @staticmethod
+    def _index_field_vectors(field_vectors, inverted_index):
+        """Arranges the field vectors in lists per field indexed by doc id."""
+        # Field vectors mapped from a binary index are already arranged so
+        if hasattr(field_vectors, "by_doc_id"):
+            return field_vectors.by_doc_id()
+
+        entries = []
+        for ref, vector in field_vectors.items():
+            field_ref = FieldRef.from_string(ref)
+            doc_id = inverted_index.intern(field_ref.doc_ref)
+            entries.append((field_ref.field_name, doc_id, vector))
+
+        document_count = len(inverted_index.doc_refs)
+        field_vectors_by_doc_id = defaultdict(lambda: [None] * document_count)
+        for field_name, doc_id, vector in entries:
+            field_vectors_by_doc_id[field_name][doc_id] = vector
+
+        return field_vectors_by_doc_id
+
+    @staticmethod
+    def _calculate_field_magnitudes(field_vectors_by_doc_id, fields, document_count):
+        """Calculates the magnitude of every field vector, as arrays indexed
+        by doc id per field, so they are not calculated while querying."""
+        field_magnitudes = {}
+        for field in fields:
+            magnitudes = field_magnitudes[field] = array("d", [0]) * document_count
+            for doc_id, vector in enumerate(field_vectors_by_doc_id[field]):
+                if vector is not None:
+                    magnitudes[doc_id] = vector.magnitude
+
+        return field_magnitudes
+
+    @staticmethod
+    def _calculate_max_term_scores(field_vectors_by_doc_id, fields, term_count):
+        """Calculates the maximum score of each term in each field, as arrays
+        indexed by term index per field, used as upper bounds when pruning."""
+        max_term_scores = {}
+        for field in fields:
+            field_scores = max_term_scores[field] = array("d", [0]) * term_count
+            for vector in field_vectors_by_doc_id[field]:
+                if vector is None:
+                    continue
+                for term_index, score in zip(vector.indexes, vector.values):
+                    if score > field_scores[term_index]:
+                        field_scores[term_index] = score
+
+        return max_term_scores
+
+    def serialize(self, include_token_set=False):
+        """Returns a serialized index as a dict following lunr-schema.
+
+        Args:
+            include_token_set (bool, optional): Include the minimized token
+                set as a flat node and edge table under the `tokenSet` key,
+                an extension ignored by Lunr.js that allows `load` to skip
+                rebuilding the token set from the terms of the index.
+        """
         from lunr import __TARGET_JS_VERSION__
 
         inverted_index = [
             [term, self.inverted_index[term]] for term in sorted(self.inverted_index)
         ]
+
+        # Deleted documents are dropped, terms are kept even if they no longer
+        # have postings as they define the dimensions of the field vectors.
+        deleted_refs = set()
+        if self._tombstones:
+            doc_refs = self.inverted_index.doc_refs
+            deleted_refs = {doc_refs[doc_id] for doc_id in self._tombstones}
+            for _, posting in inverted_index:
+                for field in self.fields:
+                    for doc_ref in deleted_refs.intersection(posting[field]):
+                        del posting[field][doc_ref]
+
         field_vectors = [
-            [ref, vector.serialize()] for ref, vector in self.field_vectors.items()
+            [ref, vector.serialize()]
+            for ref, vector in self.field_vectors.items()
+            if not deleted_refs or FieldRef.from_string(ref).doc_ref not in deleted_refs
         ]
 
         # CamelCased keys for compatibility with JS version
-        return {
+        serialized_index = {
             "version": __TARGET_JS_VERSION__,
             "fields": self.fields,
             "fieldVectors": field_vectors,
@@ -332,9 +848,59 @@ class Index:
             "pipeline": self.pipeline.serialize(),
         }
 
+        if include_token_set:
+            finals, edge_offsets, edge_labels, edge_targets = self.token_set.flatten()
+            serialized_index["tokenSet"] = {
+                "finals": finals,
+                "edgeOffsets": edge_offsets,
+                "edgeLabels": "".join(edge_labels),
+                "edgeTargets": edge_targets,
+            }
+
+        return serialized_index
+
+    def save_binary(self, path):
+        """Saves the index to a file in a compact binary format that can be
+        opened with `lunr.Index.open`.
+
+        The binary format is specific to lunr.py, use `serialize` to produce
+        an index readable by Lunr.js. Deleted documents are dropped, as in
+        `serialize`.
+        """
+        from lunr.binary_index import save_binary
+
+        index = self
+        if self._tombstones:
+            index = Index.load(self.serialize(include_token_set=True))
+
+        save_binary(index, path)
+
     @classmethod
-    def load(cls, serialized_index):
-        """Load a serialized index"""
+    def open(cls, path):
+        """Opens an index saved with `save_binary`.
+
+        The file is memory mapped and read lazily as the index is queried,
+        so opening is nearly instant regardless of the size of the index and
+        processes opening the same file share its memory.
+        """
+        from lunr.binary_index import open_binary
+
+        return open_binary(path)
+
+    @classmethod
+    def load(cls, serialized_index, lazy_token_set=False):
+        """Load a serialized index.
+
+        If the index was serialized including its token set it is restored
+        directly from the flat node and edge table, otherwise the token set
+        is rebuilt from the terms in the inverted index.
+
+        Args:
+            serialized_index (dict or str): The serialized index.
+            lazy_token_set (bool, optional): Defer restoring or building the
+                token set until the first query with a wildcard or edit
+                distance, queries for plain terms do not need it.
+        """
         from lunr import __TARGET_JS_VERSION__
 
         if isinstance(serialized_index, str):
@@ -348,21 +914,124 @@ class Index:
             )
 
         field_vectors = {
-            ref: Vector(elements) for ref, elements in serialized_index["fieldVectors"]
+            ref: Vector.from_sorted_pairs(elements[::2], elements[1::2])
+            for ref, elements in serialized_index["fieldVectors"]
         }
 
-        tokenset_builder = TokenSetBuilder()
-        inverted_index = {}
+        # The postings are converted on first lookup, by which time `Index`
+        # has assigned document ids in the order of the field vectors.
+        inverted_index = InvertedIndex(serialized_index["fields"])
         for term, posting in serialized_index["invertedIndex"]:
-            tokenset_builder.insert(term)
-            inverted_index[term] = posting
+            inverted_index.add_lazy(term, posting)
 
-        tokenset_builder.finish()
+        token_set_factory = None
+        if "tokenSet" in serialized_index:
+            serialized_token_set = serialized_index["tokenSet"]
+            token_set_factory = partial(
+                TokenSet.from_flat,
+                serialized_token_set["finals"],
+                serialized_token_set["edgeOffsets"],
+                serialized_token_set["edgeLabels"],
+                serialized_token_set["edgeTargets"],
+            )
+
+            token_set = None if lazy_token_set else token_set_factory()
+        elif lazy_token_set:
+            token_set = None
+        else:
+            tokenset_builder = TokenSetBuilder()
+            for term in inverted_index:
+                tokenset_builder.insert(term)
+
+            tokenset_builder.finish()
+            token_set = tokenset_builder.root
 
-        return Index(
+        index = Index(
             fields=serialized_index["fields"],
             field_vectors=field_vectors,
             inverted_index=inverted_index,
-            token_set=tokenset_builder.root,
+            token_set=token_set,
             pipeline=Pipeline.load(serialized_index["pipeline"]),
         )
+        if token_set_factory is not None:
+            index._token_set_factory = token_set_factory
+
+        return index
+
+
+_MAX_CHAR = chr(0x10FFFF)
+
+
+class _QueryCache:
+    """Memoizes the search terms of query terms, their expansions and the
+    postings of the expanded terms for the queries run against an index."""
+
+    def __init__(self, index, max_expansions):
+        if max_expansions is not None and max_expansions < 1:
+            raise BaseLunrException(
+                "max_expansions must be at least 1, got {}".format(max_expansions)
+            )
+
+        self.index = index
+        self.max_expansions = max_expansions
+        self._search_terms = {}
+        self._expansions = {}
+        self._postings = {}
+
+    def search_terms(self, clause):
+        """Returns the terms of a clause after running the search pipeline."""
+        key = (clause.term, tuple(clause.fields))
+        try:
+            return self._search_terms[key]
+        except KeyError:
+            terms = self._search_terms[key] = self.index.pipeline.run_string(
+                clause.term, {"fields": clause.fields}
+            )
+            return terms
+
+    def expand_term(self, clause):
+        """Returns the terms in the index matching the term of a clause."""
+        key = (clause.term, clause.edit_distance)
+        try:
+            return self._expansions[key]
+        except KeyError:
+            expanded_terms = self._expansions[key] = self.index._expand_term(
+                clause, self.max_expansions
+            )
+            return expanded_terms
+
+    def lookup(self, term):
+        """Returns the term index and field postings of a term."""
+        try:
+            return self._postings[term]
+        except KeyError:
+            posting = self._postings[term] = self.index.inverted_index.lookup(term)
+            return posting
+
+
+def _is_exact_clause(clause):
+    """Whether a clause can only match its own term."""
+    return not clause.edit_distance and Query.WILDCARD not in clause.term
+
+
+def _is_prefix_clause(clause):
+    """Whether a clause matches the terms starting with its term, i.e. its
+    only wildcard is the trailing one."""
+    return (
+        not clause.edit_distance
+        and clause.term.endswith(Query.WILDCARD)
+        and Query.WILDCARD not in clause.term[:-1]
+    )
+
+
+def _is_fuzzy_clause(clause):
+    """Whether a clause matches terms within its edit distance and has no
+    wildcards."""
+    return clause.edit_distance and Query.WILDCARD not in clause.term
+
+
+def _traversal_order(term):
+    """Sort key placing terms in depth first traversal order of a token set
+    visiting edges in reverse order, as returned by `TokenSet.to_list` on an
+    intersection, i.e. descending except prefixes go first."""
+    return [-ord(char) for char in term]
@@ -0,0 +1,237 @@
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+
+EMPTY_FIELD_POSTING = (array("I"), None)
+
+
+class InvertedIndex(Mapping):
+    """A compact representation of the inverted index of a lunr.Index.
+
+    Document references are interned to dense integer ids, in the order they
+    are first seen, and the posting of each term and field is stored as a
+    sorted array of document ids. The metadata of each document is kept in a
+    parallel list, or None if no metadata was recorded for the posting, which
+    is the case unless the builder has a metadata whitelist.
+
+    To the outside the inverted index behaves as a read-only mapping of terms
+    to postings in the form defined by lunr-schema, i.e.
+    `{"field": {"doc_ref": metadata}, "_index": 0}`. These postings are
+    created on access and are mainly used for serialization.
+
+    Postings are never modified in place, changes replace them, so copies of
+    an index can share them. Postings added with `add_lazy` are kept in the
+    lunr-schema form until the term is first looked up.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.doc_refs = []
+        self.doc_ids = {}
+        self._postings = {}
+        self._sorted_terms = None
+
+    def __repr__(self):
+        return "<InvertedIndex terms={} documents={}>".format(
+            len(self._postings), len(self.doc_refs)
+        )
+
+    def __getitem__(self, term):
+        term_index, field_postings = self.lookup(term)
+        posting = {}
+        for field in self.fields:
+            doc_ids, metadata = field_postings.get(field, EMPTY_FIELD_POSTING)
+            posting[field] = {
+                self.doc_refs[doc_id]: {} if metadata is None else metadata[i]
+                for i, doc_id in enumerate(doc_ids)
+            }
+
+        posting["_index"] = term_index
+        return posting
+
+    def __iter__(self):
+        return iter(self._postings)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def __contains__(self, term):
+        return term in self._postings
+
+    @classmethod
+    def from_dict(cls, inverted_index, fields, doc_refs=()):
+        """Creates an InvertedIndex from a dict of postings as created by
+        lunr.Builder.
+
+        Args:
+            inverted_index (dict): Mapping of terms to lunr-schema postings.
+            fields (list): The fields of the index.
+            doc_refs (iterable, optional): Document references to intern
+                before adding the postings, defining the order of the ids.
+        """
+        index = cls(fields)
+        for doc_ref in doc_refs:
+            index.intern(doc_ref)
+
+        for term, posting in inverted_index.items():
+            index.add(term, posting)
+
+        return index
+
+    def copy(self):
+        """Returns a copy of the index, which is not affected by later changes
+        to the index and vice versa."""
+        index = self.__class__(self.fields)
+        index.doc_refs = list(self.doc_refs)
+        index.doc_ids = dict(self.doc_ids)
+        index._postings = dict(self._postings)
+        if self._sorted_terms is not None:
+            index._sorted_terms = list(self._sorted_terms)
+
+        return index
+
+    def intern(self, doc_ref):
+        """Returns the integer id for a document reference, assigning the
+        next available id if the reference has not been seen before."""
+        try:
+            return self.doc_ids[doc_ref]
+        except KeyError:
+            doc_id = self.doc_ids[doc_ref] = len(self.doc_refs)
+            self.doc_refs.append(doc_ref)
+            return doc_id
+
+    def add(self, term, posting):
+        """Adds a lunr-schema posting for a term to the index."""
+        self.add_field_postings(term, posting["_index"], self._convert(posting))
+
+    def add_lazy(self, term, posting):
+        """Adds a lunr-schema posting for a term which is only converted when
+        the term is first looked up, so loading a serialized index does not
+        need to convert the postings of terms that are never searched."""
+        if self._sorted_terms is not None and term not in self._postings:
+            insort(self._sorted_terms, term)
+
+        self._postings[term] = posting
+
+    def _convert(self, posting):
+        """Converts a lunr-schema posting to a dict of field names to tuples
+        of sorted document ids and metadata."""
+        doc_ids = self.doc_ids
+        field_postings = {}
+        for field, documents in posting.items():
+            if not documents or field == "_index":
+                continue
+
+            try:
+                field_doc_ids = array("I", map(doc_ids.__getitem__, documents))
+            except KeyError:
+                field_doc_ids = array("I", map(self.intern, documents))
+            metadata = None
+            if any(documents.values()):
+                metadata = list(documents.values())
+
+            # Documents are usually already in id order, e.g. when loading a
+            # serialized index, so they are only sorted if needed.
+            if len(field_doc_ids) > 1:
+                sorted_doc_ids = sorted(field_doc_ids)
+                if field_doc_ids.tolist() != sorted_doc_ids:
+                    if metadata is not None:
+                        order = sorted(
+                            range(len(field_doc_ids)), key=field_doc_ids.__getitem__
+                        )
+                        metadata = [metadata[i] for i in order]
+                    field_doc_ids = array("I", sorted_doc_ids)
+
+            field_postings[field] = (field_doc_ids, metadata)
+
+        return field_postings
+
+    def add_field_postings(self, term, term_index, field_postings):
+        """Adds the postings of a term in the form returned by `lookup`, a
+        dict of field names to tuples of sorted document ids and metadata."""
+        if self._sorted_terms is not None and term not in self._postings:
+            insort(self._sorted_terms, term)
+
+        self._postings[term] = (term_index, field_postings)
+
+    def add_document(self, term, term_index, field, doc_id, metadata):
+        """Adds a document to the posting of a term in a field, or replaces
+        its metadata if it is already in it."""
+        _, field_postings = (
+            self.lookup(term) if term in self._postings else (term_index, {})
+        )
+        doc_ids, field_metadata = field_postings.get(field, EMPTY_FIELD_POSTING)
+        position = bisect_left(doc_ids, doc_id)
+        present = position < len(doc_ids) and doc_ids[position] == doc_id
+
+        doc_ids = array("I", doc_ids)
+        if not present:
+            doc_ids.insert(position, doc_id)
+
+        if field_metadata is not None or metadata:
+            if field_metadata is None:
+                field_metadata = [{}] * (len(doc_ids) - 1)
+            else:
+                field_metadata = list(field_metadata)
+
+            if present:
+                field_metadata[position] = metadata
+            else:
+                field_metadata.insert(position, metadata)
+
+        field_postings = dict(field_postings)
+        field_postings[field] = (doc_ids, field_metadata)
+        self.add_field_postings(term, term_index, field_postings)
+
+    def remove_document(self, term, field, doc_id):
+        """Removes a document from the posting of a term in a field, the term
+        is removed from the index if it has no other postings."""
+        term_index, field_postings = self.lookup(term)
+        doc_ids, field_metadata = field_postings.get(field, EMPTY_FIELD_POSTING)
+        position = bisect_left(doc_ids, doc_id)
+        if position == len(doc_ids) or doc_ids[position] != doc_id:
+            return
+
+        field_postings = dict(field_postings)
+        if len(doc_ids) == 1:
+            del field_postings[field]
+            if not field_postings:
+                self.discard(term)
+                return
+        else:
+            doc_ids = array("I", doc_ids)
+            del doc_ids[position]
+            if field_metadata is not None:
+                field_metadata = list(field_metadata)
+                del field_metadata[position]
+            field_postings[field] = (doc_ids, field_metadata)
+
+        self._postings[term] = (term_index, field_postings)
+
+    def discard(self, term):
+        """Removes a term and its postings from the index if present."""
+        if self._postings.pop(term, None) is not None and self._sorted_terms:
+            del self._sorted_terms[bisect_left(self._sorted_terms, term)]
+
+    def sorted_terms(self):
+        """Returns a sequence of the terms in the index in sorted order."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+
+        return self._sorted_terms
+
+    def lookup(self, term):
+        """Returns a tuple of the term index and a dict of field names to
+        tuples of document ids and metadata for the term."""
+        postings = self._postings[term]
+        if type(postings) is dict:
+            # A posting added with `add_lazy`, converted on first lookup.
+            postings = (postings["_index"], self._convert(postings))
+            self._postings[term] = postings
+
+        return postings
+
+    def field_posting(self, term, field):
+        """Returns a tuple of the sorted document ids containing the term in
+        the field and their metadata, which may be None."""
+        return self.lookup(term)[1].get(field, EMPTY_FIELD_POSTING)
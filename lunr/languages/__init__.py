@@ -76,7 +76,9 @@ def get_nltk_builder(languages):
     builder = Builder()
     multi_trimmer = generate_trimmer("".join(sorted(all_word_characters)))
     Pipeline.register_function(
-        multi_trimmer, "lunr-multi-trimmer-{}".format("-".join(languages))
+        multi_trimmer,
+        "lunr-multi-trimmer-{}".format("-".join(languages)),
+        token_local=True,
     )
     builder.pipeline.reset()
 
@@ -92,7 +94,9 @@ def register_languages():
     """Register all supported languages to ensure compatibility."""
     for language in set(SUPPORTED_LANGUAGES) - {"en"}:
         language_stemmer = partial(nltk_stemmer, get_language_stemmer(language))
-        Pipeline.register_function(language_stemmer, "stemmer-{}".format(language))
+        Pipeline.register_function(
+            language_stemmer, "stemmer-{}".format(language), token_local=True
+        )
 
 
 if LANGUAGE_SUPPORT:  # pragma: no cover
@@ -0,0 +1,115 @@
+from lunr.token_set import TokenSet
+
+
+class LevenshteinAutomaton:
+    """A lazily evaluated automaton matching the strings within an edit
+    distance of a term.
+
+    It accepts exactly the strings matched by intersecting with the token set
+    created by `lunr.TokenSet.from_fuzzy_string`, where insertions, deletions,
+    substitutions and transpositions each count as one edit, but instead of
+    expanding every combination of edits upfront its states are computed as
+    it is stepped through the characters of a candidate string.
+
+    Each state is a frozenset of the possible `(remaining, edits)` pairs,
+    the part of the term left to match and the number of edits left. A state
+    is dead when the set is empty, meaning the edit budget is exhausted for
+    every alignment of the term, and no string continuing the current prefix
+    can match.
+    """
+
+    def __init__(self, term, edit_distance):
+        self.term = term
+        self.edit_distance = edit_distance
+        self._transitions = {}
+
+    def start(self):
+        """Returns the initial state of the automaton."""
+        return self._close([(self.term, self.edit_distance)])
+
+    def step(self, state, char):
+        """Returns the state reached from `state` reading `char`."""
+        key = (state, char)
+        try:
+            return self._transitions[key]
+        except KeyError:
+            pass
+
+        pairs = []
+        for remaining, edits in state:
+            if remaining and remaining[0] == char:
+                pairs.append((remaining[1:], edits))
+
+            if not edits:
+                continue
+
+            # insertion of char
+            pairs.append((remaining, edits - 1))
+            if remaining:
+                # substitution of the next character by char
+                pairs.append((remaining[1:], edits - 1))
+
+            if len(remaining) > 1 and remaining[1] == char:
+                # transposition of the next two characters
+                pairs.append((remaining[0] + remaining[2:], edits - 1))
+
+        next_state = self._transitions[key] = self._close(pairs)
+        return next_state
+
+    @staticmethod
+    def is_match(state):
+        """Whether the prefix read to reach `state` is a match."""
+        return any(
+            not remaining or (len(remaining) == 1 and edits)
+            for remaining, edits in state
+        )
+
+    def intersect(self, token_set):
+        """Returns the terms in a token set matching the automaton.
+
+        The token set is traversed depth first, abandoning any branch as soon
+        as the automaton reaches a dead state. The terms are returned in the
+        same order as intersecting with the token set created by
+        `lunr.TokenSet.from_fuzzy_string`, which decides how documents with
+        equal scores are ranked, by intersecting a token set of only the
+        matching terms with it.
+        """
+        matches = []
+        stack = [("", token_set, self.start())]
+        while stack:
+            prefix, node, state = stack.pop()
+            # The empty string never matches when intersecting token sets
+            if prefix and node.final and self.is_match(state):
+                matches.append(prefix)
+
+            for char, child in node.edges.items():
+                next_state = self.step(state, char)
+                if next_state:
+                    stack.append((prefix + char, child, next_state))
+
+        if len(matches) < 2:
+            return matches
+
+        # Branches of the full token set without matches are dropped from the
+        # traversal of the intersection, the order of the others is the same.
+        matches.sort()
+        return (
+            TokenSet.from_list(matches)
+            .intersect(TokenSet.from_fuzzy_string(self.term, self.edit_distance))
+            .to_list()
+        )
+
+    @staticmethod
+    def _close(pairs):
+        """Adds the pairs reachable by deleting characters of the term."""
+        closed = set()
+        while pairs:
+            remaining, edits = pair = pairs.pop()
+            if pair in closed:
+                continue
+
+            closed.add(pair)
+            if edits and len(remaining) > 1:
+                pairs.append((remaining[1:], edits - 1))
+
+        return frozenset(closed)
@@ -5,7 +5,7 @@ from lunr.trimmer import trimmer
 from lunr.stop_word_filter import stop_word_filter
 
 
-def lunr(ref, fields, documents, languages=None, builder=None):
+def lunr(ref, fields, documents, languages=None, builder=None, workers=None):
     """A convenience function to configure and construct a lunr.Index.
 
     Args:
@@ -16,11 +16,16 @@ def lunr(ref, fields, documents, languages=None, builder=None):
             defining a boost to be applied to the field, and `extractor`
             a callable taking the document as a single argument and returning
             a string located in the document in a particular way.
-        documents (list): The list of dictonaries representing the documents
+        documents (iterable): The dictonaries representing the documents
             to index. Optionally a 2-tuple of dicts, the first one being
             the document and the second the associated attributes to it.
+            Any iterable is accepted and consumed lazily, e.g. a generator.
         languages (str or list, optional): The languages to use if using
             NLTK language support, ignored if NLTK is not available.
+        builder (Builder, optional): The builder to use instead of the
+            default one.
+        workers (int, optional): The number of processes used to process
+            the documents in parallel, see `Builder.add_many`.
 
     Returns:
         Index: The populated Index ready to search against.
@@ -33,11 +38,7 @@ def lunr(ref, fields, documents, languages=None, builder=None):
         else:
             builder.field(field)
 
-    for document in documents:
-        if isinstance(document, (tuple, list)):
-            builder.add(document[0], attributes=document[1])
-        else:
-            builder.add(document)
+    builder.add_many(documents, workers=workers)
 
     return builder.build()
 
@@ -0,0 +1,161 @@
+from array import array
+
+try:  # pragma: no cover
+    import numpy as np  # type: ignore
+
+    NUMPY_SUPPORT = True
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+    NUMPY_SUPPORT = False
+
+
+class FieldMatrix:
+    """The field vectors of a single field as a sparse matrix in compressed
+    sparse row (CSR) format, rows being documents and columns term indexes.
+
+    Used to calculate the similarity of a query vector against the field
+    vectors of many documents at once. The products are accumulated in the
+    same order as `lunr.Vector.dot` does, so the similarities are identical
+    to those calculated by `lunr.Vector.similarity`.
+
+    Rows can be overridden by a vector, e.g. for documents changed since the
+    matrix was created, whose similarities are then calculated with the
+    vector instead.
+
+    Requires NumPy, check `lunr.matrix.NUMPY_SUPPORT` before creating one.
+
+    Args:
+        field_vectors (sequence): The field vectors of the field indexed by
+            document id, None for documents without the field.
+    """
+
+    def __init__(self, field_vectors):
+        indptr = [0]
+        indices = array("I")
+        data = array("d")
+        for vector in field_vectors:
+            if vector is not None:
+                indices.extend(vector.indexes)
+                data.extend(vector.values)
+
+            indptr.append(len(indices))
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.data = np.array(data, dtype=np.float64)
+        self.overrides = {}
+        self._shared_data = False
+
+    @classmethod
+    def from_buffers(cls, indptr, indices, data):
+        """Creates a matrix over existing buffers without copying the elements,
+        e.g. the memory mapped sections of a binary index.
+
+        Args:
+            indptr (buffer): The offsets of the elements of each row in
+                `indices` and `data`, one more than the number of rows.
+            indices (buffer): The term indexes of the elements as unsigned
+                32 bit integers.
+            data (buffer): The values of the elements as doubles.
+        """
+        matrix = cls.__new__(cls)
+        # Only the row offsets are copied, to the signed integers NumPy
+        # requires to repeat them
+        matrix.indptr = np.frombuffer(indptr, dtype=np.uint64).astype(np.int64)
+        matrix.indices = np.frombuffer(indices, dtype=np.uint32)
+        matrix.data = np.frombuffer(data, dtype=np.float64)
+        matrix.overrides = {}
+        matrix._shared_data = True
+        return matrix
+
+    def __repr__(self):
+        return "<FieldMatrix rows={} nonzero={}>".format(
+            len(self.indptr) - 1, len(self.data)
+        )
+
+    def copy(self):
+        """Returns a copy of the matrix sharing its elements until either of
+        them updates a row."""
+        matrix = self.__class__.__new__(self.__class__)
+        matrix.indptr = self.indptr
+        matrix.indices = self.indices
+        matrix.data = self.data
+        matrix.overrides = dict(self.overrides)
+        matrix._shared_data = self._shared_data = True
+        return matrix
+
+    def override_row(self, row, vector):
+        """Overrides a row with a vector, or None for a document without the
+        field."""
+        self.overrides[row] = vector
+
+    def update_row(self, row, vector):
+        """Updates the values of a row from a vector with the same term
+        indexes, e.g. recalculated with new statistics."""
+        if row in self.overrides:
+            self.overrides[row] = vector
+            return
+
+        if self._shared_data:
+            self.data = self.data.copy()
+            self._shared_data = False
+
+        self.data[self.indptr[row] : self.indptr[row + 1]] = vector.values
+
+    def similarities(self, query_vector, doc_ids):
+        """Calculates the cosine similarity of a query vector with the field
+        vectors of the documents, as defined by `lunr.Vector.similarity`.
+
+        Args:
+            query_vector (lunr.Vector): The query vector of the field.
+            doc_ids (list): The ids of the documents to score.
+
+        Returns:
+            list: The similarity of each of the documents.
+        """
+        magnitude = query_vector.magnitude
+        if magnitude == 0:
+            return [0] * len(doc_ids)
+
+        overrides = self.overrides
+        if overrides and not overrides.keys().isdisjoint(doc_ids):
+            rows = [doc_id for doc_id in doc_ids if doc_id not in overrides]
+            similarities = dict(zip(rows, self._similarities(query_vector, rows)))
+            for doc_id in doc_ids:
+                if doc_id in overrides:
+                    vector = overrides[doc_id]
+                    similarities[doc_id] = (
+                        0 if vector is None else query_vector.similarity(vector)
+                    )
+
+            return [similarities[doc_id] for doc_id in doc_ids]
+
+        return self._similarities(query_vector, doc_ids)
+
+    def _similarities(self, query_vector, doc_ids):
+        magnitude = query_vector.magnitude
+        rows = np.array(doc_ids, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+
+        # Positions in indices and data of the elements of every row, in row
+        # order and increasing term index within each row
+        row_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(starts, lengths) + np.arange(total) - row_offsets
+        columns = self.indices[positions]
+
+        query_indices = np.array(query_vector.indexes, dtype=np.int64)
+        query_values = np.array(query_vector.values, dtype=np.float64)
+        matches = np.searchsorted(query_indices, columns)
+        matches[matches == len(query_indices)] = 0
+        weights = np.where(
+            query_indices[matches] == columns, query_values[matches], 0.0
+        )
+
+        dot_products = np.bincount(
+            np.repeat(np.arange(len(rows)), lengths),
+            weights=weights * self.data[positions],
+            minlength=len(rows),
+        )
+        return (dot_products / magnitude).tolist()
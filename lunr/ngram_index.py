@@ -0,0 +1,113 @@
+from array import array
+from collections import defaultdict
+import re
+import sys
+
+from lunr.query import Query
+
+# Marks the start and end of a term so grams can anchor a pattern to them
+START = "\x02"
+END = "\x03"
+
+
+class NgramIndex:
+    """An auxiliary index of the character n-grams of the terms of an index.
+
+    Wildcard terms with a leading or infix wildcard, e.g. `*ing` or
+    `*serv*`, match terms anywhere in the token set, forcing its intersection
+    to visit every node. Instead, the literal parts of the pattern are split
+    into n-grams, the terms containing all of them are found by intersecting
+    their postings and the few candidates are checked against the pattern.
+
+    Terms are padded with start and end markers before being split so that
+    the literal parts anchored to the start or end of the pattern produce
+    grams even if they are shorter than `n`, e.g. `*ng` matches the gram
+    `"ng" + END`.
+
+    Args:
+        terms (sequence): The sorted terms of the index, the postings refer
+            to terms by their position in the sequence.
+        n (int, optional): The length of the grams, defaults to 3.
+    """
+
+    def __init__(self, terms, n=3):
+        self.terms = terms
+        self.n = n
+        postings = defaultdict(list)
+        for position, term in enumerate(terms):
+            for gram in set(self._grams(START + term + END, n)):
+                postings[gram].append(position)
+
+        self.postings = {gram: array("I", ids) for gram, ids in postings.items()}
+
+    def __repr__(self):
+        return "<NgramIndex n={} grams={}>".format(self.n, len(self.postings))
+
+    @classmethod
+    def estimate_memory(cls, terms, n=3):
+        """Estimates the size in bytes of an n-gram index for the terms
+        without building it, to decide whether it is worth creating."""
+        counts = defaultdict(int)
+        for term in terms:
+            for gram in set(cls._grams(START + term + END, n)):
+                counts[gram] += 1
+
+        return _memory_usage(counts.items())
+
+    def memory_usage(self):
+        """Returns the approximate size in bytes of the index."""
+        return _memory_usage(
+            (gram, len(posting)) for gram, posting in self.postings.items()
+        )
+
+    def expand(self, pattern):
+        """Returns the terms matching a wildcard pattern.
+
+        If the literal parts of the pattern are too short to produce any
+        gram, e.g. `*a*`, every term is checked against the pattern, which is
+        still much faster than intersecting the token set.
+        """
+        parts = pattern.split(Query.WILDCARD)
+        grams = set(self._grams(START + parts[0], self.n))
+        grams.update(self._grams(parts[-1] + END, self.n))
+        for part in parts[1:-1]:
+            grams.update(self._grams(part, self.n))
+
+        if grams:
+            postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(posting)
+        else:
+            candidates = range(len(self.terms))
+
+        regex = re.compile(".*".join(re.escape(part) for part in parts), re.DOTALL)
+        matches = []
+        for position in candidates:
+            term = self.terms[position]
+            # The empty string never matches when intersecting token sets
+            if term and regex.fullmatch(term):
+                matches.append(term)
+
+        return matches
+
+    @staticmethod
+    def _grams(string, n):
+        return (string[i : i + n] for i in range(len(string) - n + 1))
+
+
+def _memory_usage(gram_counts):
+    """Approximates the memory used by a dict of grams to arrays of 32 bit
+    integers from the number of ids in each posting."""
+    empty_array = sys.getsizeof(array("I"))
+    size = 0
+    grams = 0
+    for gram, count in gram_counts:
+        size += sys.getsizeof(gram) + empty_array + 4 * count
+        grams += 1
+
+    # Each dict entry costs roughly a hash, key and value pointer plus the
+    # sparse index table.
+    return size + sys.getsizeof({}) + grams * 3 * 8 * 3 // 2
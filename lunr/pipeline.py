@@ -1,6 +1,7 @@
 from collections import defaultdict
+from itertools import chain
 import logging
-from typing import Callable, Dict, List, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from lunr.exceptions import BaseLunrException
 from lunr.token import Token
@@ -16,9 +17,15 @@ class Pipeline:
 
     registered_functions: Dict[str, Callable] = {}
 
-    def __init__(self):
+    def __init__(self, cache_size=100000):
         self._stack: List[Callable] = []
         self._skip: Dict[Callable, Set[str]] = defaultdict(set)
+        # The maximum number of distinct (token string, field name) results
+        # cached by `run` when every function applied is token local
+        self.cache_size = cache_size
+        self._cache: Dict[Tuple[str, Optional[str]], Tuple[str, ...]] = {}
+        self._token_local: Dict[Optional[str], bool] = {}
+        self._compiled: Dict[Optional[str], Callable] = {}
 
     def __len__(self):
         return len(self._stack)
@@ -26,16 +33,62 @@ class Pipeline:
     def __repr__(self):
         return '<Pipeline stack="{}">'.format(",".join(fn.label for fn in self._stack))
 
+    def __reduce_ex__(self, protocol):
+        # Registered functions are often closures, e.g. the stop word filters,
+        # which cannot be pickled, so pipelines of registered functions are
+        # pickled by label and loaded from the registered functions, like
+        # serialized indexes are.
+        skip = {
+            fn: field_names for fn, field_names in self._skip.items() if field_names
+        }
+        if all(self._is_registered(fn) for fn in chain(self._stack, skip)):
+            return (
+                _load_pipeline,
+                (
+                    self.serialize(),
+                    {fn.label: sorted(field_names) for fn, field_names in skip.items()},
+                    self.cache_size,
+                ),
+            )
+
+        return super().__reduce_ex__(protocol)
+
+    def __getstate__(self):
+        # Compiled pipelines are closures which cannot be pickled
+        state = self.__dict__.copy()
+        state["_compiled"] = {}
+        return state
+
+    @classmethod
+    def _is_registered(cls, fn):
+        label = getattr(fn, "label", None)
+        return label is not None and cls.registered_functions.get(label) is fn
+
     # TODO: add iterator methods?
 
     @classmethod
-    def register_function(cls, fn, label=None):
-        """Register a function with the pipeline."""
+    def register_function(cls, fn, label=None, token_local=False, batch=False):
+        """Register a function with the pipeline.
+
+        Functions whose result only depends on the string of the token, not
+        on its metadata, position or the other tokens, and which do not change
+        the metadata of the token, can be declared `token_local`. The results
+        of pipelines made only of token local functions are cached when
+        running them with `cache=True`.
+
+        Functions processing the whole list of tokens at once, taking the
+        list and returning the list of resulting tokens, are registered with
+        `batch=True`. A function processing one token at a time can instead
+        pass an equivalent function processing a list of tokens as `batch`,
+        which pipelines call in its place.
+        """
         label = label or fn.__name__
         if label in cls.registered_functions:
             log.warning("Overwriting existing registered function %s", label)
 
         fn.label = label
+        fn.token_local = token_local
+        fn.batch = fn if batch is True else batch or None
         cls.registered_functions[fn.label] = fn
 
     @classmethod
@@ -61,11 +114,16 @@ class Pipeline:
         - Token: A lunr.Token object which will be updated
         - i: The index of the token in the set
         - tokens: A list of tokens representing the set
+
+        Unless they were registered as batch functions, which accept the list
+        of tokens, see `register_function`.
         """
         for fn in args:
             self.warn_if_function_not_registered(fn)
             self._stack.append(fn)
 
+        self._invalidate()
+
     def warn_if_function_not_registered(self, fn):
         try:
             return fn.label in self.registered_functions
@@ -87,6 +145,8 @@ class Pipeline:
         except ValueError as e:
             raise BaseLunrException("Cannot find existing_fn") from e
 
+        self._invalidate()
+
     def before(self, existing_fn, new_fn):
         """Adds a single function before a function that already exists in the
         pipeline.
@@ -99,12 +159,16 @@ class Pipeline:
         except ValueError as e:
             raise BaseLunrException("Cannot find existing_fn") from e
 
+        self._invalidate()
+
     def remove(self, fn):
         """Removes a function from the pipeline."""
         try:
             self._stack.remove(fn)
         except ValueError:
             pass
+        else:
+            self._invalidate()
 
     def skip(self, fn: Callable, field_names: List[str]):
         """
@@ -113,8 +177,70 @@ class Pipeline:
         This relies on passing the field name to Pipeline.run().
         """
         self._skip[fn].update(field_names)
+        self._invalidate()
 
-    def run(self, tokens, field_name=None):
+    def is_token_local(self, field_name=None):
+        """Whether every function applied to the tokens of a field is token
+        local, see `register_function`."""
+        try:
+            return self._token_local[field_name]
+        except KeyError:
+            token_local = all(
+                getattr(fn, "token_local", False)
+                for fn in self._functions_for(field_name)
+            )
+            self._token_local[field_name] = token_local
+            return token_local
+
+    def _functions_for(self, field_name):
+        """Returns the functions not skipped for a field."""
+        if not field_name:
+            return list(self._stack)
+
+        return [fn for fn in self._stack if field_name not in self._skip.get(fn, ())]
+
+    def compile(self, field_name=None):
+        """Returns a function running the pipeline on a list of tokens of a
+        field, equivalent to `run(tokens, field_name)`.
+
+        The functions skipped for the field are left out, batch functions are
+        called on the whole list and consecutive token local functions are
+        fused, applying all of them to each token in a single pass. The
+        compiled function is reused until the functions of the pipeline
+        change.
+        """
+        try:
+            return self._compiled[field_name]
+        except KeyError:
+            pass
+
+        stages = []
+        fused: List[Callable] = []
+        for fn in self._functions_for(field_name):
+            batch = getattr(fn, "batch", None)
+            if batch is None and getattr(fn, "token_local", False):
+                fused.append(fn)
+                continue
+
+            if fused:
+                stages.append(_fuse(fused))
+                fused = []
+            stages.append(batch if batch is not None else _fuse([fn]))
+
+        if fused:
+            stages.append(_fuse(fused))
+
+        if not stages:
+            compiled = _identity
+        elif len(stages) == 1:
+            compiled = stages[0]
+        else:
+            compiled = _chain(stages)
+
+        self._compiled[field_name] = compiled
+        return compiled
+
+    def run(self, tokens, field_name=None, cache=False):
         """
         Runs the current list of functions that make up the pipeline against
         the passed tokens.
@@ -122,26 +248,36 @@ class Pipeline:
         :param tokens: The tokens to process.
         :param field_name: The name of the field these tokens belongs to, can be ommited.
             Used to skip some functions based on field names.
+        :param cache: Reuse the results of previous runs for tokens with the
+            same string and field name if every function is token local. The
+            tokens must be `Token` instances, on a cache hit their string is
+            updated and tokens they expand to share their metadata.
         """
-        for fn in self._stack:
-            # Skip the function based on field name.
-            if field_name and field_name in self._skip[fn]:
-                continue
-            results = []
-            for i, token in enumerate(tokens):
-                # JS ignores additional arguments to the functions but we
-                # force pipeline functions to declare (token, i, tokens)
-                # or *args
-                result = fn(token, i, tokens)
-                if not result:
-                    continue
-                if isinstance(result, (list, tuple)):  # simulate Array.concat
-                    results.extend(result)
-                else:
-                    results.append(result)
-            tokens = results
+        if cache and self.is_token_local(field_name):
+            return self._run_cached(tokens, field_name)
 
-        return tokens
+        return self.compile(field_name)(tokens)
+
+    def _run_cached(self, tokens, field_name):
+        cache = self._cache
+        results = []
+        for token in tokens:
+            key = (token.string, field_name)
+            strings = cache.get(key)
+            if strings is None:
+                # Token local functions give the same results for a token
+                # whether it is processed on its own or with the others
+                processed = self.run([token], field_name)
+                if len(cache) < self.cache_size:
+                    cache[key] = tuple(str(result) for result in processed)
+                results.extend(processed)
+            elif strings:
+                token.string = strings[0]
+                results.append(token)
+                for string in strings[1:]:
+                    results.append(Token(string, token.metadata))
+
+        return results
 
     def run_string(self, string, metadata=None):
         """Convenience method for passing a string through a pipeline and
@@ -156,6 +292,81 @@ class Pipeline:
 
     def reset(self):
         self._stack = []
+        self._invalidate()
+
+    def _invalidate(self):
+        """Clears the results cached by `run` and the compiled pipelines after
+        the functions change."""
+        self._cache = {}
+        self._token_local = {}
+        self._compiled = {}
 
     def serialize(self):
         return [fn.label for fn in self._stack]
+
+
+def _load_pipeline(serialised, skip, cache_size):
+    """Loads a pickled pipeline, see `Pipeline.__reduce_ex__`."""
+    pipeline = Pipeline.load(serialised)
+    pipeline.cache_size = cache_size
+    for label, field_names in skip.items():
+        pipeline.skip(Pipeline.registered_functions[label], field_names)
+
+    return pipeline
+
+
+def _identity(tokens):
+    return tokens
+
+
+def _chain(stages):
+    def run_stages(tokens):
+        for stage in stages:
+            tokens = stage(tokens)
+        return tokens
+
+    return run_stages
+
+
+def _fuse(fns):
+    """Returns a function applying per token functions to a list of tokens in
+    a single pass, each token going through every function before the next.
+
+    Functions other than the first receive the index of the token and the
+    list of tokens passed to the first, so only the first may depend on them.
+    """
+    count = len(fns)
+
+    def expand(results, expanded_tokens, start, i, tokens):
+        # Array.concat: the tokens a function expands to go through the
+        # remaining functions
+        for token in expanded_tokens:
+            for position in range(start, count):
+                token = fns[position](token, i, tokens)
+                if not token:
+                    break
+                if isinstance(token, (list, tuple)):
+                    expand(results, token, position + 1, i, tokens)
+                    break
+            else:
+                results.append(token)
+
+    def run_fused(tokens):
+        results = []
+        for i, token in enumerate(tokens):
+            # JS ignores additional arguments to the functions but we
+            # force pipeline functions to declare (token, i, tokens)
+            # or *args
+            for position, fn in enumerate(fns):
+                token = fn(token, i, tokens)
+                if not token:
+                    break
+                if isinstance(token, (list, tuple)):  # simulate Array.concat
+                    expand(results, token, position + 1, i, tokens)
+                    break
+            else:
+                results.append(token)
+
+        return results
+
+    return run_fused
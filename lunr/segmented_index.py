@@ -0,0 +1,730 @@
+import copy
+import math
+import threading
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from functools import lru_cache, partial
+
+from lunr.exceptions import BaseLunrException
+from lunr.field_ref import FieldRef
+from lunr.idf import idf_from_document_frequency
+from lunr.index import Index
+from lunr.inverted_index import InvertedIndex
+from lunr.query import Query
+from lunr.token_set import TokenSet
+from lunr.vector import Vector
+
+
+class Segment:
+    """An immutable batch of documents of a `SegmentedIndex`.
+
+    A segment holds the term frequencies and postings of its documents, as
+    collected by a `lunr.Builder`, and the set of references of the documents
+    deleted since the segment was created, which are deleted from the index
+    of the segment, see `lunr.Index.delete`, and purged when the segment is
+    merged.
+
+    The postings of the builder must have their global term indexes. They
+    are converted to a `lunr.InvertedIndex` and the term frequencies, field
+    lengths and boosts of the documents are arranged by doc id, which is all
+    that is needed to score the documents with the statistics of any
+    generation of the index. For pruning, the highest term frequency and the
+    shortest field length among the documents having each term in a field
+    bound the scores of the term in that field.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.deleted = set()
+        fields = list(builder._fields)
+        self.inverted_index = InvertedIndex.from_dict(
+            builder.inverted_index, fields, doc_refs=builder._documents
+        )
+        self.term_frequencies = {field_name: [] for field_name in fields}
+        self.field_lengths = {field_name: [] for field_name in fields}
+        self.term_extremes = {field_name: {} for field_name in fields}
+        self.boosts = []
+        for doc_ref, attributes in builder._documents.items():
+            self.boosts.append(attributes.get("boost", 1))
+            for field_name in fields:
+                field_ref = field_name + FieldRef.JOINER + doc_ref
+                field_terms = builder.field_term_frequencies.get(field_ref)
+                field_length = builder.field_lengths.get(field_ref, 0)
+                self.term_frequencies[field_name].append(field_terms)
+                self.field_lengths[field_name].append(field_length)
+                if field_terms is None:
+                    continue
+
+                term_extremes = self.term_extremes[field_name]
+                for term, tf in field_terms.items():
+                    extremes = term_extremes.get(term)
+                    if extremes is None:
+                        term_extremes[term] = (tf, field_length)
+                    else:
+                        term_extremes[term] = (
+                            max(tf, extremes[0]),
+                            min(field_length, extremes[1]),
+                        )
+        self.max_boost = max(self.boosts, default=1)
+
+    def __repr__(self):
+        return "<Segment documents={} deleted={}>".format(
+            self.builder.document_count, len(self.deleted)
+        )
+
+    def __len__(self):
+        """The number of live documents in the segment."""
+        return self.builder.document_count - len(self.deleted)
+
+    def __contains__(self, ref):
+        return ref in self.builder._documents and ref not in self.deleted
+
+
+class SegmentedIndex:
+    """An index made of immutable segments, allowing documents to be added
+    and deleted while it is being searched.
+
+    Each call to `add_documents` creates a new segment from a batch of
+    documents, processing them with a copy of the builder's pipeline.
+    Deleting a document only marks it as deleted in its segment. Searches fan
+    out across the segments, merging their results by score.
+
+    Segments share a global dictionary of terms and the term statistics of
+    all the documents, so scores are the same as those of a single index of
+    the documents as long as none has been deleted: as in Lucene, deleted
+    documents still count towards the statistics until their segment is
+    merged. The statistics change whenever a segment is added or merged, each
+    change is a new generation of the index. Rather than calculating IDF
+    weighted field vectors, which would have to be recalculated for every
+    segment on each change, segments keep the term frequencies of their
+    documents, which are scored at query time with the statistics of the
+    generation being searched, giving the same scores as the field vectors.
+    Adding a segment therefore only costs processing its own documents,
+    searches use the previous generation until the new one is swapped in,
+    and `add_documents` returns once its documents can be searched.
+
+    Segments of similar size are merged in a background thread, following a
+    tiered merge policy: whenever there are `merge_factor` segments in the
+    same tier, segments in a tier having up to `merge_factor` times the
+    documents of the previous one, they are merged into a single segment.
+    Segments with more deleted than live documents are also merged to purge
+    them.
+
+    Args:
+        builder (lunr.Builder): A builder with the ref and fields configured,
+            any documents already added to it become the first segment.
+        merge_factor (int, optional): The number of segments in the same
+            tier that triggers a merge.
+        background_merges (bool, optional): Merge segments in a background
+            thread, otherwise they are merged when adding documents.
+    """
+
+    def __init__(self, builder, merge_factor=10, background_merges=True):
+        self._template = builder._partial_copy()
+        self.merge_factor = merge_factor
+        self.background_merges = background_merges
+        self.segments = []
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._merge_thread = None
+
+        # Statistics of the documents in every segment, including deleted
+        # documents until their segment is merged, and the global term index
+        # of each term. Term indexes are not reused, `_terms` maps them back
+        # to their terms. The sorted terms and the token set, once created,
+        # are replaced rather than modified, as generations share them.
+        self._document_count = 0
+        self._term_indexes = {}
+        self._terms = []
+        self._sorted_terms = []
+        self._token_set = None
+        self._term_document_counts = defaultdict(int)
+        self._field_length_totals = defaultdict(int)
+        self._field_document_counts = defaultdict(int)
+        self._generation = 0
+        # The generation searches use and the index of each of its segments
+        self._searched_generation = 0
+        self._searched_indexes = []
+        self._refresh_lock = threading.Lock()
+
+        if builder.document_count:
+            self._add_segment(builder)
+            self._refresh()
+
+    def __repr__(self):
+        return "<SegmentedIndex segments={} documents={}>".format(
+            len(self.segments), len(self)
+        )
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def __contains__(self, ref):
+        return any(str(ref) in segment for segment in self.segments)
+
+    def add_documents(self, documents):
+        """Adds a batch of documents to the index as a new segment.
+
+        Documents with the same ref as a document already in the index
+        replace it.
+
+        Args:
+            documents (iterable): The documents to add, either dicts or
+                2-tuples of a document and its attributes, as accepted by
+                `lunr.Builder.add_many`.
+        """
+        builder = self._template._partial_copy()
+        builder.add_many(documents)
+        if not builder.document_count:
+            return
+
+        with self._lock:
+            for doc_ref in builder._documents:
+                self._delete(doc_ref)
+
+            self._add_segment(builder)
+
+        self._schedule_merges()
+        self._refresh()
+
+    def delete(self, ref):
+        """Deletes a document from the index.
+
+        Args:
+            ref (str): The reference of the document to delete.
+
+        Returns:
+            bool: Whether the document was in the index.
+        """
+        with self._lock:
+            return self._delete(str(ref))
+
+    def search(self, query_string, limit=None, **kwargs):
+        """Performs a search against every segment, accepts the same arguments
+        as `lunr.Index.search`."""
+        return self._fan_out(
+            lambda index, limit: index.search(query_string, limit=limit, **kwargs),
+            limit,
+        )
+
+    def create_query(self, fields=None):
+        """Creates a Query with the index's fields, see
+        `lunr.Index.create_query`."""
+        all_fields = list(self._template._fields)
+        if fields is None:
+            return Query(all_fields)
+
+        non_contained_fields = set(fields) - set(all_fields)
+        if non_contained_fields:
+            raise BaseLunrException(
+                "Fields {} are not part of the index", non_contained_fields
+            )
+
+        return Query(fields)
+
+    def query(self, query=None, callback=None, limit=None, **kwargs):
+        """Performs a query against every segment, accepts the same arguments
+        as `lunr.Index.query`."""
+        # Querying mutates the clauses of the query, each segment gets a copy
+        return self._fan_out(
+            lambda index, limit: index.query(
+                copy.deepcopy(query), callback, limit=limit, **kwargs
+            ),
+            limit,
+        )
+
+    def merge(self):
+        """Merges every segment into a single one, purging deleted documents.
+
+        Waits for any merge running in the background to finish first.
+        """
+        self.wait_for_merges()
+        with self._merge_lock:
+            with self._lock:
+                segments = list(self.segments)
+
+            if len(segments) > 1 or any(segment.deleted for segment in segments):
+                self._merge(segments)
+
+        self._refresh()
+
+    def wait_for_merges(self):
+        """Blocks until merges running in the background have finished."""
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
+
+    def _fan_out(self, search, limit):
+        """Runs a search against the index of every segment and merges the
+        results by score."""
+        with self._lock:
+            indexes = list(self._searched_indexes)
+
+        results = []
+        for index in indexes:
+            results.extend(search(index, limit))
+
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results if limit is None else results[:limit]
+
+    def _delete(self, doc_ref):
+        for segment in self.segments:
+            if doc_ref in segment:
+                segment.deleted.add(doc_ref)
+                # Only one copy of a document is live, deleting it from every
+                # searched index also covers searched segments since merged
+                for index in self._searched_indexes:
+                    index.delete(doc_ref)
+                return True
+
+        return False
+
+    def _add_segment(self, builder):
+        """Adds a segment for the documents in a builder, updating the global
+        term indexes and statistics."""
+        new_terms = []
+        for term, posting in builder.inverted_index.items():
+            term_index = self._term_indexes.get(term)
+            if term_index is None:
+                term_index = self._term_indexes[term] = len(self._terms)
+                self._terms.append(term)
+                new_terms.append(term)
+
+            posting["_index"] = term_index
+
+        if new_terms:
+            self._sorted_terms = sorted(self._sorted_terms + new_terms)
+            if self._token_set is not None:
+                for term in new_terms:
+                    self._token_set = self._token_set.with_word(term)
+
+        self._update_statistics(builder, builder._documents, 1)
+        self.segments = self.segments + [Segment(builder)]
+        self._generation += 1
+
+    def _update_statistics(self, builder, doc_refs, sign):
+        """Adds or, if sign is -1, subtracts the statistics of documents,
+        dropping the terms no document has anymore."""
+        removed_terms = set()
+        for doc_ref in doc_refs:
+            self._document_count += sign
+            for field_name in builder._fields:
+                field_ref = field_name + FieldRef.JOINER + doc_ref
+                field_terms = builder.field_term_frequencies.get(field_ref)
+                if field_terms is None:
+                    continue
+
+                self._field_length_totals[field_name] += (
+                    sign * builder.field_lengths[field_ref]
+                )
+                self._field_document_counts[field_name] += sign
+                for term in field_terms:
+                    self._term_document_counts[term] += sign
+                    if not self._term_document_counts[term]:
+                        del self._term_document_counts[term]
+                        del self._term_indexes[term]
+                        removed_terms.add(term)
+
+        if removed_terms:
+            self._sorted_terms = [
+                term for term in self._sorted_terms if term not in removed_terms
+            ]
+            if self._token_set is not None:
+                for term in removed_terms:
+                    self._token_set = self._token_set.without_word(term)
+
+    def _refresh(self):
+        """Creates the indexes of the segments of the current generation with
+        its statistics, if searches do not use it yet, and swaps them in.
+
+        The indexes are created without holding the lock of the index, from
+        a snapshot of the statistics, so searches and changes can go on.
+        Refreshes run one at a time so searches never go back to an older
+        generation.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                generation = self._generation
+                if generation == self._searched_generation:
+                    return
+
+                segments = list(self.segments)
+                average_field_lengths = defaultdict(int)
+                for field_name, total in self._field_length_totals.items():
+                    if self._field_document_counts[field_name]:
+                        average_field_lengths[field_name] = (
+                            total / self._field_document_counts[field_name]
+                        )
+
+                statistics = _Statistics(
+                    generation,
+                    self._document_count,
+                    dict(self._term_document_counts),
+                    dict(self._term_indexes),
+                    self._terms,
+                    self._sorted_terms,
+                    self._token_set,
+                    average_field_lengths,
+                )
+
+            # Unless the token set is kept up to date already, segment indexes
+            # get the token set of the terms of their generation, shared by
+            # all of them and created on first use
+            token_set_factory = lru_cache(maxsize=None)(
+                partial(self._create_token_set, statistics)
+            )
+            indexes = [
+                self._segment_index(segment, statistics, token_set_factory)
+                for segment in segments
+            ]
+
+            with self._lock:
+                for segment, index in zip(segments, indexes):
+                    for doc_ref in segment.deleted:
+                        index.delete(doc_ref)
+
+                self._searched_generation = generation
+                self._searched_indexes = indexes
+
+    def _segment_index(self, segment, statistics, token_set_factory):
+        """Creates the index of a segment scoring its documents with the
+        statistics of a generation."""
+        index = _SegmentIndex(segment, statistics)
+        index._token_set_factory = token_set_factory
+        return index
+
+    def _create_token_set(self, statistics):
+        """Creates the token set of the terms of a generation, which is kept
+        up to date with the terms from then on if the generation is still
+        the current one."""
+        token_set = TokenSet.from_list(statistics.sorted_terms)
+        with self._lock:
+            if self._generation == statistics.generation and self._token_set is None:
+                self._token_set = token_set
+
+        return token_set
+
+    def _schedule_merges(self):
+        """Starts merging segments if the merge policy finds any to merge."""
+        if not self.background_merges:
+            self._run_merges()
+            return
+
+        with self._lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+
+            if self._find_merge() is None:
+                return
+
+            self._merge_thread = threading.Thread(target=self._run_merges, daemon=True)
+            self._merge_thread.start()
+
+    def _run_merges(self):
+        with self._merge_lock:
+            while True:
+                with self._lock:
+                    segments = self._find_merge()
+
+                if segments is None:
+                    return
+
+                self._merge(segments)
+                if self.background_merges:
+                    self._refresh()
+
+    def _find_merge(self):
+        """Returns the segments to merge next according to the merge policy,
+        or None if no merge is needed."""
+        tiers = defaultdict(list)
+        for segment in self.segments:
+            if len(segment.deleted) > len(segment):
+                return [segment]
+
+            tier = int(math.log(max(len(segment), 1), self.merge_factor))
+            tiers[tier].append(segment)
+
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][: self.merge_factor]
+
+        return None
+
+    def _merge(self, segments):
+        """Merges segments into a single one, purging deleted documents.
+
+        The merged segment is built without holding the lock, documents
+        deleted in the meantime are marked as deleted in the new segment.
+        """
+        with self._lock:
+            deleted = [set(segment.deleted) for segment in segments]
+
+        merged = self._template._partial_copy()
+        for segment, segment_deleted in zip(segments, deleted):
+            partial = self._template._partial_copy()
+            partial.merge(segment.builder)
+            for doc_ref in segment_deleted:
+                partial.remove(doc_ref)
+
+            merged.merge(partial)
+
+        # The terms of the documents being merged keep their term indexes
+        # while the documents count towards the statistics
+        for term, posting in merged.inverted_index.items():
+            posting["_index"] = self._term_indexes[term]
+        merged_segment = Segment(merged)
+
+        with self._lock:
+            for segment, segment_deleted in zip(segments, deleted):
+                merged_segment.deleted.update(segment.deleted - segment_deleted)
+                self._update_statistics(segment.builder, segment_deleted, -1)
+
+            position = self.segments.index(segments[0])
+            remaining = [
+                segment for segment in self.segments if segment not in segments
+            ]
+            if merged.document_count:
+                remaining.insert(position, merged_segment)
+            self.segments = remaining
+            self._generation += 1
+
+
+class _Statistics:
+    """The term statistics of the documents of every segment of a
+    `SegmentedIndex` at a generation, shared by the indexes of its segments.
+
+    `terms` and `sorted_terms` are shared with the index, which only appends
+    to the former and replaces the latter."""
+
+    def __init__(
+        self,
+        generation,
+        document_count,
+        term_document_counts,
+        term_indexes,
+        terms,
+        sorted_terms,
+        token_set,
+        average_field_lengths,
+    ):
+        self.generation = generation
+        self.document_count = document_count
+        self.term_document_counts = term_document_counts
+        self.term_indexes = term_indexes
+        self.terms = terms
+        self.sorted_terms = sorted_terms
+        self.token_set = token_set
+        self.average_field_lengths = average_field_lengths
+        self._idf_cache = {}
+
+    def idf(self, term):
+        """Returns the inverse document frequency of a term."""
+        try:
+            return self._idf_cache[term]
+        except KeyError:
+            idf = self._idf_cache[term] = idf_from_document_frequency(
+                self.term_document_counts.get(term, 0), self.document_count
+            )
+            return idf
+
+
+class _SegmentIndex(Index):
+    """The index of a segment at a generation of a `SegmentedIndex`.
+
+    Documents are scored at query time from their term frequencies and the
+    statistics of the generation, with the same BM25 formula as
+    `lunr.Builder`, adding the products of the query weights and the term
+    scores as `lunr.Vector.similarity` does, so scores are identical to those
+    of field vectors calculated with the same statistics. Field vectors are
+    only calculated if accessed, see `_SegmentFieldVectors`.
+    """
+
+    def __init__(self, segment, statistics):
+        self._segment = segment
+        self._statistics = statistics
+        fields = list(segment.builder._fields)
+        super().__init__(
+            inverted_index=_SegmentInvertedIndex(segment.inverted_index, statistics),
+            field_vectors=_SegmentFieldVectors(self),
+            token_set=statistics.token_set,
+            fields=fields,
+            pipeline=segment.builder.search_pipeline,
+            max_term_scores={
+                field_name: _MaxTermScores(self, field_name) for field_name in fields
+            },
+            # Scoring does not use the magnitudes of the field vectors, a
+            # field with no term scores has a dot product of 0 either way
+            field_magnitudes={},
+        )
+        self.vectorized_scoring = False
+
+    def _score(self, doc_id, fields, query_vectors):
+        """Scores a document from its matching fields, see `lunr.Index._score`."""
+        terms = self._statistics.terms
+        score = 0
+        for field in fields:
+            query_vector = query_vectors[field]
+            term_frequencies = self._segment.term_frequencies[field][doc_id]
+            if query_vector.magnitude == 0 or not term_frequencies:
+                continue
+
+            dot_product = 0
+            for term_index, weight in zip(query_vector.indexes, query_vector.values):
+                term = terms[term_index]
+                tf = term_frequencies.get(term)
+                if tf is not None:
+                    dot_product += weight * self._term_score(field, doc_id, term, tf)
+
+            score += dot_product / query_vector.magnitude
+
+        return score
+
+    def _term_score(self, field_name, doc_id, term, tf):
+        """Scores a term of a field of a document, as
+        `lunr.Builder._create_field_vector` does."""
+        segment = self._segment
+        score = self._bm25(
+            field_name,
+            term,
+            tf,
+            segment.field_lengths[field_name][doc_id],
+            segment.boosts[doc_id],
+        )
+        return round(score, 3)
+
+    def _bm25(self, field_name, term, tf, field_length, doc_boost):
+        """Calculates the BM25 score of a term before rounding."""
+        builder = self._segment.builder
+        average_field_length = self._statistics.average_field_lengths[field_name]
+        score = (
+            self._statistics.idf(term)
+            * ((builder._k1 + 1) * tf)
+            / (
+                builder._k1
+                * (1 - builder._b + builder._b * (field_length / average_field_length))
+                + tf
+            )
+        )
+        score *= builder._fields[field_name].boost
+        score *= doc_boost
+        return score
+
+    def _field_vector(self, field_name, doc_id):
+        """Calculates the field vector of a document, or returns None if the
+        document does not have the field."""
+        term_frequencies = self._segment.term_frequencies[field_name][doc_id]
+        if term_frequencies is None:
+            return None
+
+        term_indexes = self._statistics.term_indexes
+        pairs = sorted(
+            (term_indexes[term], self._term_score(field_name, doc_id, term, tf))
+            for term, tf in term_frequencies.items()
+        )
+        return Vector.from_sorted_pairs(
+            [term_index for term_index, _ in pairs], [score for _, score in pairs]
+        )
+
+
+class _SegmentInvertedIndex(InvertedIndex):
+    """The inverted index of a segment at a generation, which shares the
+    postings of the segment and contains every term of the generation, with
+    empty postings for the terms of other segments, so query vectors are the
+    same in every segment."""
+
+    def __init__(self, inverted_index, statistics):
+        super().__init__(inverted_index.fields)
+        self.doc_refs = inverted_index.doc_refs
+        self.doc_ids = inverted_index.doc_ids
+        self._postings = inverted_index._postings
+        self._sorted_terms = statistics.sorted_terms
+        self._term_indexes = statistics.term_indexes
+
+    def __iter__(self):
+        return iter(self._term_indexes)
+
+    def __len__(self):
+        return len(self._term_indexes)
+
+    def __contains__(self, term):
+        return term in self._term_indexes
+
+    def lookup(self, term):
+        if term in self._postings:
+            return super().lookup(term)
+
+        return self._term_indexes[term], {}
+
+
+class _SegmentFieldVectors(Mapping):
+    """The field vectors of the documents of a segment index, calculated on
+    access."""
+
+    def __init__(self, index):
+        self._index = index
+        self._field_refs = index._segment.builder.field_term_frequencies
+
+    def __getitem__(self, ref):
+        if ref not in self._field_refs:
+            raise KeyError(ref)
+
+        field_ref = FieldRef.from_string(ref)
+        doc_id = self._index._segment.inverted_index.doc_ids[field_ref.doc_ref]
+        return self._index._field_vector(field_ref.field_name, doc_id)
+
+    def __iter__(self):
+        return iter(self._field_refs)
+
+    def __len__(self):
+        return len(self._field_refs)
+
+    def by_doc_id(self):
+        return {
+            field_name: _SegmentFieldVectorList(self._index, field_name)
+            for field_name in self._index._segment.builder._fields
+        }
+
+
+class _SegmentFieldVectorList(Sequence):
+    """The field vectors of a field of a segment index by doc id, calculated
+    on access."""
+
+    def __init__(self, index, field_name):
+        self._index = index
+        self._field_name = field_name
+
+    def __getitem__(self, doc_id):
+        if not 0 <= doc_id < len(self):
+            raise IndexError(doc_id)
+
+        return self._index._field_vector(self._field_name, doc_id)
+
+    def __len__(self):
+        return len(self._index._segment.boosts)
+
+
+class _MaxTermScores:
+    """Upper bounds of the scores of the terms in a field of a segment index
+    by term index, calculated on access.
+
+    BM25 scores grow with the term frequency and decrease with the field
+    length, so scoring a term with its highest term frequency, the shortest
+    field length and the highest boost in the segment bounds its scores,
+    allowing for rounding."""
+
+    def __init__(self, index, field_name):
+        self._index = index
+        self._field_name = field_name
+
+    def __getitem__(self, term_index):
+        index = self._index
+        term = index._statistics.terms[term_index]
+        extremes = index._segment.term_extremes[self._field_name].get(term)
+        if extremes is None:
+            return 0
+
+        tf, field_length = extremes
+        score = index._bm25(
+            self._field_name, term, tf, field_length, index._segment.max_boost
+        )
+        return score + 0.0005
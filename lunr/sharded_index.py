@@ -0,0 +1,253 @@
+import copy
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from lunr.exceptions import BaseLunrException
+from lunr.field_ref import FieldRef
+from lunr.index import Index
+from lunr.inverted_index import InvertedIndex
+from lunr.query_parser import QueryParser
+
+
+class ShardedIndex:
+    """An index partitioned into shards which are queried concurrently.
+
+    The documents of a built `lunr.Index` are distributed round robin across
+    `shards` indexes. The field vectors, and therefore the IDF of the terms,
+    are those of the original index and every shard has all of its terms, so
+    the query vectors are the same in every shard. The results of each shard
+    are merged ranking documents with equal scores in the order the original
+    index would, so the results are identical to those of the original index.
+
+    Shards are queried in a pool of threads, which run in parallel on
+    free-threaded builds of Python, or a pool of processes. Each worker
+    process loads every shard when it starts, the shards are sent to them
+    serialized.
+
+    Args:
+        index (lunr.Index): The index to shard.
+        shards (int, optional): The number of shards.
+        executor (str, optional): "thread" or "process", the kind of pool
+            used to query the shards.
+        max_workers (int, optional): The number of workers in the pool,
+            defaults to the number of shards.
+    """
+
+    def __init__(self, index, shards=2, executor="thread", max_workers=None):
+        if executor not in ("thread", "process"):
+            raise BaseLunrException(
+                "Unknown executor {}, use 'thread' or 'process'".format(executor)
+            )
+
+        self.fields = index.fields
+        self.executor = executor
+        self.max_workers = max_workers or shards
+        self.shards = _split_index(index, shards)
+        self._doc_ids = index.inverted_index.doc_ids
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<ShardedIndex shards={} documents={}>".format(
+            len(self.shards), len(self._doc_ids)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the pool used to query the shards."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.shutdown()
+
+    def create_query(self, fields=None):
+        """Creates a Query with the index's fields, see
+        `lunr.Index.create_query`."""
+        return self.shards[0].create_query(fields)
+
+    def search(self, query_string, limit=None, prune=False, max_expansions=None):
+        """Performs a search against every shard, accepts the same arguments
+        as `lunr.Index.search`."""
+        query = self.create_query()
+        QueryParser(query_string, query).parse()
+        return self.query(
+            query, limit=limit, prune=prune, max_expansions=max_expansions
+        )
+
+    def query(
+        self, query=None, callback=None, limit=None, prune=False, max_expansions=None
+    ):
+        """Performs a query against every shard, accepts the same arguments
+        as `lunr.Index.query`."""
+        if query is None:
+            query = self.create_query()
+
+        if callback is not None:
+            callback(query)
+
+        pool = self._get_pool()
+        if self.executor == "process":
+            futures = [
+                pool.submit(
+                    _query_shard_in_worker, shard, query, limit, prune, max_expansions
+                )
+                for shard in range(len(self.shards))
+            ]
+        else:
+            # Querying mutates the clauses of the query, each shard gets a copy
+            futures = [
+                pool.submit(
+                    _query_shard,
+                    index,
+                    copy.deepcopy(query),
+                    limit,
+                    prune,
+                    max_expansions,
+                )
+                for index in self.shards
+            ]
+
+        ranked = []
+        for future in futures:
+            for score, first_match, result in future.result():
+                ranked.append(
+                    (-score, first_match, self._doc_ids[result["ref"]], result)
+                )
+
+        ranked.sort(key=lambda entry: entry[:3])
+        if limit is not None:
+            ranked = ranked[:limit]
+
+        return [entry[3] for entry in ranked]
+
+    def delete(self, ref):
+        """Deletes a document from its shard, see `lunr.Index.delete`."""
+        doc_id = self._doc_ids.get(str(ref))
+        if doc_id is None:
+            return False
+
+        deleted = self.shards[doc_id % len(self.shards)].delete(ref)
+        # Worker processes have their own copy of the shards
+        if deleted and self.executor == "process":
+            self.close()
+
+        return deleted
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.executor == "process":
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        initializer=_load_shards,
+                        initargs=([shard.serialize() for shard in self.shards],),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+            return self._pool
+
+
+def _split_index(index, shard_count):
+    """Distributes the documents of an index round robin across shards,
+    keeping the terms, term indexes and field vectors of the index."""
+    fields = index.fields
+    doc_refs = index.inverted_index.doc_refs
+    inverted_indexes = [InvertedIndex(fields) for _ in range(shard_count)]
+    for doc_id, doc_ref in enumerate(doc_refs):
+        inverted_indexes[doc_id % shard_count].intern(doc_ref)
+
+    for term in index.inverted_index:
+        term_index, field_postings = index.inverted_index.lookup(term)
+        shard_postings = [{} for _ in range(shard_count)]
+        for field, (doc_ids, metadata) in field_postings.items():
+            shard_doc_ids = [array("I") for _ in range(shard_count)]
+            shard_metadata = [[] for _ in range(shard_count)]
+            for i, doc_id in enumerate(doc_ids):
+                shard = doc_id % shard_count
+                shard_doc_ids[shard].append(doc_id // shard_count)
+                if metadata is not None:
+                    shard_metadata[shard].append(metadata[i])
+
+            for shard in range(shard_count):
+                if shard_doc_ids[shard]:
+                    shard_postings[shard][field] = (
+                        shard_doc_ids[shard],
+                        shard_metadata[shard] if metadata is not None else None,
+                    )
+
+        for shard in range(shard_count):
+            inverted_indexes[shard].add_field_postings(
+                term, term_index, shard_postings[shard]
+            )
+
+    field_vectors = [{} for _ in range(shard_count)]
+    for ref, vector in index.field_vectors.items():
+        doc_id = index.inverted_index.doc_ids[FieldRef.from_string(ref).doc_ref]
+        field_vectors[doc_id % shard_count][ref] = vector
+
+    shards = []
+    for shard in range(shard_count):
+        shard_index = Index(
+            inverted_index=inverted_indexes[shard],
+            field_vectors=field_vectors[shard],
+            token_set=None,
+            fields=fields,
+            pipeline=index.pipeline,
+            max_term_scores=index.max_term_scores,
+            field_magnitudes={
+                field: array("d", index.field_magnitudes[field][shard::shard_count])
+                for field in fields
+            },
+            ngram_index=index.ngram_index,
+        )
+        # Every shard has all the terms, the token set of the index is shared
+        shard_index._token_set_factory = lambda: index.token_set
+        shard_index.vectorized_scoring = index.vectorized_scoring
+        for doc_id in index._tombstones:
+            shard_index.delete(doc_refs[doc_id])
+
+        shards.append(shard_index)
+
+    return shards
+
+
+def _query_shard(index, query, limit, prune, max_expansions):
+    """Queries a shard returning tuples of the score of each result, the
+    position of the first posting matching it and the result."""
+    results, scoring_postings = index._query(query, limit, prune, max_expansions)
+    doc_ids = index.inverted_index.doc_ids
+    ranked = []
+    for result in results:
+        doc_id = doc_ids[result["ref"]]
+        first_match = 0
+        for position, (_, _, posting_doc_ids) in enumerate(scoring_postings):
+            i = bisect_left(posting_doc_ids, doc_id)
+            if i < len(posting_doc_ids) and posting_doc_ids[i] == doc_id:
+                first_match = position
+                break
+
+        ranked.append((result["score"], first_match, result))
+
+    return ranked
+
+
+# The shards loaded by a worker process
+_worker_shards = None
+
+
+def _load_shards(serialized_shards):
+    global _worker_shards
+    _worker_shards = [Index.load(shard) for shard in serialized_shards]
+
+
+def _query_shard_in_worker(shard, query, limit, prune, max_expansions):
+    return _query_shard(_worker_shards[shard], query, limit, prune, max_expansions)
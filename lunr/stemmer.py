@@ -37,411 +37,331 @@ to:
 release 2: July 2008
 """
 
+from collections import OrderedDict, namedtuple
+import threading
+
 from lunr.pipeline import Pipeline
 
+_VOWELS = frozenset("aeiou")
+
+# The suffixes of step 2 and their replacements, by their penultimate letter
+_STEP2_SUFFIXES = {
+    "a": (("ational", "ate"), ("tional", "tion")),
+    "c": (("enci", "ence"), ("anci", "ance")),
+    "e": (("izer", "ize"),),
+    # --DEPARTURE-- "bli" replaces "abli" -> "able" of the published algorithm
+    "l": (
+        ("bli", "ble"),
+        ("alli", "al"),
+        ("entli", "ent"),
+        ("eli", "e"),
+        ("ousli", "ous"),
+    ),
+    "o": (("ization", "ize"), ("ation", "ate"), ("ator", "ate")),
+    "s": (
+        ("alism", "al"),
+        ("iveness", "ive"),
+        ("fulness", "ful"),
+        ("ousness", "ous"),
+    ),
+    "t": (("aliti", "al"), ("iviti", "ive"), ("biliti", "ble")),
+    # --DEPARTURE-- not part of the published algorithm
+    "g": (("logi", "log"),),
+}
+
+# The suffixes of step 3 and their replacements, by their last letter
+_STEP3_SUFFIXES = {
+    "e": (("icate", "ic"), ("ative", ""), ("alize", "al")),
+    "i": (("iciti", "ic"),),
+    "l": (("ical", "ic"), ("ful", "")),
+    "s": (("ness", ""),),
+}
+
+# The suffixes removed by step 4, by their penultimate letter
+_STEP4_SUFFIXES = {
+    "a": ("al",),
+    "c": ("ance", "ence"),
+    "e": ("er",),
+    "i": ("ic",),
+    "l": ("able", "ible"),
+    "n": ("ant", "ement", "ment", "ent"),
+    "o": ("ion", "ou"),
+    "s": ("ism",),
+    "t": ("ate", "iti"),
+    "u": ("ous",),
+    "v": ("ive",),
+    "z": ("ize",),
+}
+
+
+class _ConsonantTable(dict):
+    """Translation table mapping vowels to "v" and any other character to "c",
+    except y which is resolved by `_cv_pattern`."""
+
+    def __missing__(self, char):
+        return "c"
+
+
+_CV_TABLE = _ConsonantTable(
+    (ord(char), "y" if char == "y" else "v" if char in _VOWELS else "c")
+    for char in "abcdefghijklmnopqrstuvwxyz"
+)
+
+
+def _cv_pattern(word):
+    """Returns the pattern of consonants and vowels of a word as a string of
+    "c" and "v" of the same length.
+
+    A consonant is a letter other than a, e, i, o or u, and other than y
+    preceded by a consonant.
+    """
+    cv = word.translate(_CV_TABLE)
+    if "y" not in cv:
+        return cv
+
+    letters = list(cv)
+    previous = "v"
+    for i, letter in enumerate(letters):
+        if letter == "y":
+            letter = letters[i] = "c" if previous == "v" else "v"
+        previous = letter
+
+    return "".join(letters)
+
+
+def _is_cvc(word, cv, i):
+    """Whether the letters i - 2, i - 1, i of a word are a consonant, a vowel
+    and a consonant other than w, x or y, e.g. cav(e), lov(e) or hop(e)."""
+    return i >= 2 and cv[i - 2 : i + 1] == "cvc" and word[i] not in "wxy"
+
 
 class PorterStemmer:
-    def __init__(self):
-        """The main part of the stemming algorithm starts here.
-        b is a buffer holding a word to be stemmed. The letters are in b[k0],
-        b[k0+1] ... ending at b[k]. In fact k0 = 0 in this demo program. k is
-        readjusted downwards as the stemming progresses. Zero termination is
-        not in fact used in the algorithm.
-
-        Note that only lower case sequences are stemmed. Forcing to lower case
-        should be done before stem(...) is called.
-        """
+    """The Porter stemming algorithm, following the reference implementation
+    in Python by Vivake Gupta, including its points of --DEPARTURE-- from the
+    published algorithm.
 
-        self.b = ""  # buffer for word to be stemmed
-        self.k = 0
-        self.k0 = 0
-        self.j = 0  # j is a general offset into the string
-
-    def cons(self, i):
-        """cons(i) is TRUE <=> b[i] is a consonant."""
-        if (
-            self.b[i] == "a"
-            or self.b[i] == "e"
-            or self.b[i] == "i"
-            or self.b[i] == "o"
-            or self.b[i] == "u"
-        ):
-            return 0
-        if self.b[i] == "y":
-            if i == self.k0:
-                return 1
-            else:
-                return not self.cons(i - 1)
-        return 1
-
-    def m(self):
-        """m() measures the number of consonant sequences between k0 and j.
-        if c is a consonant sequence and v a vowel sequence, and <..>
-        indicates arbitrary presence,
-
-           <c><v>       gives 0
-           <c>vc<v>     gives 1
-           <c>vcvc<v>   gives 2
-           <c>vcvcvc<v> gives 3
-           ....
+    The suffixes of each step are looked up in tables and the measure of
+    the stem, the number of vowel-consonant sequences in it, is counted on a
+    pattern of the consonants and vowels of the word, computed once and only
+    updated after the letters following the stem are replaced.
+
+    The stemmer keeps no state between words so it is safe to use from
+    several threads.
+    """
+
+    def stem(self, p, metadata=None):
+        """Returns the stem of a word, which must be in lower case.
+
+        Words of one or two letters are returned unchanged (--DEPARTURE--).
         """
-        n = 0
-        i = self.k0
-        while 1:
-            if i > self.j:
-                return n
-            if not self.cons(i):
+        # As in the reference implementation `b` is a buffer holding the word,
+        # the stem being b[0], ... b[k]. Replacing a suffix with a shorter one
+        # leaves letters after b[k] which are not part of the stem but may be
+        # read through negative indexes, e.g. b[k - 1] when k is 0. `j` is the
+        # end of the stem before the suffix last matched.
+        b = p
+        k = len(b) - 1
+        if k <= 1:
+            return b
+
+        cv = _cv_pattern(b)
+
+        # Step 1ab removes plurals and -ed or -ing
+        if b[k] == "s":
+            if b.endswith("sses", 0, k + 1):
+                k -= 2
+            elif b.endswith("ies", 0, k + 1):
+                j = k - 3
+                b = b[: j + 1] + "i" + b[j + 2 :]
+                k = j + 1
+                cv = _cv_pattern(b)
+            elif b[k - 1] != "s":
+                k -= 1
+
+        j = None
+        if b[k] == "d":
+            if b.endswith("eed", 0, k + 1):
+                if cv.count("vc", 0, k - 2) > 0:
+                    k -= 1
+            elif b[k - 1] == "e":
+                j = k - 2
+        elif b[k] == "g" and b.endswith("ing", 0, k + 1):
+            j = k - 3
+
+        if j is not None and "v" in cv[: j + 1]:
+            k = j
+            replacement = None
+            if b.endswith("at", 0, k + 1):
+                replacement = "ate"
+            elif b.endswith("bl", 0, k + 1):
+                replacement = "ble"
+            elif b.endswith("iz", 0, k + 1):
+                replacement = "ize"
+            elif k >= 1 and b[k] == b[k - 1] and cv[k] == "c":
+                if b[k] not in "lsz":
+                    k -= 1
+            elif cv.count("vc", 0, j + 1) == 1 and _is_cvc(b, cv, k):
+                replacement = "e"
+                j = k
+
+            if replacement is not None:
+                if replacement != "e":
+                    j = k - 2
+                b = b[: j + 1] + replacement + b[j + len(replacement) + 1 :]
+                k = j + len(replacement)
+                cv = _cv_pattern(b)
+
+        # Step 1c turns a terminal y to i when there is a vowel in the stem
+        if b[k] == "y" and "v" in cv[:k]:
+            b = b[:k] + "i" + b[k + 1 :]
+            cv = _cv_pattern(b)
+
+        # Step 2 maps double suffixes to single ones
+        for suffix, replacement in _STEP2_SUFFIXES.get(b[k - 1], ()):
+            if b.endswith(suffix, 0, k + 1):
+                j = k - len(suffix)
+                if cv.count("vc", 0, j + 1) > 0:
+                    b = b[: j + 1] + replacement + b[j + len(replacement) + 1 :]
+                    k = j + len(replacement)
+                    cv = _cv_pattern(b)
                 break
-            i = i + 1
-        i = i + 1
-        while 1:
-            while 1:
-                if i > self.j:
-                    return n
-                if self.cons(i):
-                    break
-                i = i + 1
-            i = i + 1
-            n = n + 1
-            while 1:
-                if i > self.j:
-                    return n
-                if not self.cons(i):
-                    break
-                i = i + 1
-            i = i + 1
-
-    def vowelinstem(self):
-        """vowelinstem() is TRUE <=> k0,...j contains a vowel"""
-        for i in range(self.k0, self.j + 1):
-            if not self.cons(i):
-                return 1
-        return 0
-
-    def doublec(self, j):
-        """doublec(j) is TRUE <=> j,(j-1) contain a double consonant."""
-        if j < (self.k0 + 1):
-            return 0
-        if self.b[j] != self.b[j - 1]:
-            return 0
-        return self.cons(j)
-
-    def cvc(self, i):
-        """cvc(i) is TRUE <=> i-2,i-1,i has the form consonant - vowel - consonant
-        and also if the second c is not w,x or y. this is used when trying to
-        restore an e at the end of a short  e.g.
-
-           cav(e), lov(e), hop(e), crim(e), but
-           snow, box, tray.
-        """
-        if (
-            i < (self.k0 + 2)
-            or not self.cons(i)
-            or self.cons(i - 1)
-            or not self.cons(i - 2)
-        ):
-            return 0
-        ch = self.b[i]
-        if ch == "w" or ch == "x" or ch == "y":
-            return 0
-        return 1
-
-    def ends(self, s):
-        """ends(s) is TRUE <=> k0,...k ends with the string s."""
-        length = len(s)
-        if s[length - 1] != self.b[self.k]:  # tiny speed-up
-            return 0
-        if length > (self.k - self.k0 + 1):
-            return 0
-        if self.b[self.k - length + 1 : self.k + 1] != s:
-            return 0
-        self.j = self.k - length
-        return 1
-
-    def setto(self, s):
-        """setto(s) sets (j+1),...k to the characters in the string s, readjusting k."""
-        length = len(s)
-        self.b = self.b[: self.j + 1] + s + self.b[self.j + length + 1 :]
-        self.k = self.j + length
-
-    def r(self, s):
-        """r(s) is used further down."""
-        if self.m() > 0:
-            self.setto(s)
-
-    def step1ab(self):
-        """step1ab() gets rid of plurals and -ed or -ing. e.g.
-
-        caresses  ->  caress
-        ponies    ->  poni
-        ties      ->  ti
-        caress    ->  caress
-        cats      ->  cat
-
-        feed      ->  feed
-        agreed    ->  agree
-        disabled  ->  disable
-
-        matting   ->  mat
-        mating    ->  mate
-        meeting   ->  meet
-        milling   ->  mill
-        messing   ->  mess
-
-        meetings  ->  meet
-        """
-        if self.b[self.k] == "s":
-            if self.ends("sses"):
-                self.k = self.k - 2
-            elif self.ends("ies"):
-                self.setto("i")
-            elif self.b[self.k - 1] != "s":
-                self.k = self.k - 1
-        if self.ends("eed"):
-            if self.m() > 0:
-                self.k = self.k - 1
-        elif (self.ends("ed") or self.ends("ing")) and self.vowelinstem():
-            self.k = self.j
-            if self.ends("at"):
-                self.setto("ate")
-            elif self.ends("bl"):
-                self.setto("ble")
-            elif self.ends("iz"):
-                self.setto("ize")
-            elif self.doublec(self.k):
-                self.k = self.k - 1
-                ch = self.b[self.k]
-                if ch == "l" or ch == "s" or ch == "z":
-                    self.k = self.k + 1
-            elif self.m() == 1 and self.cvc(self.k):
-                self.setto("e")
-
-    def step1c(self):
-        """step1c() turns terminal y to i when there is another vowel in the stem."""
-        if self.ends("y") and self.vowelinstem():
-            self.b = self.b[: self.k] + "i" + self.b[self.k + 1 :]
-
-    def step2(self):
-        """step2() maps double suffices to single ones.
-        so -ization ( = -ize plus -ation) maps to -ize etc. note that the
-        string before the suffix must give m() > 0.
-        """
-        if self.b[self.k - 1] == "a":
-            if self.ends("ational"):
-                self.r("ate")
-            elif self.ends("tional"):
-                self.r("tion")
-        elif self.b[self.k - 1] == "c":
-            if self.ends("enci"):
-                self.r("ence")
-            elif self.ends("anci"):
-                self.r("ance")
-        elif self.b[self.k - 1] == "e":
-            if self.ends("izer"):
-                self.r("ize")
-        elif self.b[self.k - 1] == "l":
-            if self.ends("bli"):
-                self.r("ble")  # --DEPARTURE--
-            # To match the published algorithm, replace this phrase with
-            #   if self.ends("abli"):      self.r("able")
-            elif self.ends("alli"):
-                self.r("al")
-            elif self.ends("entli"):
-                self.r("ent")
-            elif self.ends("eli"):
-                self.r("e")
-            elif self.ends("ousli"):
-                self.r("ous")
-        elif self.b[self.k - 1] == "o":
-            if self.ends("ization"):
-                self.r("ize")
-            elif self.ends("ation"):
-                self.r("ate")
-            elif self.ends("ator"):
-                self.r("ate")
-        elif self.b[self.k - 1] == "s":
-            if self.ends("alism"):
-                self.r("al")
-            elif self.ends("iveness"):
-                self.r("ive")
-            elif self.ends("fulness"):
-                self.r("ful")
-            elif self.ends("ousness"):
-                self.r("ous")
-        elif self.b[self.k - 1] == "t":
-            if self.ends("aliti"):
-                self.r("al")
-            elif self.ends("iviti"):
-                self.r("ive")
-            elif self.ends("biliti"):
-                self.r("ble")
-        elif self.b[self.k - 1] == "g":  # --DEPARTURE--
-            if self.ends("logi"):
-                self.r("log")
-        # To match the published algorithm, delete this phrase
-
-    def step3(self):
-        """step3() dels with -ic-, -full, -ness etc. similar strategy to step2."""
-        if self.b[self.k] == "e":
-            if self.ends("icate"):
-                self.r("ic")
-            elif self.ends("ative"):
-                self.r("")
-            elif self.ends("alize"):
-                self.r("al")
-        elif self.b[self.k] == "i":
-            if self.ends("iciti"):
-                self.r("ic")
-        elif self.b[self.k] == "l":
-            if self.ends("ical"):
-                self.r("ic")
-            elif self.ends("ful"):
-                self.r("")
-        elif self.b[self.k] == "s":
-            if self.ends("ness"):
-                self.r("")
-
-    def step4(self):
-        """step4() takes off -ant, -ence etc., in context <c>vcvc<v>."""
-        if self.b[self.k - 1] == "a":
-            if self.ends("al"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "c":
-            if self.ends("ance"):
-                pass
-            elif self.ends("ence"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "e":
-            if self.ends("er"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "i":
-            if self.ends("ic"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "l":
-            if self.ends("able"):
-                pass
-            elif self.ends("ible"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "n":
-            if self.ends("ant"):
-                pass
-            elif self.ends("ement"):
-                pass
-            elif self.ends("ment"):
-                pass
-            elif self.ends("ent"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "o":
-            if self.ends("ion") and (self.b[self.j] == "s" or self.b[self.j] == "t"):
-                pass
-            elif self.ends("ou"):
-                pass
-            # takes care of -ous
-            else:
-                return
-        elif self.b[self.k - 1] == "s":
-            if self.ends("ism"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "t":
-            if self.ends("ate"):
-                pass
-            elif self.ends("iti"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "u":
-            if self.ends("ous"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "v":
-            if self.ends("ive"):
-                pass
-            else:
-                return
-        elif self.b[self.k - 1] == "z":
-            if self.ends("ize"):
+
+        # Step 3 deals with -ic-, -full, -ness etc.
+        for suffix, replacement in _STEP3_SUFFIXES.get(b[k], ()):
+            if b.endswith(suffix, 0, k + 1):
+                j = k - len(suffix)
+                if cv.count("vc", 0, j + 1) > 0:
+                    b = b[: j + 1] + replacement + b[j + len(replacement) + 1 :]
+                    k = j + len(replacement)
+                    cv = _cv_pattern(b)
+                break
+
+        # Step 4 removes -ant, -ence etc. when the stem has a measure above 1
+        for suffix in _STEP4_SUFFIXES.get(b[k - 1], ()):
+            if b.endswith(suffix, 0, k + 1):
+                j = k - len(suffix)
+                if suffix == "ion" and b[j] != "s" and b[j] != "t":
+                    continue
+
+                if cv.count("vc", 0, j + 1) > 1:
+                    k = j
+                break
+
+        # Step 5 removes a final -e and changes -ll to -l when the stem has a
+        # measure above 1
+        measure = cv.count("vc", 0, k + 1)
+        if b[k] == "e":
+            if measure > 1 or (measure == 1 and not _is_cvc(b, cv, k - 1)):
+                k -= 1
+
+        if b[k] == "l" and k >= 1 and b[k - 1] == "l" and measure > 1:
+            k -= 1
+
+        return b[: k + 1]
+
+
+porter_stemmer = PorterStemmer()
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class StemCache:
+    """A thread-safe cache of the stems of words with LRU eviction.
+
+    Natural language text repeats the same words over and over, caching
+    their stems avoids running the stemmer for every occurrence. The stem
+    function is called without holding the lock of the cache so it must be
+    safe to call from several threads, as `PorterStemmer` is.
+
+    Args:
+        stem (callable): The stem function, taking a word and its metadata.
+        maxsize (int, optional): The maximum number of words to cache, the
+            least recently used words are evicted first. 0 disables caching.
+    """
+
+    def __init__(self, stem, maxsize=10000):
+        self._stem = stem
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<StemCache {}>".format(self.cache_info())
+
+    def __call__(self, word, metadata=None):
+        with self._lock:
+            try:
+                stem = self._cache[word]
+            except KeyError:
                 pass
             else:
-                return
-        else:
-            return
-        if self.m() > 1:
-            self.k = self.j
-
-    def step5(self):
-        """step5() removes a final -e if m() > 1, and changes -ll to -l if
-        m() > 1.
-        """
-        self.j = self.k
-        if self.b[self.k] == "e":
-            a = self.m()
-            if a > 1 or (a == 1 and not self.cvc(self.k - 1)):
-                self.k = self.k - 1
-        if self.b[self.k] == "l" and self.doublec(self.k) and self.m() > 1:
-            self.k = self.k - 1
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return stem
 
-    def stem(self, p, metadata=None):
-        """In stem(p,i,j), p is a char pointer, and the string to be stemmed
-        is from p[i] to p[j] inclusive. Typically i is zero and j is the
-        offset to the last character of a string, (p[j+1] == '\0'). The
-        stemmer adjusts the characters p[i] ... p[j] and returns the new
-        end-point of the string, k. Stemming never increases word length, so
-        i <= k <= j. To turn the stemmer into a module, declare 'stem' as
-        extern, and delete the remainder of this file.
-        """
-        # TODO: removed i and j from the original implementation
-        # to comply with the `token.update` API
-        i = 0
-        j = len(p) - 1
-        # copy the parameters into statics
-        self.b = p
-        self.k = j
-        self.k0 = i
-        if self.k <= self.k0 + 1:
-            return self.b  # --DEPARTURE--
-
-        # With this line, strings of length 1 or 2 don't go through the
-        # stemming process, although no mention is made of this in the
-        # published algorithm. Remove the line to match the published
-        # algorithm.
-
-        self.step1ab()
-        self.step1c()
-        self.step2()
-        self.step3()
-        self.step4()
-        self.step5()
-        return self.b[self.k0 : self.k + 1]
+            self.misses += 1
 
+        stem = self._stem(word, metadata)
+        with self._lock:
+            if self._maxsize > 0:
+                self._cache[word] = stem
+                if len(self._cache) > self._maxsize:
+                    self._cache.popitem(last=False)
 
-porter_stemmer = PorterStemmer()
+            return stem
+
+    @property
+    def maxsize(self):
+        """The maximum number of words to cache, setting it evicts the least
+        recently used words if there are more."""
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        with self._lock:
+            self._maxsize = maxsize
+            while self._cache and len(self._cache) > maxsize:
+                self._cache.popitem(last=False)
+
+    def cache_info(self):
+        """Returns the hits, misses, maximum and current size of the cache,
+        as `functools.lru_cache` does."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._cache))
+
+    def cache_clear(self):
+        """Empties the cache and resets its statistics."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+
+stem_cache = StemCache(porter_stemmer.stem)
 
 
 def stemmer(token, i=None, tokens=None):
     """Wrapper around the PorterStemmer for inclusion in pipeline.
 
+    Stems are cached in `lunr.stemmer.stem_cache`, shared by the indexing and
+    search pipelines, set its `maxsize` to change the number of cached words.
+
     Args:
         language (str): ISO-639-1 code of the language.
         token (lunr.Token): The token to stem.
         i (int): The index of the token in a set.
         tokens (list): A list of tokens representing the set.
     """
-    return token.update(porter_stemmer.stem)
+    return token.update(stem_cache)
+
+
+def stem_tokens(tokens):
+    """Batch version of `stemmer`, stemming a list of tokens."""
+    for token in tokens:
+        token.string = stem_cache(token.string, token.metadata)
+
+    return tokens
 
 
-Pipeline.register_function(stemmer, "stemmer")
+Pipeline.register_function(stemmer, "stemmer", token_local=True, batch=stem_tokens)
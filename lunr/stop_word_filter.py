@@ -135,13 +135,18 @@ def generate_stop_word_filter(stop_words, language=None):
         if token and str(token) not in stop_words:
             return token
 
+    def filter_stop_words(tokens):
+        return [token for token in tokens if token and str(token) not in stop_words]
+
     # camelCased for for compatibility with lunr.js
     label = (
         "stopWordFilter-{}".format(language)
         if language is not None
         else "stopWordFilter"
     )
-    Pipeline.register_function(stop_word_filter, label)
+    Pipeline.register_function(
+        stop_word_filter, label, token_local=True, batch=filter_stop_words
+    )
     return stop_word_filter
 
 
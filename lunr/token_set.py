@@ -210,6 +210,100 @@ class TokenSet:
         builder.finish()
         return builder.root
 
+    @classmethod
+    def from_flat(cls, finals, edge_offsets, edge_labels, edge_targets):
+        """Creates a TokenSet from a flat node and edge table as returned by
+        `flatten`, in time linear to the number of nodes and edges.
+
+        Returns the root node.
+        """
+        nodes = []
+        for final in finals:
+            node = TokenSet()
+            node.final = bool(final)
+            nodes.append(node)
+
+        for node_id, node in enumerate(nodes):
+            edges = node.edges
+            for i in range(edge_offsets[node_id], edge_offsets[node_id + 1]):
+                edges[edge_labels[i]] = nodes[edge_targets[i]]
+
+        return nodes[0]
+
+    def flatten(self):
+        """Flattens the automaton starting at this node into a node and edge
+        table.
+
+        Nodes are numbered in breadth first order, this node being 0, and
+        nodes shared by several edges are only included once. The edges of
+        node `n` are those between `edge_offsets[n]` and `edge_offsets[n + 1]`
+        in `edge_labels` and `edge_targets`, sorted by label.
+
+        Returns:
+            tuple: Lists of finals, edge offsets, edge labels and edge targets.
+        """
+        node_ids = {id(self): 0}
+        nodes = [self]
+        finals = []
+        edge_offsets = [0]
+        edge_labels = []
+        edge_targets = []
+
+        for node in nodes:
+            finals.append(1 if node.final else 0)
+            for label in sorted(node.edges):
+                child = node.edges[label]
+                if id(child) not in node_ids:
+                    node_ids[id(child)] = len(nodes)
+                    nodes.append(child)
+
+                edge_labels.append(label)
+                edge_targets.append(node_ids[id(child)])
+
+            edge_offsets.append(len(edge_labels))
+
+        return finals, edge_offsets, edge_labels, edge_targets
+
+    def with_word(self, word):
+        """Returns a token set with a word added, leaving this one unchanged.
+
+        Only the nodes on the path of the word are copied, the others are
+        shared with this token set, so the result may not be minimal.
+        """
+        return self._with_final(word, True)
+
+    def without_word(self, word):
+        """Returns a token set with a word removed, leaving this one
+        unchanged, see `with_word`."""
+        return self._with_final(word, False)
+
+    def _with_final(self, word, final):
+        root = node = self._copy()
+        for char in word:
+            child = node.edges.get(char)
+            if child is None:
+                if not final:
+                    return self
+
+                child = TokenSet()
+                node.edges[char] = child
+                # Edges are kept sorted as they are by TokenSetBuilder, which
+                # defines the order intersections return the words in.
+                node.edges = dict(sorted(node.edges.items()))
+            else:
+                child = node.edges[char] = child._copy()
+
+            node = child
+
+        node.final = final
+        return root
+
+    def _copy(self):
+        node = TokenSet()
+        node.final = self.final
+        node.edges = dict(self.edges)
+        return node
+
     @classmethod
     def from_clause(cls, clause):
         if clause.edit_distance:
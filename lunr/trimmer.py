@@ -15,4 +15,14 @@ def trimmer(token, i=None, tokens=None):
     return token.update(trim)
 
 
-Pipeline.register_function(trimmer, "trimmer")
+def trim_tokens(tokens):
+    """Batch version of `trimmer`, trimming a list of tokens."""
+    for token in tokens:
+        match = full_re.match(token.string)
+        if match is not None:
+            token.string = match.group(1)
+
+    return tokens
+
+
+Pipeline.register_function(trimmer, "trimmer", token_local=True, batch=trim_tokens)
@@ -0,0 +1,497 @@
+import threading
+from array import array
+from collections import defaultdict
+from collections.abc import Mapping
+from functools import partial
+
+from lunr.exceptions import BaseLunrException
+from lunr.field_ref import FieldRef
+from lunr.index import Index
+from lunr.inverted_index import InvertedIndex
+from lunr.matrix import FieldMatrix
+from lunr.token_set import TokenSet
+
+
+class UpdatableIndex:
+    """An index documents can be added to, updated in and removed from after
+    it has been built.
+
+    Documents are tokenized and run through the pipeline once, when they are
+    added, and their term frequencies kept in a `lunr.Builder`. The postings
+    of the inverted index are updated in place of rebuilding it, and the
+    field vectors of the changed document are calculated immediately. The
+    field vectors of the other documents depend on the IDF of their terms and
+    the average field lengths, which change with every document, they are
+    recalculated in batches of `refresh_batch_size` by the searches following
+    a change, until then their scores are those of the previous statistics.
+    `refresh` recalculates all of them, as does `serialize`, after which the
+    scores are those of an index built from scratch. Terms are added to and
+    removed from the token set without rebuilding it.
+
+    Searches are performed against a `lunr.Index` of the documents at the
+    time, which is not affected by later changes, so an index can be shared
+    between threads updating and searching it. Recalculated field vectors
+    are updated in place in the current index, as are the rows of its field
+    matrices. The rows of changed documents are overridden instead, until
+    more than a tenth of a matrix is and it is created again.
+
+    Args:
+        builder (lunr.Builder): A builder with the ref and fields configured,
+            and optionally some documents already added to it. The builder
+            is owned by the index and should not be used directly after.
+        refresh_batch_size (int, optional): The number of field vectors
+            recalculated by each search while some are outdated.
+    """
+
+    def __init__(self, builder, refresh_batch_size=1000):
+        self.builder = builder
+        self.refresh_batch_size = refresh_batch_size
+        self._index = None
+        self._lock = threading.Lock()
+        self._token_set = None
+
+        fields = list(builder._fields)
+        self._inverted_index = InvertedIndex.from_dict(
+            builder.inverted_index, fields, doc_refs=builder._documents
+        )
+        self._inverted_index.sorted_terms()
+        self._tombstones = set()
+
+        document_count = len(builder._documents)
+        self._field_vectors = {}
+        self._field_vectors_by_doc_id = {
+            field: _FieldVectorList(self, field) for field in fields
+        }
+        self._field_magnitudes = {field: array("d") for field in fields}
+        self._field_matrices = {}
+        self._max_term_scores = {field: array("d") for field in fields}
+        self._refreshed_max_term_scores = {}
+        # Field vectors are outdated if calculated with an earlier generation
+        # of the statistics, they are refreshed in doc id order from
+        # `_refresh_position` on.
+        self._generation = 0
+        self._vector_generations = {field: array("Q") for field in fields}
+        self._outdated_count = 0
+        self._refresh_position = 0
+        self._grow(document_count)
+
+        self._field_length_totals = defaultdict(int)
+        self._documents_with_field = defaultdict(int)
+        for field_ref, length in builder.field_lengths.items():
+            field_name = FieldRef.from_string(field_ref).field_name
+            self._field_length_totals[field_name] += length
+            self._documents_with_field[field_name] += 1
+
+        self._statistics_changed(list(builder.field_term_frequencies))
+
+    def __repr__(self):
+        return "<UpdatableIndex documents={}>".format(len(self))
+
+    def __len__(self):
+        return self.builder.document_count
+
+    def __contains__(self, ref):
+        return str(ref) in self.builder._documents
+
+    @property
+    def index(self):
+        """The `lunr.Index` of the current documents, created if they have
+        changed since it was last created or some field vectors have been
+        recalculated."""
+        index = self._index
+        if index is None or self._outdated_count:
+            with self._lock:
+                index = self._current_index(self.refresh_batch_size)
+
+        return index
+
+    def add(self, doc, attributes=None):
+        """Adds a document to the index.
+
+        Args:
+            - doc (dict): The document to be added to the index.
+            - attributes (dict, optional): The attributes of the document as
+            accepted by `lunr.Builder.add`.
+
+        Raises:
+            BaseLunrException: If a document with the same ref is already in
+            the index, use `update` to replace it.
+        """
+        with self._lock:
+            doc_ref = str(doc[self.builder._ref])
+            if doc_ref in self.builder._documents:
+                raise BaseLunrException(
+                    "Document {} is already in the index".format(doc_ref)
+                )
+
+            self._add(doc, attributes)
+            self._statistics_changed(self._field_refs(doc_ref))
+
+    def update(self, doc, attributes=None):
+        """Replaces the document with the same ref, or adds it if there is
+        no such document in the index.
+
+        Args:
+            - doc (dict): The new version of the document.
+            - attributes (dict, optional): The attributes of the document as
+            accepted by `lunr.Builder.add`.
+        """
+        with self._lock:
+            doc_ref = str(doc[self.builder._ref])
+            self._remove(doc_ref)
+            self._add(doc, attributes)
+            self._statistics_changed(self._field_refs(doc_ref))
+
+    def remove(self, ref):
+        """Removes a document from the index.
+
+        Args:
+            - ref (str): The reference of the document to remove.
+
+        Returns:
+            bool: Whether the document was in the index.
+        """
+        with self._lock:
+            removed = self._remove(str(ref))
+            if removed:
+                self._statistics_changed(())
+
+        return removed
+
+    def refresh(self):
+        """Recalculates the field vectors outdated by changes to the index,
+        so that scores are those of an index built from scratch."""
+        with self._lock:
+            if self._outdated_count:
+                self._refresh(self._outdated_count)
+
+    def search(self, query_string, **kwargs):
+        """Performs a search against the current documents, accepts the same
+        arguments as `lunr.Index.search`."""
+        return self.index.search(query_string, **kwargs)
+
+    def create_query(self, fields=None):
+        """Creates a Query with the index's fields, see
+        `lunr.Index.create_query`."""
+        return self.index.create_query(fields)
+
+    def query(self, query=None, callback=None, **kwargs):
+        """Performs a query against the current documents, accepts the same
+        arguments as `lunr.Index.query`."""
+        return self.index.query(query, callback, **kwargs)
+
+    def serialize(self, include_token_set=False):
+        """Returns the current documents serialized following lunr-schema,
+        loadable by Lunr.js and `lunr.Index.load`.
+
+        All outdated field vectors are recalculated first, and the term
+        indexes left unused by removed terms closed.
+        """
+        with self._lock:
+            index = self._current_index(self._outdated_count)
+
+        return _compact_term_indexes(
+            index.serialize(include_token_set=include_token_set)
+        )
+
+    def _field_refs(self, doc_ref):
+        return [
+            field_name + FieldRef.JOINER + doc_ref
+            for field_name in self.builder._fields
+        ]
+
+    def _add(self, doc, attributes):
+        """Adds a document to the builder and its postings to the inverted
+        index, reusing the id of the document if it was removed before."""
+        self._detach()
+        builder = self.builder
+        builder.add(doc, attributes=attributes)
+
+        doc_ref = str(doc[builder._ref])
+        inverted_index = self._inverted_index
+        doc_id = inverted_index.intern(doc_ref)
+        self._tombstones.discard(doc_id)
+        self._grow(len(inverted_index.doc_refs))
+
+        for field_name in builder._fields:
+            field_ref = field_name + FieldRef.JOINER + doc_ref
+            self._field_length_totals[field_name] += builder.field_lengths[field_ref]
+            self._documents_with_field[field_name] += 1
+
+            for term in builder.field_term_frequencies[field_ref]:
+                if term not in inverted_index and self._token_set is not None:
+                    self._token_set = self._token_set.with_word(term)
+
+                posting = builder.inverted_index[term]
+                inverted_index.add_document(
+                    term,
+                    posting["_index"],
+                    field_name,
+                    doc_id,
+                    posting[field_name][doc_ref],
+                )
+
+    def _remove(self, doc_ref):
+        """Removes a document from the builder and its postings from the
+        inverted index, its id is recorded as deleted in the indexes."""
+        builder = self.builder
+        if doc_ref not in builder._documents:
+            return False
+
+        self._detach()
+        inverted_index = self._inverted_index
+        doc_id = inverted_index.doc_ids[doc_ref]
+        for field_name in builder._fields:
+            field_ref = field_name + FieldRef.JOINER + doc_ref
+            self._field_length_totals[field_name] -= builder.field_lengths[field_ref]
+            self._documents_with_field[field_name] -= 1
+            self._field_vectors.pop(field_ref, None)
+            self._field_vectors_by_doc_id[field_name][doc_id] = None
+            self._field_magnitudes[field_name][doc_id] = 0
+
+            for term in builder.field_term_frequencies[field_ref]:
+                inverted_index.remove_document(term, field_name, doc_id)
+                if term not in inverted_index and self._token_set is not None:
+                    self._token_set = self._token_set.without_word(term)
+
+        builder.remove(doc_ref)
+        self._tombstones.add(doc_id)
+        return True
+
+    def _detach(self):
+        """Copies what the current index shares before changing it, so that
+        the index is not affected by the change."""
+        if self._index is None:
+            return
+
+        self._index = None
+        self._inverted_index = self._inverted_index.copy()
+        self._tombstones = set(self._tombstones)
+        self._field_vectors = dict(self._field_vectors)
+        self._field_vectors_by_doc_id = {
+            field_name: _FieldVectorList(self, field_name, vectors)
+            for field_name, vectors in self._field_vectors_by_doc_id.items()
+        }
+        self._field_magnitudes = {
+            field_name: array("d", magnitudes)
+            for field_name, magnitudes in self._field_magnitudes.items()
+        }
+        self._field_matrices = {
+            field_name: matrix.copy()
+            for field_name, matrix in self._field_matrices.items()
+        }
+
+    def _grow(self, document_count):
+        """Extends the arrays indexed by doc id and term index to the number
+        of documents and terms."""
+        for vectors in self._field_vectors_by_doc_id.values():
+            vectors.extend([None] * (document_count - len(vectors)))
+
+        for magnitudes in self._field_magnitudes.values():
+            magnitudes.extend([0] * (document_count - len(magnitudes)))
+
+        for generations in self._vector_generations.values():
+            generations.extend([0] * (document_count - len(generations)))
+
+        term_count = self.builder.term_index
+        for max_term_scores in self._max_term_scores.values():
+            max_term_scores.extend([0] * (term_count - len(max_term_scores)))
+
+    def _statistics_changed(self, field_refs):
+        """Calculates the field vectors of the changed documents with the new
+        statistics of the documents, all the other ones are outdated."""
+        builder = self.builder
+        builder.average_field_length = defaultdict(
+            int,
+            {
+                field_name: self._field_length_totals[field_name] / document_count
+                for field_name, document_count in self._documents_with_field.items()
+                if document_count
+            },
+        )
+        self._term_idf_cache = {}
+        self._grow(len(self._inverted_index.doc_refs))
+
+        # The maximum term scores only decrease once all the field vectors
+        # have been recalculated, so they remain upper bounds for pruning.
+        self._refreshed_max_term_scores = {
+            field_name: array("d", [0]) * builder.term_index
+            for field_name in builder._fields
+        }
+        # The field vectors of the changed documents have been removed
+        self._generation += 1
+        self._outdated_count = len(self._field_vectors)
+        for field_ref in field_refs:
+            _field_ref = FieldRef.from_string(field_ref)
+            field_name = _field_ref.field_name
+            doc_id = self._inverted_index.doc_ids[_field_ref.doc_ref]
+            field_vector = self._calculate_field_vector(field_name, doc_id)
+
+            matrix = self._field_matrices.get(field_name)
+            if matrix is not None:
+                matrix.override_row(doc_id, field_vector)
+                if len(matrix.overrides) * 10 > len(matrix.indptr) - 1:
+                    del self._field_matrices[field_name]
+
+        self._refresh(0)
+
+    def _calculate_field_vector(self, field_name, doc_id):
+        field_ref = field_name + FieldRef.JOINER + self._inverted_index.doc_refs[doc_id]
+        _, field_vector = self.builder._create_field_vector(
+            field_ref, self._term_idf_cache
+        )
+        self._field_vectors[field_ref] = field_vector
+        self._field_vectors_by_doc_id[field_name][doc_id] = field_vector
+        self._field_magnitudes[field_name][doc_id] = field_vector.magnitude
+        self._vector_generations[field_name][doc_id] = self._generation
+
+        max_term_scores = self._max_term_scores[field_name]
+        refreshed_max_term_scores = self._refreshed_max_term_scores[field_name]
+        for term_index, score in zip(field_vector.indexes, field_vector.values):
+            if score > max_term_scores[term_index]:
+                max_term_scores[term_index] = score
+            if score > refreshed_max_term_scores[term_index]:
+                refreshed_max_term_scores[term_index] = score
+
+        return field_vector
+
+    def _refresh(self, limit):
+        """Recalculates up to `limit` outdated field vectors, in place in the
+        current index if there is one."""
+        generation = self._generation
+        document_count = len(self._inverted_index.doc_refs)
+        doc_id = self._refresh_position
+        for _ in range(document_count):
+            if not self._outdated_count or limit <= 0:
+                break
+
+            if doc_id >= document_count:
+                doc_id = 0
+
+            for field_name, vectors in self._field_vectors_by_doc_id.items():
+                if (
+                    vectors[doc_id] is not None
+                    and self._vector_generations[field_name][doc_id] != generation
+                ):
+                    field_vector = self._calculate_field_vector(field_name, doc_id)
+                    if field_name in self._field_matrices:
+                        self._field_matrices[field_name].update_row(
+                            doc_id, field_vector
+                        )
+                    self._outdated_count -= 1
+                    limit -= 1
+
+            doc_id += 1
+
+        self._refresh_position = doc_id
+        if not self._outdated_count:
+            self._max_term_scores = self._refreshed_max_term_scores
+            if self._index is not None:
+                self._index.max_term_scores = self._max_term_scores
+
+    def _field_matrix(self, field_name, vectors):
+        """Returns the field matrix of the vectors of a field, which is kept
+        up to date if they are those of the current index."""
+        with self._lock:
+            if vectors is not self._field_vectors_by_doc_id[field_name]:
+                # The vectors of an earlier index are no longer changed
+                return FieldMatrix(vectors)
+
+            matrix = self._field_matrices.get(field_name)
+            if matrix is None:
+                matrix = self._field_matrices[field_name] = FieldMatrix(vectors)
+
+            return matrix
+
+    def _current_index(self, refresh_limit):
+        """Returns the index of the current documents after recalculating up
+        to `refresh_limit` outdated field vectors, must hold the lock."""
+        if self._outdated_count:
+            self._refresh(refresh_limit)
+
+        if self._index is None:
+            self._index = self._create_index()
+
+        return self._index
+
+    def _create_index(self):
+        """Creates a `lunr.Index` sharing the current postings and field
+        vectors, which are copied before the next change."""
+        builder = self.builder
+        index = Index(
+            inverted_index=self._inverted_index,
+            field_vectors=_FieldVectors(
+                self._field_vectors, self._field_vectors_by_doc_id
+            ),
+            token_set=self._token_set,
+            fields=list(builder._fields),
+            pipeline=builder.search_pipeline,
+            max_term_scores=self._max_term_scores,
+            field_magnitudes=self._field_magnitudes,
+        )
+        index._field_matrices = dict(self._field_matrices)
+        index._token_set_factory = partial(self._create_token_set, index)
+        index._tombstones = self._tombstones
+        return index
+
+    def _create_token_set(self, index):
+        """Creates the token set of an index, which is kept up to date with
+        the terms from then on if the index is still the current one."""
+        token_set = TokenSet.from_list(index.inverted_index.sorted_terms())
+        with self._lock:
+            if self._index is index and self._token_set is None:
+                self._token_set = token_set
+
+        return token_set
+
+
+class _FieldVectors(Mapping):
+    """The field vectors of an index created by `UpdatableIndex`, which are
+    already arranged by doc id."""
+
+    def __init__(self, field_vectors, field_vectors_by_doc_id):
+        self._field_vectors = field_vectors
+        self._field_vectors_by_doc_id = field_vectors_by_doc_id
+
+    def __getitem__(self, field_ref):
+        return self._field_vectors[field_ref]
+
+    def __iter__(self):
+        return iter(self._field_vectors)
+
+    def __len__(self):
+        return len(self._field_vectors)
+
+    def by_doc_id(self):
+        return self._field_vectors_by_doc_id
+
+
+class _FieldVectorList(list):
+    """The field vectors of a field of an `UpdatableIndex` indexed by doc id,
+    whose field matrix is created by the updatable index."""
+
+    def __init__(self, updatable_index, field_name, vectors=()):
+        super().__init__(vectors)
+        self._updatable_index = updatable_index
+        self._field_name = field_name
+
+    def field_matrix(self):
+        return self._updatable_index._field_matrix(self._field_name, self)
+
+
+def _compact_term_indexes(serialized_index):
+    """Reassigns contiguous term indexes, in the same order, to a serialized
+    index with gaps left by removed terms, as `lunr.Builder.build` does."""
+    inverted_index = serialized_index["invertedIndex"]
+    term_indexes = sorted(posting["_index"] for _, posting in inverted_index)
+    if term_indexes == list(range(len(term_indexes))):
+        return serialized_index
+
+    compacted = {term_index: i for i, term_index in enumerate(term_indexes)}
+    for _, posting in inverted_index:
+        posting["_index"] = compacted[posting["_index"]]
+
+    for _, elements in serialized_index["fieldVectors"]:
+        elements[::2] = [compacted[term_index] for term_index in elements[::2]]
+
+    return serialized_index
@@ -1,3 +1,5 @@
+from array import array
+from bisect import bisect_left
 from math import sqrt
 
 from lunr.exceptions import BaseLunrException
@@ -10,21 +12,45 @@ class Vector:
 
     Normally no parameters are required for initializing a vector, but in the
     case of loading a previously dumped vector the raw elements can be provided
-    to the constructor.
-
-    For performance reasons vectors are implemented with a flat array, where an
-    elements index is immediately followed by its value.
-    E.g. [index, value, index, value].
-
-    TODO: consider implemetation as 2-tuples.
-
-    This allows the underlying array to be as sparse as possible and still
-    offer decent performance when being used for vector calculations.
+    to the constructor, as a flat list where an elements index is immediately
+    followed by its value. E.g. [index, value, index, value].
+
+    For performance and memory reasons vectors are implemented with two
+    parallel typed arrays, `indexes` holding the sorted indexes of the
+    elements as unsigned integers and `values` their values as doubles. This
+    allows the vector to be as sparse as possible and still offer decent
+    performance when being used for vector calculations.
     """
 
+    __slots__ = ("_magnitude", "indexes", "values")
+
     def __init__(self, elements=None):
         self._magnitude = 0
-        self.elements = elements or []
+        self.indexes = array("I")
+        self.values = array("d")
+        if elements:
+            self.indexes.extend(elements[::2])
+            self.values.extend(elements[1::2])
+
+    @classmethod
+    def from_sorted_pairs(cls, indexes, values):
+        """Creates a vector from its element indexes and values, the indexes
+        must already be sorted and unique.
+
+        Arrays of the right type are used as they are, any other iterable is
+        copied into a new array.
+        """
+        vector = cls.__new__(cls)
+        vector._magnitude = 0
+        if isinstance(indexes, array) and indexes.typecode == "I":
+            vector.indexes = indexes
+        else:
+            vector.indexes = array("I", indexes)
+        if isinstance(values, array) and values.typecode == "d":
+            vector.values = values
+        else:
+            vector.values = array("d", values)
+        return vector
 
     def __repr__(self):
         return "<Vector magnitude={}>".format(self.magnitude)
@@ -32,41 +58,30 @@ class Vector:
     def __iter__(self):
         return iter(self.elements)
 
+    def __len__(self):
+        return len(self.indexes)
+
+    @property
+    def elements(self):
+        """The elements of the vector as a flat list of indexes each followed
+        by its value, as used by lunr-schema."""
+        elements = [0] * (2 * len(self.indexes))
+        elements[::2] = self.indexes
+        elements[1::2] = self.values
+        return elements
+
     def position_for_index(self, index):
         """Calculates the position within the vector to insert a given index.
 
         This is used internally by insert and upsert. If there are duplicate
         indexes then the position is returned as if the value for that index
         were to be updated, but it is the callers responsibility to check
-        whether there is a duplicate at that index
-        """
-        if not self.elements:
-            return 0
-
-        start = 0
-        end = int(len(self.elements) / 2)
-        slice_length = end - start
-        pivot_point = int(slice_length / 2)
-        pivot_index = self.elements[pivot_point * 2]
-
-        while slice_length > 1:
-            if pivot_index < index:
-                start = pivot_point
-            elif pivot_index > index:
-                end = pivot_point
-            else:
-                break
+        whether there is a duplicate at that index.
 
-            slice_length = end - start
-            pivot_point = start + int(slice_length / 2)
-            pivot_index = self.elements[pivot_point * 2]
-
-        if pivot_index == index:
-            return pivot_point * 2
-        elif pivot_index > index:
-            return pivot_point * 2
-        else:
-            return (pivot_point + 1) * 2
+        The position refers to the flat list of elements, i.e. it is twice
+        the position in `indexes`.
+        """
+        return 2 * bisect_left(self.indexes, index)
 
     def insert(self, insert_index, val):
         """Inserts an element at an index within the vector.
@@ -91,21 +106,18 @@ class Vector:
                 arguments, the current value and the passed value to generate
                 the final inserted value at the position in case of collision.
         """
-        fn = fn or (lambda current, passed: passed)
         self._magnitude = 0
-        position = self.position_for_index(insert_index)
-        if position < len(self.elements) and self.elements[position] == insert_index:
-            self.elements[position + 1] = fn(self.elements[position + 1], val)
+        position = bisect_left(self.indexes, insert_index)
+        if position < len(self.indexes) and self.indexes[position] == insert_index:
+            current = self.values[position]
+            self.values[position] = val if fn is None else fn(current, val)
         else:
-            self.elements.insert(position, val)
-            self.elements.insert(position, insert_index)
+            self.indexes.insert(position, insert_index)
+            self.values.insert(position, val)
 
     def to_list(self):
         """Converts the vector to an array of the elements within the vector"""
-        output = []
-        for i in range(1, len(self.elements), 2):
-            output.append(self.elements[i])
-        return output
+        return self.values.tolist()
 
     def serialize(self):
         # TODO: the JS version forces rounding on the elements upon insertion
@@ -116,8 +128,7 @@ class Vector:
     def magnitude(self):
         if not self._magnitude:
             sum_of_squares = 0
-            for i in range(1, len(self.elements), 2):
-                value = self.elements[i]
+            for value in self.values:
                 sum_of_squares += value * value
 
             self._magnitude = sqrt(sum_of_squares)
@@ -127,8 +138,8 @@ class Vector:
     def dot(self, other):
         """Calculates the dot product of this vector and another vector."""
         dot_product = 0
-        a = self.elements
-        b = other.elements
+        a = self.indexes
+        b = other.indexes
         a_len = len(a)
         b_len = len(b)
         i = j = 0
@@ -137,20 +148,29 @@ class Vector:
             a_val = a[i]
             b_val = b[j]
             if a_val < b_val:
-                i += 2
+                i += 1
             elif a_val > b_val:
-                j += 2
+                j += 1
             else:
-                dot_product += a[i + 1] * b[j + 1]
-                i += 2
-                j += 2
+                dot_product += self.values[i] * other.values[j]
+                i += 1
+                j += 1
 
         return dot_product
 
-    def similarity(self, other):
+    def similarity(self, other, other_magnitude=None):
         """Calculates the cosine similarity between this vector and another
-        vector."""
-        if self.magnitude == 0 or other.magnitude == 0:
+        vector.
+
+        Args:
+            other (Vector): The vector to compare to.
+            other_magnitude (float, optional): The magnitude of the other
+                vector if already known, avoids calculating it.
+        """
+        if other_magnitude is None:
+            other_magnitude = other.magnitude
+
+        if self.magnitude == 0 or other_magnitude == 0:
             return 0
 
         return self.dot(other) / self.magnitude
@@ -48,6 +48,10 @@ class TestPipelineBenchmarks:
     def token_to_token_array(token, i, tokens):
         return [token, token]
 
+    @staticmethod
+    def tokens_to_tokens(tokens):
+        return list(tokens)
+
     def test_few_token_to_token(self, few_tokens, benchmark):
         token_to_token_pipeline = Pipeline()
         token_to_token_pipeline.add(self.token_to_token)
@@ -58,6 +62,12 @@ class TestPipelineBenchmarks:
         token_to_token_pipeline.add(self.token_to_token)
         benchmark(token_to_token_pipeline.run, many_tokens)
 
+    def test_many_tokens_to_tokens_batch(self, many_tokens, benchmark):
+        Pipeline.register_function(self.tokens_to_tokens, batch=True)
+        tokens_to_tokens_pipeline = Pipeline()
+        tokens_to_tokens_pipeline.add(self.tokens_to_tokens)
+        benchmark(tokens_to_tokens_pipeline.run, many_tokens)
+
     def test_few_token_to_token_array(self, few_tokens, benchmark):
         token_to_token_array_pipeline = Pipeline()
         token_to_token_array_pipeline.add(self.token_to_token_array)
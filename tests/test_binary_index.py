@@ -0,0 +1,172 @@
+import json
+
+import pytest
+
+from lunr import lunr, get_default_builder
+from lunr.binary_index import HEADER, MAGIC, MappedInvertedIndex, _align
+from lunr.exceptions import BaseLunrException
+from lunr.index import Index
+from lunr.matrix import NUMPY_SUPPORT
+
+
+@pytest.fixture
+def binary_index_path(index, tmp_path):
+    path = tmp_path / "index.bin"
+    index.save_binary(path)
+    return path
+
+
+def _save_version_1(index, path):
+    """Saves an index in version 1 of the format, without field magnitudes."""
+    index.save_binary(path)
+    data = path.read_bytes()
+    _, _, header_length = HEADER.unpack_from(data)
+    header = json.loads(data[HEADER.size : HEADER.size + header_length])
+    data_start = _align(HEADER.size + header_length)
+    del header["sections"]["field_magnitudes"]
+
+    encoded_header = json.dumps(header).encode("utf-8")
+    padding = _align(HEADER.size + len(encoded_header)) - HEADER.size
+    path.write_bytes(
+        HEADER.pack(MAGIC, 1, len(encoded_header))
+        + encoded_header.ljust(padding, b"\x00")
+        + data[data_start:]
+    )
+
+
+class TestBinaryIndex:
+    def test_open_returns_index_with_mapped_inverted_index(self, binary_index_path):
+        idx = Index.open(binary_index_path)
+
+        assert isinstance(idx, Index)
+        assert isinstance(idx.inverted_index, MappedInvertedIndex)
+
+    def test_opened_index_is_equal_to_saved_index(self, index, binary_index_path):
+        idx = Index.open(binary_index_path)
+
+        assert idx == index
+        assert idx.serialize() == index.serialize()
+
+    @pytest.mark.parametrize(
+        "query_string",
+        ["green", "pl*", "*ant", "plont~1", "+plant green -office", "-plant"],
+    )
+    def test_opened_index_search_results_match(
+        self, index, binary_index_path, query_string
+    ):
+        idx = Index.open(binary_index_path)
+
+        assert idx.search(query_string) == index.search(query_string)
+
+    def test_opened_index_reads_field_magnitudes(self, index, binary_index_path):
+        idx = Index.open(binary_index_path)
+
+        assert {
+            field: list(magnitudes)
+            for field, magnitudes in idx.field_magnitudes.items()
+        } == {
+            field: list(magnitudes)
+            for field, magnitudes in index.field_magnitudes.items()
+        }
+
+    def test_open_version_1_calculates_field_magnitudes(self, index, tmp_path):
+        path = tmp_path / "index.bin"
+        _save_version_1(index, path)
+
+        idx = Index.open(path)
+
+        assert {
+            field: list(magnitudes)
+            for field, magnitudes in idx.field_magnitudes.items()
+        } == {
+            field: list(magnitudes)
+            for field, magnitudes in index.field_magnitudes.items()
+        }
+        assert idx.search("green plant") == index.search("green plant")
+
+    def test_opened_index_field_vectors_by_doc_id(self, index, binary_index_path):
+        idx = Index.open(binary_index_path)
+        doc_count = len(index.inverted_index.doc_refs)
+
+        for field in index.fields:
+            vectors = list(idx._field_vectors_by_doc_id[field])
+
+            assert len(vectors) == doc_count
+            assert [
+                vector.elements if vector is not None else None for vector in vectors
+            ] == [
+                vector.elements if vector is not None else None
+                for vector in index._field_vectors_by_doc_id[field]
+            ]
+
+        with pytest.raises(IndexError):
+            idx._field_vectors_by_doc_id[index.fields[0]][doc_count]
+
+    @pytest.mark.skipif(not NUMPY_SUPPORT, reason="NumPy is not installed")
+    def test_opened_index_field_matrix_reads_the_mapped_file(
+        self, index, binary_index_path
+    ):
+        idx = Index.open(binary_index_path)
+
+        for field in index.fields:
+            matrix = idx._field_matrix(field)
+            expected = index._field_matrix(field)
+
+            assert not matrix.data.flags.owndata
+            assert len(matrix.indptr) == len(expected.indptr)
+            for doc_id in range(len(expected.indptr) - 1):
+                row = slice(matrix.indptr[doc_id], matrix.indptr[doc_id + 1])
+                expected_row = slice(
+                    expected.indptr[doc_id], expected.indptr[doc_id + 1]
+                )
+                assert matrix.indices[row].tolist() == (
+                    expected.indices[expected_row].tolist()
+                )
+                assert matrix.data[row].tolist() == expected.data[expected_row].tolist()
+
+        assert idx.search("plant green") == index.search("plant green")
+
+    def test_opened_index_keeps_metadata(self, documents, tmp_path):
+        builder = get_default_builder()
+        builder.metadata_whitelist = ["position"]
+        index = lunr("id", ("title", "body"), documents, builder=builder)
+        path = tmp_path / "index.bin"
+        index.save_binary(path)
+
+        idx = Index.open(path)
+
+        assert idx.search("green") == index.search("green")
+
+    def test_saving_an_opened_index_produces_the_same_file(
+        self, binary_index_path, tmp_path
+    ):
+        path = tmp_path / "other.bin"
+        Index.open(binary_index_path).save_binary(path)
+
+        assert path.read_bytes() == binary_index_path.read_bytes()
+
+    def test_index_without_terms(self, tmp_path):
+        index = lunr("id", ("title",), [{"id": "a", "title": None}])
+        path = tmp_path / "index.bin"
+        index.save_binary(path)
+
+        idx = Index.open(path)
+
+        assert idx.search("green") == []
+
+    def test_open_raises_if_not_a_binary_index(self, tmp_path):
+        path = tmp_path / "index.json"
+        path.write_bytes(b"{" * len(MAGIC) + b"\x00" * 8)
+
+        with pytest.raises(BaseLunrException):
+            Index.open(path)
+
+    def test_open_raises_for_unsupported_format_version(self, index, tmp_path):
+        path = tmp_path / "index.bin"
+        index.save_binary(path)
+        data = bytearray(path.read_bytes())
+        HEADER.pack_into(data, 0, MAGIC, 99, HEADER.unpack_from(data)[2])
+        path.write_bytes(bytes(data))
+
+        with pytest.raises(BaseLunrException):
+            Index.open(path)
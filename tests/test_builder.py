@@ -1,6 +1,13 @@
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import pytest
 
+from lunr import builder as builder_module, get_default_builder
 from lunr.builder import Builder
+from lunr.stop_word_filter import stop_word_filter
 from lunr.token_set import TokenSet
 from lunr.index import Index
 from lunr.vector import Vector
@@ -98,6 +105,132 @@ class TestBuilderAdd:
         assert self.builder.field_lengths == {"title/a": 4}
 
 
+class TestBuilderAddMany:
+    def setup_method(self, method):
+        self.documents = [
+            {"id": "a", "title": "test a testing test"},
+            ({"id": "b", "title": "another test"}, {"boost": 2}),
+            {"id": "c", "title": "more testing"},
+        ]
+
+    def _builder(self):
+        builder = Builder()
+        builder.ref("id")
+        builder.field("title")
+        builder.metadata_whitelist = ["position"]
+        return builder
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 1000])
+    def test_add_many_matches_adding_documents_one_by_one(self, batch_size):
+        expected = self._builder()
+        for document in self.documents:
+            if isinstance(document, tuple):
+                expected.add(document[0], attributes=document[1])
+            else:
+                expected.add(document)
+
+        builder = self._builder()
+        builder.add_many(iter(self.documents), batch_size=batch_size)
+
+        assert builder.inverted_index == expected.inverted_index
+        assert builder.field_term_frequencies == expected.field_term_frequencies
+        assert builder.field_lengths == expected.field_lengths
+        assert builder._documents == expected._documents
+        assert builder.build().serialize() == expected.build().serialize()
+
+    def test_add_many_consumes_documents_lazily(self):
+        consumed = []
+
+        def documents():
+            for document in self.documents[::2]:
+                consumed.append(document["id"])
+                yield document
+                assert len(consumed) - builder.document_count <= 1
+
+        builder = self._builder()
+        builder.add_many(documents(), batch_size=1)
+
+        assert builder.document_count == 2
+
+
+class TestBuilderParallel:
+    def setup_method(self, method):
+        self.documents = [
+            {"id": "a", "title": "plant", "body": "green plants grow"},
+            {"id": "b", "title": "green", "body": "the plant is green"},
+            ({"id": "c", "title": "grow", "body": "plants grow"}, {"boost": 2}),
+            {"id": "d", "title": "plant", "body": "a growing plant"},
+            {"id": "a", "title": "replanted", "body": "green again"},
+        ]
+
+    def _builder(self):
+        builder = get_default_builder()
+        builder.ref("id")
+        builder.field("title")
+        builder.field("body", boost=2)
+        builder.metadata_whitelist = ["position"]
+        return builder
+
+    def _serial_index(self):
+        builder = self._builder()
+        builder.add_many(self.documents)
+        return builder.build()
+
+    def test_merge_matches_serial_build(self):
+        builder = self._builder()
+        builder.add_many(self.documents[:2])
+        partial = self._builder()
+        partial.add_many(self.documents[2:])
+
+        builder.merge(partial)
+
+        expected = self._serial_index()
+        assert json.dumps(builder.build().serialize()) == json.dumps(
+            expected.serialize()
+        )
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 1000])
+    def test_parallel_build_is_identical_to_serial_build(self, tmp_path, batch_size):
+        builder = self._builder()
+        builder.add_many(iter(self.documents), batch_size=batch_size, workers=2)
+        index = builder.build()
+
+        expected = self._serial_index()
+        assert json.dumps(index.serialize(include_token_set=True)) == json.dumps(
+            expected.serialize(include_token_set=True)
+        )
+
+        index.save_binary(tmp_path / "parallel.idx")
+        expected.save_binary(tmp_path / "serial.idx")
+        assert (tmp_path / "parallel.idx").read_bytes() == (
+            tmp_path / "serial.idx"
+        ).read_bytes()
+
+    def test_parallel_build_with_spawn_start_method(self, monkeypatch):
+        # The builder, and its default pipeline of closures, is pickled to be
+        # sent to spawned workers
+        monkeypatch.setattr(
+            builder_module,
+            "ProcessPoolExecutor",
+            partial(
+                ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")
+            ),
+        )
+        builder = self._builder()
+        builder.pipeline.skip(stop_word_filter, ["title"])
+        self.documents.append({"id": "e", "title": "the", "body": "the"})
+
+        builder.add_many(self.documents, workers=2)
+
+        serial_builder = self._builder()
+        serial_builder.pipeline.skip(stop_word_filter, ["title"])
+        serial_builder.add_many(self.documents)
+        assert json.dumps(builder.build().serialize()) == json.dumps(
+            serial_builder.build().serialize()
+        )
+        assert "the" in builder.inverted_index
+
+
 class TestBuilderUse:
     def setup_method(self, method):
         self.builder = Builder()
@@ -175,3 +308,21 @@ class TestBuilderField:
         assert builder._fields["foo"].extractor is None
         assert repr(builder._fields["foo"]) == '<Field "foo" boost="1">'
         assert hash(builder._fields["foo"]) == hash("foo")
+
+
+class TestBuilderNgramIndex:
+    def test_build_creates_no_ngram_index_by_default(self):
+        builder = Builder()
+        builder.field("title")
+        builder.add({"id": "id", "title": "test"})
+
+        assert builder.build().ngram_index is None
+
+    def test_build_creates_ngram_index(self):
+        builder = Builder()
+        builder.field("title")
+        builder.add({"id": "id", "title": "test"})
+
+        index = builder.build(ngram_index=True)
+
+        assert index.ngram_index.expand("*es*") == ["test"]
@@ -6,6 +6,8 @@ import pytest
 from lunr import __TARGET_JS_VERSION__
 from lunr.index import Index
 from lunr.exceptions import BaseLunrException
+from lunr.query import Clause
+from lunr.token_set import TokenSet
 
 from tests.utils import assert_vectors_equal
 
@@ -72,3 +74,275 @@ class TestIndexSerialization:
         with patch("lunr.index.logger") as mock_log:
             Index.load(serialized_index)
             mock_log.warning.assert_called_once()
+
+
+class TestIndexDelete:
+    def test_deleted_documents_are_excluded_from_results(self, index):
+        assert index.delete("b") is True
+
+        assert [result["ref"] for result in index.search("green")] == ["a", "c"]
+
+    def test_deleted_documents_are_excluded_before_limiting(self, index):
+        best = index.search("plant", limit=1)[0]
+
+        index.delete(best["ref"])
+
+        results = index.search("plant", limit=1)
+        assert len(results) == 1
+        assert results[0]["ref"] != best["ref"]
+
+    @pytest.mark.parametrize("query_string", ["-plant", "+green", "gre*"])
+    def test_deleted_documents_are_excluded_from_all_queries(self, index, query_string):
+        index.delete("a")
+
+        assert "a" not in [result["ref"] for result in index.search(query_string)]
+
+    def test_scores_of_other_documents_are_unchanged(self, index):
+        expected = {result["ref"]: result["score"] for result in index.search("green")}
+
+        index.delete("a")
+
+        for result in index.search("green"):
+            assert result["score"] == expected[result["ref"]]
+
+    def test_delete_unknown_or_deleted_document(self, index):
+        assert index.delete("z") is False
+        assert index.delete("a") is True
+        assert index.delete("a") is False
+
+    def test_stats(self, index):
+        index.delete("a")
+
+        stats = index.stats()
+
+        assert stats["documents"] == 3
+        assert stats["deleted_documents"] == 1
+        assert stats["terms"] == len(index.inverted_index)
+
+    def test_deleted_documents_are_dropped_on_serialization(self, index):
+        index.delete("a")
+
+        serialized_index = index.serialize()
+
+        assert all(
+            not ref.endswith("/a") for ref, _ in serialized_index["fieldVectors"]
+        )
+        for _, posting in serialized_index["invertedIndex"]:
+            assert all("a" not in posting[field] for field in index.fields)
+
+        loaded = Index.load(json.dumps(serialized_index))
+        assert loaded.stats()["deleted_documents"] == 0
+        assert [result["ref"] for result in loaded.search("green")] == ["b", "c"]
+
+    def test_deleted_documents_are_dropped_on_save_binary(self, index, tmp_path):
+        index.delete("a")
+        index.save_binary(tmp_path / "idx.bin")
+
+        opened = Index.open(tmp_path / "idx.bin")
+
+        assert opened.stats()["documents"] == 2
+        assert [result["ref"] for result in opened.search("green")] == ["b", "c"]
+
+
+class TestIndexMaxTermScores:
+    def test_max_term_scores_are_the_highest_field_vector_values(self, index):
+        term_index = index.inverted_index["green"]["_index"]
+        expected = max(
+            dict(zip(vector.elements[::2], vector.elements[1::2])).get(term_index, 0)
+            for ref, vector in index.field_vectors.items()
+            if ref.startswith("body/")
+        )
+
+        assert index.max_term_scores["body"][term_index] == expected
+
+    def test_max_term_scores_are_recalculated_on_load(self, index):
+        loaded = Index.load(index.serialize())
+
+        assert loaded.max_term_scores == index.max_term_scores
+
+
+class TestIndexFieldMagnitudes:
+    def test_field_magnitudes_are_indexed_by_doc_id(self, index):
+        doc_id = index.inverted_index.doc_ids["b"]
+
+        assert (
+            index.field_magnitudes["title"][doc_id]
+            == index.field_vectors["title/b"].magnitude
+        )
+
+    def test_builder_field_magnitudes_match_calculated_ones(self, index):
+        expected = Index._calculate_field_magnitudes(
+            index._field_vectors_by_doc_id,
+            index.fields,
+            len(index.inverted_index.doc_refs),
+        )
+
+        assert index.field_magnitudes == expected
+
+    def test_field_magnitudes_are_calculated_on_load(self, index):
+        loaded = Index.load(index.serialize())
+
+        assert loaded.field_magnitudes == index.field_magnitudes
+        assert all(vector._magnitude for vector in loaded.field_vectors.values())
+
+
+class TestIndexTokenSetSerialization:
+    def test_token_set_is_not_serialized_by_default(self, index):
+        assert "tokenSet" not in index.serialize()
+
+    def test_serialized_token_set_is_flat_table(self, index):
+        serialized_index = index.serialize(include_token_set=True)
+
+        finals, edge_offsets, edge_labels, edge_targets = index.token_set.flatten()
+        assert serialized_index["tokenSet"] == {
+            "finals": finals,
+            "edgeOffsets": edge_offsets,
+            "edgeLabels": "".join(edge_labels),
+            "edgeTargets": edge_targets,
+        }
+
+    def test_load_restores_serialized_token_set(self, index):
+        serialized_index = json.dumps(index.serialize(include_token_set=True))
+
+        with patch("lunr.index.TokenSetBuilder") as mock_builder:
+            idx = Index.load(serialized_index)
+            mock_builder.assert_not_called()
+
+        assert idx == index
+        assert sorted(idx.token_set.to_list()) == sorted(index.inverted_index)
+        assert idx.search("pl*") == index.search("pl*")
+
+
+class TestIndexLazyTokenSet:
+    @pytest.mark.parametrize("include_token_set", [True, False])
+    def test_plain_term_queries_do_not_build_token_set(self, index, include_token_set):
+        serialized_index = index.serialize(include_token_set=include_token_set)
+        idx = Index.load(serialized_index, lazy_token_set=True)
+
+        results = idx.search("green +plant")
+
+        assert idx._token_set is None
+        assert results == index.search("green +plant")
+
+    @pytest.mark.parametrize("include_token_set", [True, False])
+    @pytest.mark.parametrize("query_string", ["*ant", "plont~1"])
+    def test_wildcard_and_fuzzy_queries_build_token_set(
+        self, index, include_token_set, query_string
+    ):
+        serialized_index = index.serialize(include_token_set=include_token_set)
+        idx = Index.load(serialized_index, lazy_token_set=True)
+
+        results = idx.search(query_string)
+
+        assert idx._token_set is not None
+        assert results == index.search(query_string)
+
+    def test_token_set_is_built_once_across_threads(self, index):
+        from concurrent.futures import ThreadPoolExecutor
+
+        idx = Index.load(index.serialize(), lazy_token_set=True)
+        factory = MagicMock(wraps=idx._token_set_factory)
+        idx._token_set_factory = factory
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            token_sets = list(executor.map(lambda _: idx.token_set, range(8)))
+
+        factory.assert_called_once()
+        assert all(token_set is token_sets[0] for token_set in token_sets)
+
+
+class TestIndexExactTermExpansion:
+    def test_exact_terms_do_not_intersect_token_set(self, index):
+        with patch("lunr.index.TokenSet.from_clause") as mock_from_clause:
+            results = index.search("green plant")
+            mock_from_clause.assert_not_called()
+
+        assert {r["ref"] for r in results} == {"a", "b", "c"}
+
+    @pytest.mark.parametrize("term", ["green", "plant", "foo", "gre", ""])
+    def test_exact_term_expansion_matches_token_set_intersection(self, index, term):
+        clause = Clause(term)
+        expected = index.token_set.intersect(TokenSet.from_clause(clause)).to_list()
+
+        assert index._expand_term(clause) == expected
+
+    @pytest.mark.parametrize(
+        "term,edit_distance", [("g*n", 0), ("*ant", 0), ("pl*nt", 1)]
+    )
+    def test_wildcard_and_fuzzy_terms_intersect_token_set(
+        self, index, term, edit_distance
+    ):
+        clause = Clause(term, edit_distance=edit_distance)
+        with patch(
+            "lunr.index.TokenSet.from_clause", wraps=TokenSet.from_clause
+        ) as mock_from_clause:
+            index._expand_term(clause)
+            mock_from_clause.assert_called_once_with(clause)
+
+
+class TestIndexPrefixExpansion:
+    def test_trailing_wildcard_terms_do_not_intersect_token_set(self, index):
+        idx = Index.load(index.serialize(), lazy_token_set=True)
+        with patch("lunr.index.TokenSet.from_clause") as mock_from_clause:
+            results = idx.search("pl*")
+            mock_from_clause.assert_not_called()
+
+        assert idx._token_set is None
+        assert results == index.search("pl*")
+
+    @pytest.mark.parametrize("term", ["*", "g*", "gr*", "plant*", "z*", "pla*"])
+    def test_prefix_expansion_matches_token_set_intersection(self, index, term):
+        clause = Clause(term)
+        expected = index.token_set.intersect(TokenSet.from_clause(clause)).to_list()
+
+        assert index._expand_term(clause) == expected
+
+    def test_max_expansions_limits_expanded_terms(self, index):
+        expanded = index._expand_term(Clause("*"), max_expansions=2)
+
+        assert len(expanded) == 2
+        assert set(expanded) < set(index._expand_term(Clause("*")))
+
+
+class TestIndexNgramExpansion:
+    @pytest.mark.parametrize("term", ["*ant", "*e*", "g*n", "*r*n*", "**", "*zz*"])
+    def test_ngram_expansion_matches_token_set_intersection(self, index, term):
+        clause = Clause(term)
+        expected = index.token_set.intersect(TokenSet.from_clause(clause)).to_list()
+        index.create_ngram_index()
+
+        assert index._expand_term(clause) == expected
+
+    def test_leading_wildcard_terms_use_ngram_index(self, index):
+        expected = index.search("*ant")
+        idx = Index.load(index.serialize(), lazy_token_set=True)
+        idx.create_ngram_index()
+
+        assert idx.search("*ant") == expected
+        assert idx._token_set is None
+
+    def test_fuzzy_terms_do_not_use_ngram_index(self, index):
+        index.ngram_index = MagicMock()
+
+        index.search("plont~1")
+
+        index.ngram_index.expand.assert_not_called()
+
+
+class TestIndexFuzzyExpansion:
+    def test_fuzzy_terms_do_not_intersect_token_set(self, index):
+        with patch("lunr.index.TokenSet.from_clause") as mock_from_clause:
+            results = index.search("plont~1")
+            mock_from_clause.assert_not_called()
+
+        assert {r["ref"] for r in results} == {"b", "c"}
+
+    @pytest.mark.parametrize("term", ["plont", "gren", "fellow", "pl", "x", ""])
+    @pytest.mark.parametrize("edit_distance", [1, 2, 3])
+    def test_fuzzy_expansion_matches_token_set_intersection(
+        self, index, term, edit_distance
+    ):
+        clause = Clause(term, edit_distance=edit_distance)
+        expected = index.token_set.intersect(TokenSet.from_clause(clause)).to_list()
+
+        assert index._expand_term(clause) == expected
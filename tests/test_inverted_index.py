@@ -0,0 +1,131 @@
+from array import array
+
+from lunr.inverted_index import InvertedIndex
+
+
+class TestInvertedIndex:
+    def setup_method(self, method):
+        self.inverted_index = {
+            "green": {
+                "title": {"b": {}, "a": {}},
+                "body": {"c": {}},
+                "_index": 0,
+            },
+            "plant": {
+                "title": {"b": {"position": [[0, 5]]}},
+                "body": {},
+                "_index": 1,
+            },
+        }
+        self.index = InvertedIndex.from_dict(
+            self.inverted_index, ["title", "body"], doc_refs=["a", "b", "c"]
+        )
+
+    def test_interns_document_refs_in_order(self):
+        assert self.index.doc_refs == ["a", "b", "c"]
+        assert self.index.doc_ids == {"a": 0, "b": 1, "c": 2}
+
+    def test_intern_assigns_new_ids(self):
+        assert self.index.intern("d") == 3
+        assert self.index.intern("a") == 0
+
+    def test_field_postings_are_sorted_arrays_of_doc_ids(self):
+        doc_ids, metadata = self.index.field_posting("green", "title")
+
+        assert doc_ids == array("I", [0, 1])
+        assert metadata is None
+
+    def test_field_posting_keeps_metadata(self):
+        doc_ids, metadata = self.index.field_posting("plant", "title")
+
+        assert doc_ids == array("I", [1])
+        assert metadata == [{"position": [[0, 5]]}]
+
+    def test_field_posting_for_field_without_documents(self):
+        doc_ids, metadata = self.index.field_posting("plant", "body")
+
+        assert len(doc_ids) == 0
+
+    def test_lookup_returns_term_index(self):
+        term_index, field_postings = self.index.lookup("plant")
+
+        assert term_index == 1
+        assert set(field_postings) == {"title"}
+
+    def test_behaves_as_a_mapping_of_lunr_schema_postings(self):
+        assert "green" in self.index
+        assert "foo" not in self.index
+        assert len(self.index) == 2
+        assert list(self.index) == ["green", "plant"]
+        assert self.index["green"] == {
+            "title": {"a": {}, "b": {}},
+            "body": {"c": {}},
+            "_index": 0,
+        }
+        assert dict(self.index) == self.inverted_index
+
+    def test_add_document_to_posting(self):
+        self.index.add_document("green", 0, "body", 0, {})
+        self.index.add_document("plant", 1, "title", 0, {"position": [[2, 5]]})
+
+        assert self.index.field_posting("green", "body") == (array("I", [0, 2]), None)
+        assert self.index.field_posting("plant", "title") == (
+            array("I", [0, 1]),
+            [{"position": [[2, 5]]}, {"position": [[0, 5]]}],
+        )
+
+    def test_add_document_with_new_term(self):
+        self.index.sorted_terms()
+
+        self.index.add_document("blue", 2, "title", 2, {})
+
+        assert self.index.lookup("blue") == (2, {"title": (array("I", [2]), None)})
+        assert self.index.sorted_terms() == ["blue", "green", "plant"]
+
+    def test_remove_document_from_posting(self):
+        self.index.remove_document("green", "title", 0)
+
+        assert self.index.field_posting("green", "title") == (array("I", [1]), None)
+
+    def test_remove_last_document_removes_term(self):
+        self.index.sorted_terms()
+
+        self.index.remove_document("plant", "title", 1)
+
+        assert "plant" not in self.index
+        assert self.index.sorted_terms() == ["green"]
+
+    def test_copy_is_not_affected_by_changes(self):
+        copy = self.index.copy()
+
+        self.index.add_document("green", 0, "body", 0, {})
+        self.index.remove_document("plant", "title", 1)
+        self.index.intern("d")
+
+        assert copy.field_posting("green", "body") == (array("I", [2]), None)
+        assert "plant" in copy
+        assert copy.doc_refs == ["a", "b", "c"]
+
+    def test_add_lazy_converts_posting_on_lookup(self):
+        index = InvertedIndex(["title", "body"])
+        for doc_ref in ["a", "b", "c"]:
+            index.intern(doc_ref)
+        for term, posting in self.inverted_index.items():
+            index.add_lazy(term, posting)
+
+        assert index._postings["green"] is self.inverted_index["green"]
+        assert index.field_posting("green", "title") == (array("I", [0, 1]), None)
+        assert index._postings["green"] == (0, index.lookup("green")[1])
+        assert index.sorted_terms() == ["green", "plant"]
+        assert dict(index) == self.inverted_index
+
+    def test_add_document_to_lazy_posting(self):
+        index = InvertedIndex(["title", "body"])
+        for doc_ref in ["a", "b", "c"]:
+            index.intern(doc_ref)
+        index.add_lazy("green", self.inverted_index["green"])
+
+        index.add_document("green", 0, "body", 0, {})
+
+        assert index.field_posting("green", "body") == (array("I", [0, 2]), None)
+        assert self.inverted_index["green"]["body"] == {"c": {}}
@@ -0,0 +1,63 @@
+import pytest
+
+from lunr.levenshtein import LevenshteinAutomaton
+from lunr.token_set import TokenSet
+
+
+class TestLevenshteinAutomaton:
+    def accepts(self, term, edit_distance, string):
+        automaton = LevenshteinAutomaton(term, edit_distance)
+        state = automaton.start()
+        for char in string:
+            state = automaton.step(state, char)
+
+        return automaton.is_match(state)
+
+    @pytest.mark.parametrize(
+        "string",
+        ["bar", "ba", "bbar", "bor", "abr", "xbar", "barx"],
+    )
+    def test_accepts_strings_within_one_edit(self, string):
+        assert self.accepts("bar", 1, string)
+
+    @pytest.mark.parametrize("string", ["b", "foo", "bxxr", "arb", "rab"])
+    def test_rejects_strings_further_than_one_edit(self, string):
+        assert not self.accepts("bar", 1, string)
+
+    def test_state_is_dead_when_edits_are_exhausted(self):
+        automaton = LevenshteinAutomaton("bar", 1)
+        state = automaton.step(automaton.start(), "x")
+        state = automaton.step(state, "y")
+
+        assert not state
+
+    def test_transitions_are_cached(self):
+        automaton = LevenshteinAutomaton("bar", 1)
+        start = automaton.start()
+
+        assert automaton.step(start, "b") is automaton.step(start, "b")
+
+    @pytest.mark.parametrize(
+        "words,term",
+        [
+            (["a", "bar", "bat", "baz", "bazaar", "foo", "rab", "tab"], "bar"),
+            (["r", "rai", "rain", "ran", "rn", "ru", "ruin", "run", "urn"], "run"),
+        ],
+    )
+    @pytest.mark.parametrize("edit_distance", [1, 2])
+    def test_intersect_matches_fuzzy_token_set(self, words, term, edit_distance):
+        token_set = TokenSet.from_list(words)
+        expected = token_set.intersect(
+            TokenSet.from_fuzzy_string(term, edit_distance)
+        ).to_list()
+
+        automaton = LevenshteinAutomaton(term, edit_distance)
+
+        assert automaton.intersect(token_set) == expected
+
+    def test_intersect_returns_matches_in_token_set_intersection_order(self):
+        words = ["r", "rai", "rain", "ran", "rn", "ru", "ruin", "run", "urn"]
+
+        matches = LevenshteinAutomaton("run", 2).intersect(TokenSet.from_list(words))
+
+        assert matches == ["urn", "r", "rn", "rai", "rain", "ran", "ru", "ruin", "run"]
@@ -0,0 +1,81 @@
+from array import array
+
+import pytest
+
+from lunr.matrix import NUMPY_SUPPORT, FieldMatrix
+from lunr.vector import Vector
+
+pytestmark = pytest.mark.skipif(not NUMPY_SUPPORT, reason="NumPy is not installed")
+
+
+class TestFieldMatrix:
+    def setup_method(self, method):
+        self.field_vectors = [
+            Vector([0, 1.5, 2, 0.25, 5, 3.0]),
+            None,
+            Vector([1, 2.0, 5, 1.0]),
+            Vector([3, 4.0]),
+        ]
+        self.matrix = FieldMatrix(self.field_vectors)
+
+    def test_stores_field_vectors_in_csr_format(self):
+        assert self.matrix.indptr.tolist() == [0, 3, 3, 5, 6]
+        assert self.matrix.indices.tolist() == [0, 2, 5, 1, 5, 3]
+        assert self.matrix.data.tolist() == [1.5, 0.25, 3.0, 2.0, 1.0, 4.0]
+
+    def test_similarities_match_vector_similarity(self):
+        query_vector = Vector([2, 1.0, 3, 0.5, 5, 2.0])
+
+        similarities = self.matrix.similarities(query_vector, [3, 0, 2])
+
+        assert similarities == [
+            query_vector.similarity(self.field_vectors[3]),
+            query_vector.similarity(self.field_vectors[0]),
+            query_vector.similarity(self.field_vectors[2]),
+        ]
+
+    def test_similarities_of_documents_without_field_are_zero(self):
+        assert self.matrix.similarities(Vector([0, 1.0]), [1]) == [0]
+
+    def test_similarities_with_empty_query_vector_are_zero(self):
+        assert self.matrix.similarities(Vector(), [0, 2]) == [0, 0]
+
+    def test_from_buffers_does_not_copy_elements(self):
+        matrix = FieldMatrix.from_buffers(
+            array("Q", [0, 3, 3, 5, 6]),
+            array("I", [0, 2, 5, 1, 5, 3]),
+            array("d", [1.5, 0.25, 3.0, 2.0, 1.0, 4.0]),
+        )
+        query_vector = Vector([2, 1.0, 3, 0.5, 5, 2.0])
+
+        assert not matrix.indices.flags.owndata
+        assert not matrix.data.flags.owndata
+        assert matrix.similarities(query_vector, [3, 0, 2]) == (
+            self.matrix.similarities(query_vector, [3, 0, 2])
+        )
+
+    def test_overridden_rows_use_their_vectors(self):
+        query_vector = Vector([2, 1.0, 3, 0.5, 5, 2.0])
+        vector = Vector([2, 3.0, 3, 1.0])
+
+        self.matrix.override_row(0, vector)
+        self.matrix.override_row(4, None)
+
+        assert self.matrix.similarities(query_vector, [3, 0, 4]) == [
+            query_vector.similarity(self.field_vectors[3]),
+            query_vector.similarity(vector),
+            0,
+        ]
+
+    def test_update_row_does_not_affect_copies(self):
+        copy = self.matrix.copy()
+        query_vector = Vector([0, 1.0, 5, 1.0])
+        vector = Vector([0, 1.0, 2, 2.0, 5, 4.0])
+
+        copy.update_row(0, vector)
+
+        assert copy.similarities(query_vector, [0]) == [query_vector.similarity(vector)]
+        assert self.matrix.similarities(query_vector, [0]) == [
+            query_vector.similarity(self.field_vectors[0])
+        ]
+        assert copy.indices is self.matrix.indices
@@ -0,0 +1,50 @@
+import pytest
+
+from lunr.ngram_index import END, START, NgramIndex
+
+
+class TestNgramIndex:
+    def setup_method(self, method):
+        self.terms = sorted(["serve", "observe", "service", "sing", "string", "a"])
+        self.index = NgramIndex(self.terms)
+
+    def test_postings_refer_to_term_positions(self):
+        positions = self.index.postings["erv"]
+
+        assert sorted(self.terms[i] for i in positions) == [
+            "observe",
+            "serve",
+            "service",
+        ]
+
+    def test_terms_are_padded_with_start_and_end_markers(self):
+        assert START + "a" + END in self.index.postings
+        assert "ng" + END in self.index.postings
+
+    @pytest.mark.parametrize(
+        "pattern,expected",
+        [
+            ("*serv*", ["observe", "serve", "service"]),
+            ("*ng", ["sing", "string"]),
+            ("s*ing", ["sing", "string"]),
+            ("*e*v*", ["observe", "serve", "service"]),
+            ("*a*", ["a"]),
+            ("**", ["a", "observe", "serve", "service", "sing", "string"]),
+            ("*xyz*", []),
+        ],
+    )
+    def test_expand_returns_matching_terms(self, pattern, expected):
+        assert sorted(self.index.expand(pattern)) == expected
+
+    def test_expand_never_matches_empty_term(self):
+        index = NgramIndex(["", "a"])
+
+        assert index.expand("**") == ["a"]
+
+    def test_estimate_memory_matches_memory_usage(self):
+        assert NgramIndex.estimate_memory(self.terms) == self.index.memory_usage()
+
+    def test_memory_usage_grows_with_terms(self):
+        smaller = NgramIndex(self.terms[:2])
+
+        assert 0 < smaller.memory_usage() < self.index.memory_usage()
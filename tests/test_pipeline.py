@@ -1,9 +1,11 @@
+import pickle
 from unittest.mock import patch
 
 import pytest
 
 from lunr.exceptions import BaseLunrException
 from lunr.pipeline import Pipeline
+from lunr.token import Token
 
 
 def noop(*args, **kwargs):
@@ -213,6 +215,224 @@ class TestRun(BaseTestPipeline):
         assert self.pipeline.run(["Foo"], field_name="nothing") == ["Foo"]
 
 
+class TestRunBatch(BaseTestPipeline):
+    def test_batch_function_is_called_once_with_every_token(self):
+        received = []
+
+        def fn(tokens):
+            received.append(tokens)
+            return [token.upper() for token in tokens if token != "b"]
+
+        Pipeline.register_function(fn, "fn", batch=True)
+        self.pipeline.add(fn, lambda t, *args: t + "!")
+
+        assert self.pipeline.run(["a", "b", "c"]) == ["A!", "C!"]
+        assert received == [["a", "b", "c"]]
+
+    def test_batch_version_of_function_is_called_in_its_place(self):
+        def fn(t, *args):
+            raise AssertionError("Called per token")
+
+        Pipeline.register_function(fn, "fn", batch=lambda tokens: tokens[::-1])
+        self.pipeline.add(fn)
+
+        assert self.pipeline.run(["a", "b"]) == ["b", "a"]
+        assert self.pipeline.serialize() == ["fn"]
+
+    def test_skip_batch_function(self):
+        def fn(tokens):
+            return []
+
+        Pipeline.register_function(fn, "fn", batch=True)
+        self.pipeline.add(fn)
+        self.pipeline.skip(fn, ["title"])
+
+        assert self.pipeline.run(["a"], field_name="body") == []
+        assert self.pipeline.run(["a"], field_name="title") == ["a"]
+
+
+class TestRunCached(BaseTestPipeline):
+    def setup_method(self, method):
+        self.calls = []
+
+        def upper(token, *args):
+            self.calls.append(str(token))
+            return token.update(lambda s, m: s.upper())
+
+        upper.token_local = True
+        self.upper = upper
+
+    def run(self, strings, field_name=None):
+        tokens = [Token(string, {"index": i}) for i, string in enumerate(strings)]
+        return self.pipeline.run(tokens, field_name, cache=True)
+
+    def test_reuses_results_of_token_local_functions(self):
+        self.pipeline.add(self.upper)
+
+        results = self.run(["foo", "bar", "foo"])
+
+        assert [str(token) for token in results] == ["FOO", "BAR", "FOO"]
+        assert [token.metadata["index"] for token in results] == [0, 1, 2]
+        assert self.calls == ["foo", "bar"]
+
+    def test_does_not_cache_if_a_function_is_not_token_local(self):
+        self.pipeline.add(self.upper, lambda token, *args: token)
+
+        self.run(["foo", "foo"])
+
+        assert self.calls == ["foo", "foo"]
+
+    def test_caches_expanded_and_filtered_tokens(self):
+        def expand(token, *args):
+            if str(token) != "baz":
+                return [token, token.clone(lambda s, m: s + "s")]
+
+        expand.token_local = True
+        self.pipeline.add(expand, self.upper)
+
+        results = self.run(["foo", "baz", "foo", "baz"])
+
+        assert [str(token) for token in results] == ["FOO", "FOOS", "FOO", "FOOS"]
+        assert [token.metadata["index"] for token in results] == [0, 0, 2, 2]
+        assert self.calls == ["foo", "foos"]
+
+    def test_results_are_cached_by_field_name(self):
+        self.pipeline.add(self.upper)
+        self.pipeline.skip(self.upper, ["name"])
+
+        assert [str(token) for token in self.run(["foo"], "name")] == ["foo"]
+        assert [str(token) for token in self.run(["foo"], "body")] == ["FOO"]
+
+    def test_changing_the_pipeline_clears_the_cache(self):
+        self.pipeline.add(self.upper)
+        self.run(["foo"])
+
+        self.pipeline.skip(self.upper, ["name"])
+        self.run(["foo"])
+
+        assert self.calls == ["foo", "foo"]
+
+    def test_cache_size(self):
+        self.pipeline.cache_size = 1
+        self.pipeline.add(self.upper)
+
+        self.run(["foo", "bar", "foo", "bar"])
+
+        assert self.calls == ["foo", "bar", "bar"]
+
+
+class TestCompile(BaseTestPipeline):
+    def setup_method(self, method):
+        self.calls = []
+
+        def upper(t, *args):
+            self.calls.append(("upper", t))
+            return t.upper()
+
+        def expand(t, *args):
+            self.calls.append(("expand", t))
+            if t != "b":
+                return [t, t + "s"]
+
+        upper.token_local = expand.token_local = True
+        self.upper, self.expand = upper, expand
+
+    def test_fuses_token_local_functions_in_a_single_pass(self):
+        self.pipeline.add(self.expand, self.upper)
+
+        assert self.pipeline.compile()(["a", "b", "c"]) == ["A", "AS", "C", "CS"]
+        assert self.calls == [
+            ("expand", "a"),
+            ("upper", "a"),
+            ("upper", "as"),
+            ("expand", "b"),
+            ("expand", "c"),
+            ("upper", "c"),
+            ("upper", "cs"),
+        ]
+
+    def test_is_equivalent_to_run(self):
+        def number(t, i, tokens):
+            return "{}{}/{}".format(t, i, len(tokens))
+
+        self.pipeline.add(self.expand, number, self.upper, lambda t, *args: t)
+        self.pipeline.skip(self.upper, ["name"])
+
+        for field_name in (None, "name", "body"):
+            compiled = self.pipeline.compile(field_name)(["a", "b", "c"])
+            assert compiled == self.pipeline.run(["a", "b", "c"], field_name)
+
+        assert self.pipeline.run(["a", "b"]) == ["A0/2", "AS1/2"]
+
+    def test_leaves_out_skipped_functions(self):
+        self.pipeline.add(self.upper)
+        self.pipeline.skip(self.upper, ["name"])
+
+        assert self.pipeline.compile("name")(["a"]) == ["a"]
+        assert self.pipeline.compile("body")(["a"]) == ["A"]
+        assert self.pipeline.compile()(["a"]) == ["A"]
+        assert self.calls == [("upper", "a"), ("upper", "a")]
+
+    def test_compiled_function_is_reused(self):
+        self.pipeline.add(self.upper)
+
+        assert self.pipeline.compile("body") is self.pipeline.compile("body")
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda self: self.pipeline.add(self.expand),
+            lambda self: self.pipeline.after(self.upper, self.expand),
+            lambda self: self.pipeline.before(self.upper, self.expand),
+            lambda self: self.pipeline.remove(self.upper),
+            lambda self: self.pipeline.skip(self.upper, ["body"]),
+            lambda self: self.pipeline.reset(),
+        ],
+    )
+    def test_changing_the_pipeline_invalidates_compiled_functions(self, change):
+        self.pipeline.add(self.upper)
+        compiled = self.pipeline.compile("body")
+
+        change(self)
+
+        assert self.pipeline.compile("body") is not compiled
+
+    def test_pipeline_can_be_pickled_after_compiling(self):
+        Pipeline.register_function(fn, "fn")
+        self.pipeline.add(fn)
+        self.pipeline.compile()
+
+        pipeline = pickle.loads(pickle.dumps(self.pipeline))
+
+        assert pipeline.serialize() == ["fn"]
+        assert pipeline.compile()(["a"]) == []
+
+
+class TestPickle(BaseTestPipeline):
+    def test_pipeline_of_registered_functions_is_pickled_by_label(self):
+        def closure(t, *args):
+            return t
+
+        Pipeline.register_function(closure, "closure")
+        Pipeline.register_function(fn, "fn")
+        self.pipeline.add(closure, fn)
+        self.pipeline.skip(closure, ["title", "body"])
+        self.pipeline.cache_size = 10
+
+        pipeline = pickle.loads(pickle.dumps(self.pipeline))
+
+        assert pipeline._stack == [closure, fn]
+        assert dict(pipeline._skip) == {closure: {"title", "body"}}
+        assert pipeline.cache_size == 10
+
+    def test_pipeline_of_unregistered_functions_is_pickled_by_value(self):
+        self.pipeline.add(fn)
+
+        pipeline = pickle.loads(pickle.dumps(self.pipeline))
+
+        assert pipeline._stack == [fn]
+
+
 class TestSerialize(BaseTestPipeline):
     def test_serialize_returns_array_of_registered_function_labels(self):
         Pipeline.register_function(fn, "fn")
@@ -234,6 +454,13 @@ class TestRegisterFunction(BaseTestPipeline):
 
         assert self.fn.label == "fn"
 
+    def test_register_function_declares_whether_function_is_token_local(self):
+        Pipeline.register_function(self.fn, "fn")
+        assert self.fn.token_local is False
+
+        Pipeline.register_function(self.fn, "fn", token_local=True)
+        assert self.fn.token_local is True
+
     def test_register_function_adds_defaults_to_name_of_the_function(self):
         Pipeline.register_function(self.fn)
 
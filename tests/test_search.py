@@ -2,7 +2,8 @@ import pytest
 
 from lunr import lunr
 from lunr.query import Query, QueryPresence
-from lunr.exceptions import QueryParseError
+from lunr.exceptions import BaseLunrException, QueryParseError
+from lunr.matrix import NUMPY_SUPPORT
 
 
 class TestSingleTermSearch:
@@ -115,6 +116,21 @@ class TestSearchWildcardTrailing:
         assert set(results[0]["match_data"].metadata.keys()) == {"plumb", "plant"}
         assert set(results[1]["match_data"].metadata.keys()) == {"plumb", "plant"}
 
+    def test_max_expansions_limits_matching_terms(self, index):
+        results = index.search("pl*", max_expansions=1)
+
+        assert {r["ref"] for r in results} == {"b", "c"}
+        for result in results:
+            assert set(result["match_data"].metadata.keys()) == {"plant"}
+
+    @pytest.mark.parametrize("max_expansions", [0, -1])
+    def test_max_expansions_less_than_one_raises(self, index, max_expansions):
+        with pytest.raises(BaseLunrException):
+            index.search("pl*", max_expansions=max_expansions)
+
+        with pytest.raises(BaseLunrException):
+            index.search_many(["pl*"], max_expansions=max_expansions)
+
 
 class TestSearchWildcardLeading:
     def test_matching_no_matches(self, index):
@@ -397,6 +413,18 @@ class TestBuildTimeFieldBoost:
         assert results[0]["ref"] == "b"
 
 
+class TestLunrDocumentsIterable:
+    def test_documents_can_be_a_generator(self, documents, index):
+        idx = lunr(
+            ref="id",
+            fields=("title", "body"),
+            documents=(document for document in documents),
+        )
+
+        assert idx.serialize() == index.serialize()
+        assert idx.search("green plant") == index.search("green plant")
+
+
 class TestBuildTimeDocumentBoost:
     @pytest.mark.parametrize("query_or_search", ["query", "search"])
     def test_no_query_boosts_document_boost_ranks_higher(
@@ -416,3 +444,162 @@ class TestBuildTimeDocumentBoost:
             results = idx.query(query)
 
         assert results[0]["ref"] == "c"
+
+
+class TestSearchLimit:
+    def test_limit_returns_highest_scoring_results(self, index):
+        results = index.search("green", limit=2)
+
+        assert len(results) == 2
+        assert results == index.search("green")[:2]
+
+    def test_limit_larger_than_matches_returns_all_results(self, index):
+        results = index.search("plant", limit=10)
+
+        assert [r["ref"] for r in results] == ["b", "c"]
+
+    def test_limit_on_query(self, index):
+        query = Query(index.fields)
+        query.term("green")
+        results = index.query(query, limit=1)
+
+        assert len(results) == 1
+        assert results[0]["ref"] == index.search("green")[0]["ref"]
+
+    def test_limit_on_negated_query(self, index):
+        results = index.search("-qwertyuiop", limit=2)
+
+        assert len(results) == 2
+
+    @pytest.mark.parametrize("query_string", ["green", "-qwertyuiop"])
+    def test_zero_limit_returns_no_results(self, index, query_string):
+        assert index.search(query_string, limit=0) == []
+
+    @pytest.mark.parametrize("prune", [False, True])
+    def test_negative_limit_raises(self, index, prune):
+        with pytest.raises(BaseLunrException):
+            index.search("green", limit=-1, prune=prune)
+
+        with pytest.raises(BaseLunrException):
+            index.search_many(["green"], limit=-1)
+
+
+class TestSearchPruning:
+    @pytest.mark.parametrize(
+        "query_string", ["green", "green plant", "pl*", "+plant green -office"]
+    )
+    @pytest.mark.parametrize("limit", [1, 2, 3])
+    def test_pruned_results_match_unpruned_results(self, index, query_string, limit):
+        results = index.search(query_string, limit=limit, prune=True)
+
+        assert results == index.search(query_string)[:limit]
+
+    def test_prune_with_zero_limit_returns_no_results(self, index):
+        assert index.search("green", limit=0, prune=True) == []
+
+    def test_prune_without_limit_returns_all_results(self, index):
+        results = index.search("green", prune=True)
+
+        assert results == index.search("green")
+
+    def test_pruning_skips_scoring_documents(self, monkeypatch):
+        # A few short documents about green plants among many long ones
+        # mentioning green once, which cannot outscore them.
+        documents = [
+            {"id": str(i), "title": "green plant", "body": "green plant"}
+            for i in range(5)
+        ] + [
+            {
+                "id": str(i),
+                "title": "report {}".format(i),
+                "body": "the green office " + "quarterly figures " * 10,
+            }
+            for i in range(5, 200)
+        ]
+        index = lunr(ref="id", fields=("title", "body"), documents=documents)
+        index.vectorized_scoring = False
+        expected = index.search("green plant")[:3]
+        scored = []
+        score = index._score
+
+        def _score(doc_id, fields, query_vectors):
+            scored.append(doc_id)
+            return score(doc_id, fields, query_vectors)
+
+        monkeypatch.setattr(index, "_score", _score)
+        results = index.search("green plant", limit=3, prune=True)
+
+        assert results == expected
+        assert len(scored) < len(index.search("green plant"))
+
+
+class TestSearchMany:
+    QUERY_STRINGS = [
+        "green",
+        "green plant",
+        "pl*",
+        "+plant green -office",
+        "plont~1",
+        "green",
+        "title:plant",
+    ]
+
+    def test_results_match_single_searches(self, index):
+        results = index.search_many(self.QUERY_STRINGS)
+
+        assert results == [
+            index.search(query_string) for query_string in self.QUERY_STRINGS
+        ]
+
+    @pytest.mark.parametrize("prune", [False, True])
+    def test_limit(self, index, prune):
+        results = index.search_many(self.QUERY_STRINGS, limit=1, prune=prune)
+
+        assert results == [
+            index.search(query_string, limit=1) for query_string in self.QUERY_STRINGS
+        ]
+
+    def test_workers(self, index):
+        results = index.search_many(self.QUERY_STRINGS, workers=2)
+
+        assert results == [
+            index.search(query_string) for query_string in self.QUERY_STRINGS
+        ]
+
+    def test_terms_are_expanded_once(self, index, monkeypatch):
+        expand_term = index._expand_term
+        expanded = []
+
+        def _expand_term(clause, max_expansions=None):
+            expanded.append(clause.term)
+            return expand_term(clause, max_expansions)
+
+        monkeypatch.setattr(index, "_expand_term", _expand_term)
+        index.search_many(["green plant", "plant", "green pl*", "pl*"])
+
+        assert sorted(expanded) == ["green", "pl*", "plant"]
+
+    def test_invalid_query_raises(self, index):
+        with pytest.raises(QueryParseError):
+            index.search_many(["green", "foo:bar"])
+
+
+@pytest.mark.skipif(not NUMPY_SUPPORT, reason="NumPy is not installed")
+class TestSearchVectorizedScoring:
+    @pytest.mark.parametrize(
+        "query_string", ["green", "green plant", "pl*", "+plant green -office", "-a"]
+    )
+    def test_vectorized_scores_match_vector_similarity(self, index, query_string):
+        index.vectorized_scoring = False
+        expected = index.search(query_string)
+        index.vectorized_scoring = True
+
+        assert index.search(query_string) == expected
+
+    def test_field_matrices_are_created_once(self, index):
+        index.vectorized_scoring = True
+        index.search("green")
+        matrices = dict(index._field_matrices)
+        index.search("plant")
+
+        assert all(index._field_matrices[f] is m for f, m in matrices.items())
@@ -0,0 +1,194 @@
+import threading
+
+import pytest
+
+from lunr.exceptions import BaseLunrException
+from lunr.segmented_index import SegmentedIndex
+
+from tests.utils import (
+    assert_same_results,
+    create_builder,
+    read_json_fixture,
+    search_results,
+)
+
+FIELDS = ("title", "text")
+QUERIES = ["plugin", "theme config", "mk*", "serve~1", "+build -theme", "-plugin"]
+
+
+def _assert_same_results(index, documents):
+    expected = create_builder(documents, FIELDS).build()
+    assert_same_results(index, expected, QUERIES, ordered=False)
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return read_json_fixture("mkdocs_index.json")["docs"][:60]
+
+
+def _segmented_index(documents, batch_size=10, **kwargs):
+    kwargs.setdefault("background_merges", False)
+    index = SegmentedIndex(create_builder(fields=FIELDS), **kwargs)
+    for i in range(0, len(documents), batch_size):
+        index.add_documents(documents[i : i + batch_size])
+    return index
+
+
+class TestSegmentedIndex:
+    def test_each_batch_is_a_segment(self, documents):
+        index = _segmented_index(documents)
+
+        assert len(index.segments) == 6
+        assert len(index) == 60
+
+    def test_results_match_single_index(self, documents):
+        index = _segmented_index(documents)
+
+        _assert_same_results(index, documents)
+
+    def test_adding_documents_does_not_rescore_other_segments(
+        self, documents, monkeypatch
+    ):
+        index = _segmented_index(documents[:50])
+        search_results(index, "serve~1")
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                "lunr.builder.Builder._create_field_vectors",
+                lambda builder: pytest.fail("field vectors were calculated"),
+            )
+            index.add_documents(documents[50:])
+
+        _assert_same_results(index, documents)
+
+    def test_results_match_single_index_with_boosts(self, documents):
+        def boosted_builder():
+            builder = create_builder(fields=())
+            builder.field("title", boost=2)
+            builder.field("text")
+            return builder
+
+        boosted = [
+            (document, {"boost": 1 + i % 3}) for i, document in enumerate(documents)
+        ]
+        index = SegmentedIndex(boosted_builder(), background_merges=False)
+        for i in range(0, len(boosted), 10):
+            index.add_documents(boosted[i : i + 10])
+
+        expected = boosted_builder()
+        expected.add_many(boosted)
+        assert_same_results(index, expected.build(), QUERIES, ordered=False)
+
+    def test_documents_in_builder_are_the_first_segment(self, documents):
+        index = SegmentedIndex(create_builder(documents[:10], FIELDS))
+
+        assert len(index.segments) == 1
+        assert documents[0]["id"] in index
+
+    def test_deleted_documents_are_excluded(self, documents):
+        index = _segmented_index(documents)
+        ref = search_results(index, "plugin")[0][0]
+
+        assert index.delete(ref) is True
+
+        assert ref not in index
+        assert ref not in [ref for ref, _ in search_results(index, "plugin")]
+        assert ref not in [ref for ref, _ in search_results(index, "plugin", limit=1)]
+        assert index.delete(ref) is False
+
+    def test_adding_existing_document_replaces_it(self, documents):
+        index = _segmented_index(documents)
+        document = dict(documents[0], text="zyzzyva")
+
+        index.add_documents([document])
+
+        assert len(index) == 60
+        assert [ref for ref, _ in search_results(index, "zyzzyva")] == [document["id"]]
+
+    def test_merge_purges_deleted_documents(self, documents):
+        index = _segmented_index(documents)
+        deleted = [document["id"] for document in documents[::3]]
+        for ref in deleted:
+            index.delete(ref)
+
+        index.merge()
+
+        assert len(index.segments) == 1
+        assert not index.segments[0].deleted
+        _assert_same_results(
+            index, [document for document in documents if document["id"] not in deleted]
+        )
+
+    def test_merge_policy_merges_segments_of_the_same_tier(self, documents):
+        index = _segmented_index(documents, batch_size=5, merge_factor=3)
+
+        assert sorted(len(segment) for segment in index.segments) == [15, 45]
+        _assert_same_results(index, documents)
+
+    def test_background_merges(self, documents):
+        index = _segmented_index(
+            documents, batch_size=5, merge_factor=3, background_merges=True
+        )
+
+        index.wait_for_merges()
+
+        assert len(index.segments) < 12
+        _assert_same_results(index, documents)
+
+    def test_query(self, documents):
+        index = _segmented_index(documents)
+        query = index.create_query(["title"])
+        query.term("mkdocs")
+
+        results = index.query(query)
+
+        assert results
+        assert results == index.query(query)
+
+    def test_searches_use_previous_segments_while_refreshing(
+        self, documents, monkeypatch
+    ):
+        index = _segmented_index(documents[:10])
+        expected = search_results(index, "zyzzyva~1")
+        refreshing, release = threading.Event(), threading.Event()
+        segment_index = index._segment_index
+
+        def blocking_segment_index(*args):
+            refreshing.set()
+            release.wait(5)
+            return segment_index(*args)
+
+        monkeypatch.setattr(index, "_segment_index", blocking_segment_index)
+        adding = threading.Thread(
+            target=index.add_documents,
+            args=([{"id": "new", "title": "zyzzyva", "text": ""}],),
+        )
+        adding.start()
+        refreshing.wait(5)
+
+        assert search_results(index, "zyzzyva~1") == expected
+        assert index.delete(documents[0]["id"])
+        assert documents[0]["id"] not in [
+            ref for ref, _ in search_results(index, "mk*")
+        ]
+
+        release.set()
+        adding.join()
+        assert [ref for ref, _ in search_results(index, "zyzzyva~1")] == ["new"]
+        assert documents[0]["id"] not in [
+            ref for ref, _ in search_results(index, "mk*")
+        ]
+
+    def test_segment_indexes_keep_the_terms_of_their_generation(self, documents):
+        index = _segmented_index(documents[:10])
+        segment_index = index._searched_indexes[0]
+
+        index.add_documents([{"id": "new", "title": "zyzzyva", "text": ""}])
+
+        assert segment_index.search("zyzzyv~1") == []
+        assert [ref for ref, _ in search_results(index, "zyzzyv~1")] == ["new"]
+
+    def test_create_query_with_unknown_fields_raises(self, documents):
+        index = _segmented_index(documents)
+
+        with pytest.raises(BaseLunrException):
+            index.create_query(["body"])
@@ -0,0 +1,75 @@
+import pytest
+
+from lunr import lunr
+from lunr.exceptions import BaseLunrException
+from lunr.index import Index
+from lunr.sharded_index import ShardedIndex
+
+from tests.utils import assert_same_results, read_json_fixture
+
+QUERIES = ["plugin", "theme config", "mk*", "serve~1", "+build -theme", "-plugin"]
+
+
+@pytest.fixture(scope="module")
+def mkdocs_index():
+    documents = read_json_fixture("mkdocs_index.json")["docs"][:80]
+    return lunr(ref="id", fields=("title", "text"), documents=documents)
+
+
+class TestShardedIndex:
+    @pytest.mark.parametrize("shards", [1, 2, 3, 5])
+    def test_results_are_identical_to_unsharded_index(self, mkdocs_index, shards):
+        with ShardedIndex(mkdocs_index, shards=shards) as sharded_index:
+            assert_same_results(sharded_index, mkdocs_index, QUERIES)
+
+    def test_documents_are_distributed_across_shards(self, mkdocs_index):
+        sharded_index = ShardedIndex(mkdocs_index, shards=3)
+
+        assert [
+            len(shard.inverted_index.doc_refs) for shard in sharded_index.shards
+        ] == [
+            27,
+            27,
+            26,
+        ]
+        for shard in sharded_index.shards:
+            assert len(shard.inverted_index) == len(mkdocs_index.inverted_index)
+
+    def test_query(self, mkdocs_index):
+        with ShardedIndex(mkdocs_index, shards=3) as sharded_index:
+            results = sharded_index.query(
+                callback=lambda query: query.term("plugins", fields=["title"])
+            )
+
+        assert results == mkdocs_index.query(
+            callback=lambda query: query.term("plugins", fields=["title"])
+        )
+
+    def test_binary_index(self, mkdocs_index, tmp_path):
+        mkdocs_index.save_binary(tmp_path / "idx.bin")
+        opened = Index.open(tmp_path / "idx.bin")
+
+        with ShardedIndex(opened, shards=3) as sharded_index:
+            assert_same_results(sharded_index, opened, QUERIES)
+
+    def test_delete(self):
+        documents = read_json_fixture("mkdocs_index.json")["docs"][:80]
+        index = lunr(ref="id", fields=("title", "text"), documents=documents)
+        index.delete(documents[0]["id"])
+
+        with ShardedIndex(index, shards=3) as sharded_index:
+            assert_same_results(sharded_index, index, QUERIES)
+
+            assert sharded_index.delete(documents[1]["id"]) is True
+            assert sharded_index.delete("unknown") is False
+            index.delete(documents[1]["id"])
+
+            assert_same_results(sharded_index, index, QUERIES)
+
+    def test_process_executor(self, mkdocs_index):
+        with ShardedIndex(mkdocs_index, shards=2, executor="process") as sharded_index:
+            assert_same_results(sharded_index, mkdocs_index, QUERIES)
+
+    def test_unknown_executor_raises(self, mkdocs_index):
+        with pytest.raises(BaseLunrException):
+            ShardedIndex(mkdocs_index, executor="fiber")
@@ -1,8 +1,9 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from lunr.token import Token
-from lunr.stemmer import stemmer
+from lunr.stemmer import PorterStemmer, StemCache, stem_cache, stemmer
 from lunr.pipeline import Pipeline
 
 
@@ -23,3 +24,94 @@ class TestStemmer:
     def test_is_a_registered_pipeline_function(self):
         assert stemmer.label == "stemmer"
         assert Pipeline.registered_functions["stemmer"] == stemmer
+
+    def test_batch_stems_every_token(self):
+        words = ["consign", "consigned", "consigning", "consignment"]
+
+        tokens = stemmer.batch([Token(word) for word in words])
+
+        assert [str(token) for token in tokens] == ["consign"] * 4
+
+    def test_porter_stemmer_can_be_shared_between_threads(self):
+        porter_stemmer = PorterStemmer()
+        words = ["agreed", "hopping", "sensational", "controll", "sky"] * 200
+        expected = [porter_stemmer.stem(word) for word in words]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(porter_stemmer.stem, words))
+
+        assert results == expected
+
+
+class TestStemCache:
+    def setup_method(self, method):
+        self.calls = []
+
+        def stem(word, metadata=None):
+            self.calls.append(word)
+            return word[:-1]
+
+        self.cache = StemCache(stem, maxsize=2)
+
+    def test_caches_stems(self):
+        assert self.cache("plants") == "plant"
+        assert self.cache("plants") == "plant"
+
+        assert self.calls == ["plants"]
+        assert self.cache.cache_info() == (1, 1, 2, 1)
+
+    def test_evicts_least_recently_used_words(self):
+        self.cache("a1")
+        self.cache("b1")
+        self.cache("a1")
+        self.cache("c1")
+        self.cache("a1")
+        self.cache("b1")
+
+        assert self.calls == ["a1", "b1", "c1", "b1"]
+        assert self.cache.cache_info().currsize == 2
+
+    def test_reducing_maxsize_evicts_words(self):
+        self.cache("a1")
+        self.cache("b1")
+
+        self.cache.maxsize = 1
+        self.cache("b1")
+        self.cache("a1")
+
+        assert self.calls == ["a1", "b1", "a1"]
+
+    def test_maxsize_zero_disables_caching(self):
+        self.cache.maxsize = 0
+        self.cache("a1")
+        self.cache("a1")
+
+        assert self.calls == ["a1", "a1"]
+        assert self.cache.cache_info() == (0, 2, 0, 0)
+
+    def test_cache_clear(self):
+        self.cache("a1")
+        self.cache.cache_clear()
+        self.cache("a1")
+
+        assert self.calls == ["a1", "a1"]
+        assert self.cache.cache_info() == (0, 1, 2, 1)
+
+    def test_is_thread_safe(self):
+        words = ["plants", "growing", "relational", "happiness"] * 250
+        expected = [str(stemmer(Token(word))) for word in words]
+        stem_cache.cache_clear()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda word: str(stemmer(Token(word))), words))
+
+        assert results == expected
+        assert stem_cache.cache_info().currsize == 4
+
+    def test_stemmer_uses_the_stem_cache(self):
+        stem_cache.cache_clear()
+
+        stemmer(Token("plants"))
+        stemmer(Token("plants"))
+
+        assert stem_cache.cache_info()[:2] == (1, 1)
@@ -18,6 +18,11 @@ class TestStopWordFilter:
         assert stop_word_filter.label == "stopWordFilter"
         assert Pipeline.registered_functions["stopWordFilter"] == stop_word_filter
 
+    def test_batch_filters_stop_words(self):
+        words = ["the", "interesting", "and", "words", "when"]
+
+        assert stop_word_filter.batch(words) == ["interesting", "words"]
+
 
 class TestGenerateStopWordFilter:
     def test_creates_correct_stop_words_filter(self):
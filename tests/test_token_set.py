@@ -278,3 +278,57 @@ class TestTokenSetIntersect:
         y = TokenSet.from_string("a*ba*b")
 
         assert x.intersect(y).to_list() == ["acbaabab"]
+
+
+class TestTokenSetWithWord:
+    def test_with_word(self):
+        token_set = TokenSet.from_list(["bat", "cat", "dog"])
+
+        updated = token_set.with_word("cats").with_word("ant")
+
+        assert (
+            updated.to_list()
+            == TokenSet.from_list(["ant", "bat", "cat", "cats", "dog"]).to_list()
+        )
+        assert sorted(token_set.to_list()) == ["bat", "cat", "dog"]
+
+    def test_without_word(self):
+        token_set = TokenSet.from_list(["bat", "cat", "dog"])
+
+        updated = token_set.without_word("cat").without_word("cow")
+
+        assert sorted(updated.to_list()) == ["bat", "dog"]
+        assert sorted(token_set.to_list()) == ["bat", "cat", "dog"]
+
+    def test_intersection_order_is_that_of_a_new_token_set(self):
+        token_set = TokenSet.from_list(["bat", "cat", "dog"]).with_word("cab")
+        query = TokenSet.from_string("*a*")
+
+        assert (
+            token_set.intersect(query).to_list()
+            == TokenSet.from_list(["bat", "cab", "cat", "dog"])
+            .intersect(query)
+            .to_list()
+        )
+
+
+class TestFlatten:
+    def test_flatten_and_from_flat_round_trip(self):
+        words = ["bat", "cat", "cats", "dog"]
+        token_set = TokenSet.from_list(words)
+
+        flat = token_set.flatten()
+        loaded = TokenSet.from_flat(*flat)
+
+        assert sorted(loaded.to_list()) == words
+        assert loaded.flatten() == flat
+
+    def test_flatten_includes_shared_nodes_once(self):
+        token_set = TokenSet.from_list(["bat", "cat"])
+
+        finals, edge_offsets, edge_labels, edge_targets = token_set.flatten()
+
+        # root, "b" and "c" share their suffix "at"
+        assert len(finals) == 4
+        assert edge_labels == ["b", "c", "a", "t"]
+        assert edge_targets == [1, 1, 2, 3]
@@ -92,3 +92,14 @@ class TestTokenizer:
         tokens = Tokenizer("foo bar ")
         assert tokens[0].metadata["position"] == [0, 3]
         assert tokens[1].metadata["position"] == [4, 3]
+
+    def test_default_separators_match_separator_function(self):
+        from lunr.tokenizer import default_separator
+
+        string = "Foo-bar\tbaz\xa0qux  quux-\n"
+        tokens = Tokenizer(string, metadata={"extra": 1})
+        expected = Tokenizer(string, metadata={"extra": 1}, separator=default_separator)
+
+        assert [(str(t), t.metadata) for t in tokens] == [
+            (str(t), t.metadata) for t in expected
+        ]
@@ -30,3 +30,11 @@ class TestTrimmer:
     def test_is_a_registered_pipeline_function(self):
         assert trimmer.label == "trimmer"
         assert Pipeline.registered_functions["trimmer"] == trimmer
+
+    def test_batch_trims_every_token(self):
+        strings = ["hello.", "it's", "james'", "[tag]", "..."]
+        expected = [str(trimmer(Token(string))) for string in strings]
+
+        tokens = trimmer.batch([Token(string) for string in strings])
+
+        assert [str(token) for token in tokens] == expected
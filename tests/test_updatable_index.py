@@ -0,0 +1,248 @@
+import pytest
+
+from lunr import updatable_index
+from lunr.exceptions import BaseLunrException
+from lunr.index import Index
+from lunr.matrix import NUMPY_SUPPORT
+from lunr.updatable_index import UpdatableIndex
+
+from tests.utils import assert_same_results, create_builder, search_results
+
+QUERIES = ["green", "plumb", "professor", "pl*", "scarlet~1", "study"]
+DOCUMENTS = [
+    {"id": "a", "title": "Mr. Green kills Colonel Mustard", "body": "in the study"},
+    {"id": "b", "title": "Plumb waters plant", "body": "Professor Plumb has a green"},
+    {"id": "c", "title": "Scarlett helps Professor", "body": "Miss Scarlett watered"},
+]
+
+
+def _sorted_results(index, query_string):
+    return sorted(search_results(index, query_string))
+
+
+def _assert_same_results(index, documents):
+    expected = create_builder(documents).build()
+    assert_same_results(index, expected, QUERIES, ordered=False)
+
+
+class TestUpdatableIndex:
+    def setup_method(self, method):
+        self.index = UpdatableIndex(create_builder(DOCUMENTS))
+
+    def test_searches_initial_documents(self):
+        _assert_same_results(self.index, DOCUMENTS)
+        assert len(self.index) == 3
+        assert "a" in self.index
+
+    def test_add_document(self):
+        self.index.search("green")
+        document = {"id": "d", "title": "Green room", "body": "a plant"}
+
+        self.index.add(document)
+
+        _assert_same_results(self.index, DOCUMENTS + [document])
+        assert "d" in self.index
+
+    def test_add_existing_document_raises(self):
+        with pytest.raises(BaseLunrException):
+            self.index.add(DOCUMENTS[0])
+
+    def test_remove_document(self):
+        self.index.search("green")
+
+        assert self.index.remove("a") is True
+
+        _assert_same_results(self.index, DOCUMENTS[1:])
+        assert "a" not in self.index
+        assert "mustard" not in self.index.index.inverted_index
+
+    def test_remove_missing_document(self):
+        assert self.index.remove("z") is False
+
+    def test_update_document(self):
+        document = {"id": "b", "title": "Peacock", "body": "in the conservatory"}
+
+        self.index.update(document)
+
+        _assert_same_results(self.index, [DOCUMENTS[0], DOCUMENTS[2], document])
+        assert self.index.search("plumb") == []
+
+    def test_index_is_rebuilt_only_after_changes(self):
+        index = self.index.index
+
+        assert self.index.index is index
+        self.index.remove("c")
+        assert self.index.index is not index
+
+    def test_previous_index_is_not_affected_by_changes(self):
+        index = self.index.index
+        results = index.search("green")
+
+        self.index.remove("a")
+        self.index.add({"id": "e", "title": "green green", "body": "green"})
+
+        assert index.search("green") == results
+
+    def test_serialized_index_can_be_loaded(self):
+        self.index.remove("a")
+        self.index.add({"id": "d", "title": "Green room", "body": "a plant"})
+
+        loaded = Index.load(self.index.serialize())
+
+        assert _sorted_results(loaded, "green") == _sorted_results(self.index, "green")
+        term_indexes = sorted(
+            posting["_index"] for _, posting in self.index.serialize()["invertedIndex"]
+        )
+        assert term_indexes == list(range(len(term_indexes)))
+
+    def test_remove_all_documents(self):
+        for document in DOCUMENTS:
+            self.index.remove(document["id"])
+
+        assert self.index.search("green") == []
+        assert len(self.index) == 0
+
+    def test_changes_do_not_rebuild_the_index(self, monkeypatch):
+        def build(*args, **kwargs):
+            raise AssertionError("The index should not be rebuilt")
+
+        monkeypatch.setattr(self.index.builder, "build", build)
+        document = {"id": "b", "title": "Peacock", "body": "in the conservatory"}
+
+        self.index.add({"id": "d", "title": "Green room", "body": "a plant"})
+        self.index.update(document)
+        self.index.remove("a")
+
+        assert _sorted_results(self.index, "green") == _sorted_results(
+            create_builder(
+                [
+                    DOCUMENTS[2],
+                    document,
+                    {"id": "d", "title": "Green room", "body": "a plant"},
+                ]
+            ).build(),
+            "green",
+        )
+
+    def test_token_set_is_updated_without_rebuilding(self, monkeypatch):
+        self.index.search("green~1")
+
+        def from_list(*args, **kwargs):
+            raise AssertionError("The token set should not be rebuilt")
+
+        monkeypatch.setattr(updatable_index.TokenSet, "from_list", from_list)
+        document = {"id": "d", "title": "Greet the room", "body": "a plant"}
+        self.index.add(document)
+        self.index.remove("c")
+        monkeypatch.undo()
+
+        _assert_same_results(self.index, DOCUMENTS[:2] + [document])
+        assert self.index.search("gree~1")
+        assert self.index.search("scarlet~1") == []
+
+    def test_update_keeps_metadata(self):
+        builder = create_builder()
+        builder.metadata_whitelist = ["position"]
+        index = UpdatableIndex(builder)
+        index.add({"id": "a", "title": "green plant", "body": "green"})
+
+        index.update({"id": "a", "title": "big green plant", "body": "blue"})
+
+        [result] = index.search("green")
+        assert result["match_data"].metadata == {
+            "green": {"title": {"position": [[4, 5]]}}
+        }
+
+
+class TestUpdatableIndexRefresh:
+    def setup_method(self, method):
+        self.documents = [
+            {"id": str(i), "title": "green plant {}".format(i % 7), "body": "study"}
+            for i in range(30)
+        ]
+        self.index = UpdatableIndex(
+            create_builder(self.documents), refresh_batch_size=10
+        )
+
+    def _add(self):
+        document = {"id": "new", "title": "green room", "body": "study plant"}
+        self.index.add(document)
+        return self.documents + [document]
+
+    def test_changed_document_is_scored_with_new_statistics(self):
+        documents = self._add()
+
+        expected = _sorted_results(create_builder(documents).build(), "room")
+        assert _sorted_results(self.index, "room") == expected
+
+    def test_outdated_field_vectors_are_refreshed_in_batches(self):
+        documents = self._add()
+        expected = {
+            ref: vector.serialize()
+            for ref, vector in create_builder(documents).build().field_vectors.items()
+        }
+
+        def outdated():
+            field_vectors = self.index.index.field_vectors
+            return sum(
+                field_vectors[ref].serialize() != elements
+                for ref, elements in expected.items()
+            )
+
+        # 10 of the 60 field vectors are refreshed by each search
+        assert outdated() > 0
+        for _ in range(5):
+            self.index.search("green")
+        assert outdated() == 0
+        _assert_same_results(self.index, documents)
+
+    def test_field_vectors_are_refreshed_in_place(self):
+        documents = self._add()
+        index = self.index.index
+
+        for _ in range(5):
+            self.index.search("green")
+
+        assert self.index.index is index
+        _assert_same_results(self.index, documents)
+
+    @pytest.mark.skipif(not NUMPY_SUPPORT, reason="NumPy is not installed")
+    def test_field_matrices_are_not_recreated(self, monkeypatch):
+        self.index.search("green study")
+
+        def field_matrix(*args, **kwargs):
+            raise AssertionError("The field matrix should not be recreated")
+
+        monkeypatch.setattr(updatable_index, "FieldMatrix", field_matrix)
+        documents = self._add()
+        self.index.remove("3")
+        del documents[3]
+        self.index.refresh()
+
+        _assert_same_results(self.index, documents)
+
+    def test_refresh(self):
+        documents = self._add()
+
+        self.index.refresh()
+
+        _assert_same_results(self.index, documents)
+
+    def test_pruned_results_while_outdated(self):
+        self._add()
+        self.index.remove("3")
+
+        index = self.index.index
+        assert (
+            index.search("green study", limit=5)
+            == index.search("green study", prune=False)[:5]
+        )
+
+    def test_serialize_refreshes_field_vectors(self):
+        documents = self._add()
+
+        loaded = Index.load(self.index.serialize())
+
+        assert _sorted_results(loaded, "green") == _sorted_results(
+            create_builder(documents).build(), "green"
+        )
@@ -1,3 +1,4 @@
+from array import array
 from math import sqrt
 
 import pytest
@@ -18,8 +19,44 @@ def test_vector_repr():
     assert repr(vector) == "<Vector magnitude={}>".format(vector.magnitude)
 
 
+class TestVectorStorage:
+    def test_elements_are_stored_in_parallel_arrays(self):
+        vector = Vector([0, 1.5, 3, 2.0])
+
+        assert vector.indexes == array("I", [0, 3])
+        assert vector.values == array("d", [1.5, 2.0])
+
+    def test_elements_returns_flat_list(self):
+        vector = Vector([0, 1.5, 3, 2.0])
+
+        assert vector.elements == [0, 1.5, 3, 2.0]
+        assert list(vector) == [0, 1.5, 3, 2.0]
+
+    def test_from_sorted_pairs_uses_typed_arrays(self):
+        indexes = array("I", [1, 4])
+        values = array("d", [0.5, 0.25])
+
+        vector = Vector.from_sorted_pairs(indexes, values)
+
+        assert vector.indexes is indexes
+        assert vector.values is values
+
+    def test_from_sorted_pairs_copies_other_iterables(self):
+        vector = Vector.from_sorted_pairs([1, 4], (v for v in [0.5, 0.25]))
+
+        assert vector.elements == [1, 0.5, 4, 0.25]
+
+    def test_vectors_have_no_instance_dict(self):
+        assert not hasattr(Vector(), "__dict__")
+
+    def test_serialize_returns_flat_rounded_list(self):
+        vector = Vector([0, 1.23456, 3, 2.0])
+
+        assert vector.serialize() == [0, 1.235, 3, 2.0]
+
+
 class TestVectorPositionForIndex:
-    vector = Vector([1, "a", 2, "b", 4, "c", 7, "d", 11, "e"])
+    vector = Vector([1, 0.1, 2, 0.2, 4, 0.3, 7, 0.4, 11, 0.5])
 
     def test_position_for_index_at_the_beggining(self):
         assert self.vector.position_for_index(0) == 0
@@ -82,6 +119,14 @@ class TestSimilarity:
         assert v1.similarity(v2) == 0
         assert v2.similarity(v1) == 0
 
+    def test_similarity_uses_given_magnitude_of_other_vector(self):
+        v1 = Vector([1, 1])
+        v2 = Vector([1, 2])
+
+        assert v1.similarity(v2, other_magnitude=2) == 2
+        assert v1.similarity(v2, other_magnitude=0) == 0
+        assert v2._magnitude == 0
+
 
 class TestVectorInsert:
     def test_insert_invalidates_magnitude_cache(self):
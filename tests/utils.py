@@ -5,6 +5,8 @@ import subprocess
 
 import pytest
 
+from lunr import get_default_builder
+
 PATTERN = r'([^\ ]+) "([^\"]+)" \[([\d\.]*)\]'
 DEFAULT_TOLERANCE = 1e-2
 
@@ -28,6 +30,50 @@ def assert_results_match(results, js_results, tol=DEFAULT_TOLERANCE):
         assert result["score"] == pytest.approx(float(score), rel=tol)
 
 
+def create_builder(documents=(), fields=("title", "body")):
+    """Returns a default builder with an `id` ref and the fields, with the
+    documents added to it."""
+    builder = get_default_builder()
+    builder.ref("id")
+    for field in fields:
+        builder.field(field)
+    builder.add_many(documents)
+    return builder
+
+
+def search_results(index, query_string, **kwargs):
+    """Returns the refs and scores of the results of a search."""
+    return [
+        (result["ref"], result["score"])
+        for result in index.search(query_string, **kwargs)
+    ]
+
+
+def assert_same_results(index, expected, query_strings, ordered=True, limit=5):
+    """Asserts searching both indexes returns the same results, also when
+    limited and pruned. Unless `ordered`, documents with equal scores may be
+    ranked differently, as happens when documents have different ids."""
+    for query_string in query_strings:
+        results = search_results(index, query_string)
+        expected_results = search_results(expected, query_string)
+        limited_results = [
+            search_results(index, query_string, limit=limit),
+            search_results(index, query_string, limit=limit, prune=True),
+        ]
+        expected_limited_results = search_results(expected, query_string, limit=limit)
+        if not ordered:
+            results.sort()
+            expected_results.sort()
+            limited_results = [
+                [score for _, score in limited] for limited in limited_results
+            ]
+            expected_limited_results = [score for _, score in expected_limited_results]
+
+        assert results == expected_results
+        for limited in limited_results:
+            assert limited == expected_limited_results
+
+
 def read_json_fixture(filename):
     fixture_path = os.path.join(
         os.path.dirname(__file__), "acceptance_tests", "fixtures", filename